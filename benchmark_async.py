@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+"""
+Benchmark: backend síncrono x assíncrono
+
+Sobe a API duas vezes com uvicorn (DATABASE_BACKEND=sync e async), contra o
+banco configurado em DATABASE_URL (já migrado: python migrar.py), e dispara
+requisições de leitura com N conexões simultâneas. Ao final compara req/s e
+latências p50/p99.
+
+Uso:
+    python benchmark_async.py --conexoes 500 --requisicoes 20000
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+import httpx
+
+def percentil(valores, p):
+    ordenados = sorted(valores)
+    return ordenados[min(len(ordenados) - 1, int(len(ordenados) * p / 100))]
+
+def subir_api(backend: str, porta: int) -> subprocess.Popen:
+    ambiente = dict(os.environ, DATABASE_BACKEND=backend)
+    processo = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--port", str(porta), "--log-level", "warning"],
+        env=ambiente,
+    )
+    for _ in range(100):
+        try:
+            httpx.get(f"http://127.0.0.1:{porta}/docs", timeout=1)
+            return processo
+        except httpx.TransportError:
+            time.sleep(0.1)
+    processo.terminate()
+    raise RuntimeError(f"API ({backend}) não subiu na porta {porta}")
+
+async def disparar(base_url: str, conexoes: int, requisicoes: int, produto_ids):
+    limites = httpx.Limits(max_connections=conexoes, max_keepalive_connections=conexoes)
+    latencias = []
+    erros = 0
+    fila = iter(range(requisicoes))
+
+    async with httpx.AsyncClient(base_url=base_url, limits=limites, timeout=60) as client:
+        async def trabalhador():
+            nonlocal erros
+            for indice in fila:
+                caminho = f"/produtos/{produto_ids[indice % len(produto_ids)]}" if indice % 4 else "/produtos/?limit=20"
+                inicio = time.perf_counter()
+                try:
+                    response = await client.get(caminho)
+                    if response.status_code != 200:
+                        erros += 1
+                except httpx.HTTPError:
+                    erros += 1
+                latencias.append(time.perf_counter() - inicio)
+
+        inicio = time.perf_counter()
+        await asyncio.gather(*(trabalhador() for _ in range(conexoes)))
+        duracao = time.perf_counter() - inicio
+
+    return {
+        "req_s": requisicoes / duracao,
+        "p50_ms": statistics.median(latencias) * 1000,
+        "p99_ms": percentil(latencias, 99) * 1000,
+        "erros": erros,
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Compara os backends sync e async da API")
+    parser.add_argument("--conexoes", type=int, default=500)
+    parser.add_argument("--requisicoes", type=int, default=20000)
+    parser.add_argument("--produtos", type=int, default=200)
+    parser.add_argument("--porta", type=int, default=8100)
+    args = parser.parse_args()
+
+    resultados = {}
+    produto_ids = None
+    for backend in ("sync", "async"):
+        processo = subir_api(backend, args.porta)
+        try:
+            base_url = f"http://127.0.0.1:{args.porta}"
+            if produto_ids is None:
+                produto_ids = [
+                    httpx.post(f"{base_url}/produtos/", json={
+                        "nome": f"Benchmark {i}", "preco": 1.0 + i, "quantidade_estoque": 1000
+                    }).json()["id"]
+                    for i in range(args.produtos)
+                ]
+            resultados[backend] = asyncio.run(disparar(base_url, args.conexoes, args.requisicoes, produto_ids))
+        finally:
+            processo.terminate()
+            processo.wait()
+
+    print(f"\n📊 {args.requisicoes} requisições, {args.conexoes} conexões simultâneas")
+    print(f"{'backend':<8} {'req/s':>10} {'p50 (ms)':>10} {'p99 (ms)':>10} {'erros':>7}")
+    for backend, r in resultados.items():
+        print(f"{backend:<8} {r['req_s']:>10.1f} {r['p50_ms']:>10.1f} {r['p99_ms']:>10.1f} {r['erros']:>7}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+"""
+Benchmark: busca de produtos (GET /produtos/busca)
+
+Gera um catálogo sintético no banco configurado em DATABASE_URL (1 milhão de
+produtos por padrão, com SKU "BENCH-*"), mede a latência da busca por
+similaridade para alguns termos e compara com um LIKE '%termo%' sem índice.
+Ao final os produtos gerados são removidos, a menos que --manter seja usado.
+
+O banco precisa estar migrado (alembic upgrade head) para ter os índices de
+trigramas (PostgreSQL) ou a tabela FTS5 (SQLite).
+
+Uso:
+    python benchmark_busca.py --produtos 1000000 --repeticoes 20
+"""
+
+import argparse
+import random
+import statistics
+import time
+
+from sqlalchemy import delete, insert
+
+import crud
+import models
+from database import SessionLocal
+
+PREFIXO_SKU = "BENCH-"
+
+TIPOS = ["Caneta", "Caderno", "Lápis", "Borracha", "Grampeador", "Marcador", "Pasta",
+         "Régua", "Tesoura", "Cola", "Apontador", "Estojo", "Agenda", "Envelope", "Clips"]
+ATRIBUTOS = ["Azul", "Preto", "Vermelho", "Verde", "Permanente", "Escolar", "Executivo",
+             "Colorido", "Transparente", "Reciclado", "Premium", "Compacto", "Grande", "Pequeno"]
+MARCAS = ["Faber", "Bic", "Tilibra", "Pilot", "Stabilo", "Maped", "Acrilex", "Cis", "Compactor"]
+
+# Prefixo, trecho, palavra da descrição, erro de digitação e termo sem resultado
+TERMOS = ["cane", "permanente", "tilibra", "grampeadro", "caderno escolar", "xyzw"]
+
+def percentil(valores, p):
+    ordenados = sorted(valores)
+    return ordenados[min(len(ordenados) - 1, int(len(ordenados) * p / 100))]
+
+def gerar_catalogo(db, total: int, tamanho_lote: int = 10000):
+    aleatorio = random.Random(42)
+    for inicio in range(0, total, tamanho_lote):
+        db.execute(insert(models.Produto), [
+            {
+                "sku": f"{PREFIXO_SKU}{i}",
+                "nome": f"{aleatorio.choice(TIPOS)} {aleatorio.choice(ATRIBUTOS)} {i}",
+                "descricao": f"{aleatorio.choice(MARCAS)} {aleatorio.choice(ATRIBUTOS).lower()}",
+                "preco": round(aleatorio.uniform(1, 100), 2),
+                "quantidade_estoque": aleatorio.randint(0, 500),
+            }
+            for i in range(inicio, min(inicio + tamanho_lote, total))
+        ])
+        db.commit()
+        print(f"\r📦 {min(inicio + tamanho_lote, total)}/{total} produtos gerados", end="", flush=True)
+    print()
+
+def medir(funcao, repeticoes: int):
+    latencias = []
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        resultado = funcao()
+        latencias.append(time.perf_counter() - inicio)
+    return len(resultado), statistics.median(latencias) * 1000, percentil(latencias, 99) * 1000
+
+def main():
+    parser = argparse.ArgumentParser(description="Mede a busca de produtos em um catálogo grande")
+    parser.add_argument("--produtos", type=int, default=1_000_000)
+    parser.add_argument("--repeticoes", type=int, default=20)
+    parser.add_argument("--limit", type=int, default=20)
+    parser.add_argument("--manter", action="store_true", help="Não remove os produtos gerados")
+    args = parser.parse_args()
+
+    db = SessionLocal()
+    try:
+        gerar_catalogo(db, args.produtos)
+
+        print(f"\n📊 Busca em {args.produtos} produtos ({db.get_bind().dialect.name}), "
+              f"{args.repeticoes} repetições por termo")
+        print(f"{'termo':<18} {'achados':>8} {'p50 (ms)':>10} {'p99 (ms)':>10} {'LIKE p50':>10}")
+        for termo in TERMOS:
+            achados, p50, p99 = medir(
+                lambda: crud.ProdutoCRUD.buscar_produtos(db, termo, args.limit), args.repeticoes)
+            _, like_p50, _ = medir(
+                lambda: db.query(models.Produto)
+                .filter(models.Produto.nome.icontains(termo))
+                .limit(args.limit).all(),
+                max(1, args.repeticoes // 5),
+            )
+            print(f"{termo:<18} {achados:>8} {p50:>10.1f} {p99:>10.1f} {like_p50:>10.1f}")
+    finally:
+        if not args.manter:
+            db.rollback()
+            db.execute(delete(models.Produto).where(models.Produto.sku.startswith(PREFIXO_SKU)))
+            db.commit()
+        else:
+            print("\nℹ️  Produtos mantidos; rode reconciliar_estoque.py para atualizar o resumo do estoque")
+        db.close()
+
+if __name__ == "__main__":
+    main()
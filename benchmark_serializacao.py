@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+"""
+Microbenchmark: serialização padrão x SERIALIZACAO_RAPIDA
+
+Roda em processo, contra um banco SQLite temporário (cache de produtos
+desligado), e mede o tempo por requisição das rotas de leitura com páginas de
+100 registros nos dois modos. Em seguida isola só a etapa de serialização de
+uma página de pedidos: objetos ORM validados pelo schema + jsonable_encoder +
+json, contra dicionários codificados direto (orjson).
+
+Uso:
+    python benchmark_serializacao.py --repeticoes 300
+"""
+
+import argparse
+import os
+import statistics
+import tempfile
+import time
+
+# Precisa ser definido antes de importar config/database
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(tempfile.mkdtemp(prefix='bench_serializacao_'), 'bench.db')}"
+os.environ["CACHE_BACKEND"] = "desativado"
+
+from typing import List
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from fastapi.testclient import TestClient
+from pydantic import TypeAdapter
+from sqlalchemy import insert
+
+import crud
+import main
+import models
+import respostas
+import schemas
+from config import settings
+from database import SessionLocal, create_tables
+
+ROTAS = ["/produtos/?limit=100", "/produtos/1", "/pedidos/?limit=100", "/pedidos/1"]
+
+def popular(db, produtos: int, pedidos: int, itens_por_pedido: int):
+    db.execute(insert(models.Produto), [
+        {"nome": f"Produto {i}", "descricao": f"Descrição do produto {i}", "preco": 1.5 + i,
+         "quantidade_estoque": 1000}
+        for i in range(produtos)
+    ])
+    pedido_ids = db.execute(
+        insert(models.Pedido).returning(models.Pedido.id, sort_by_parameter_order=True),
+        [{"cliente": f"Cliente {i}", "valorTotalPedido": 10.0 * itens_por_pedido} for i in range(pedidos)],
+    ).scalars().all()
+    db.execute(insert(models.ItemPedido), [
+        {"pedido_id": pedido_id, "produto_id": 1 + (pedido_id + j) % produtos, "nome_produto": f"Produto {j}",
+         "quantidade": 1, "preco_unitario": 10.0, "valor_total_item": 10.0}
+        for pedido_id in pedido_ids for j in range(itens_por_pedido)
+    ])
+    db.commit()
+
+def medir(funcao, repeticoes: int) -> float:
+    """Mediana do tempo por chamada, em milissegundos"""
+    funcao()
+    tempos = []
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        funcao()
+        tempos.append(time.perf_counter() - inicio)
+    return statistics.median(tempos) * 1000
+
+def main_benchmark():
+    parser = argparse.ArgumentParser(description="Compara a serialização padrão com SERIALIZACAO_RAPIDA")
+    parser.add_argument("--repeticoes", type=int, default=300)
+    parser.add_argument("--itens", type=int, default=5, help="Itens por pedido")
+    args = parser.parse_args()
+
+    create_tables()
+    db = SessionLocal()
+    popular(db, produtos=200, pedidos=200, itens_por_pedido=args.itens)
+
+    print(f"📊 Mediana por requisição (ms), {args.repeticoes} repetições, "
+          f"encoder: {'orjson' if respostas.orjson else 'json'}")
+    print(f"{'rota':<24} {'padrão':>9} {'rápida':>9} {'ganho':>7}")
+    with TestClient(main.app) as client:
+        for rota in ROTAS:
+            tempos = {}
+            for rapida in (False, True):
+                settings.SERIALIZACAO_RAPIDA = rapida
+                tempos[rapida] = medir(lambda: client.get(rota), args.repeticoes)
+            settings.SERIALIZACAO_RAPIDA = False
+            print(f"{rota:<24} {tempos[False]:>9.2f} {tempos[True]:>9.2f} {tempos[False] / tempos[True]:>6.1f}x")
+
+    # Só a serialização de uma página de 100 pedidos já carregada do banco
+    adaptador = TypeAdapter(List[schemas.Pedido])
+    pedidos_orm = crud.PedidoCRUD.listar_pedidos(db, limit=100)
+    pedidos_dados = crud.PedidoCRUD.listar_pedidos_dados(db, limit=100)
+    padrao = medir(lambda: JSONResponse(jsonable_encoder(
+        adaptador.dump_python(adaptador.validate_python(pedidos_orm, from_attributes=True), mode="json")
+    )), args.repeticoes)
+    rapida = medir(lambda: respostas.RespostaJSONRapida(pedidos_dados), args.repeticoes)
+    print(f"\n{'serialização (100 pedidos)':<24} {padrao:>9.2f} {rapida:>9.2f} {padrao / rapida:>6.1f}x")
+    db.close()
+
+if __name__ == "__main__":
+    main_benchmark()
@@ -0,0 +1,259 @@
+"""
+Cache de leitura dos produtos (read-through com invalidação nas escritas)
+
+O backend é plugável: "memoria" (LRU limitado com TTL, por processo) ou
+"redis" (compartilhado entre workers). Os contadores de acertos, faltas e
+despejos ficam disponíveis em GET /cache/estatisticas.
+
+O cache atende às consultas de produtos e às estatísticas do dashboard.
+Dos produtos, só os campos descritivos (CAMPOS_DESCRITIVOS) ficam no cache:
+o estoque é sempre lido do banco, pela chave primária, porque com o backend
+"memoria" a invalidação só alcança o worker que fez a escrita. A validação
+de estoque dos pedidos lê os valores do banco com as linhas bloqueadas, e
+as escritas que só mudam o estoque (pedidos, reservas, ajustes) não precisam
+invalidar o cache.
+"""
+
+import json
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Any, List, Optional
+
+from config import settings
+
+# Campos de schemas.Produto guardados no cache; quantidade_estoque e
+# quantidade_reservada mudam a cada pedido e vêm sempre do banco
+CAMPOS_DESCRITIVOS = ("id", "sku", "nome", "descricao", "preco")
+
+def _descritivos(produto: dict) -> dict:
+    return {campo: produto[campo] for campo in CAMPOS_DESCRITIVOS}
+
+class BackendCache(ABC):
+    """Interface dos backends de cache; um backend incompleto falha ao ser instanciado"""
+
+    nome = "base"
+
+    @abstractmethod
+    def obter(self, chave: str) -> Optional[Any]:
+        ...
+
+    @abstractmethod
+    def guardar(self, chave: str, valor: Any, ttl: int):
+        ...
+
+    @abstractmethod
+    def remover(self, *chaves: str):
+        ...
+
+    @abstractmethod
+    def incrementar(self, chave: str) -> int:
+        ...
+
+    @abstractmethod
+    def obter_contador(self, chave: str) -> int:
+        ...
+
+    @abstractmethod
+    def limpar(self):
+        ...
+
+    @property
+    def despejos(self) -> int:
+        return 0
+
+class CacheMemoria(BackendCache):
+    """LRU em memória, limitado por número de chaves e com expiração por TTL"""
+
+    nome = "memoria"
+
+    def __init__(self, tamanho_maximo: int):
+        self.tamanho_maximo = tamanho_maximo
+        self._itens: "OrderedDict[str, tuple]" = OrderedDict()
+        self._contadores = {}
+        self._despejos = 0
+        self._lock = threading.Lock()
+
+    def obter(self, chave: str) -> Optional[Any]:
+        with self._lock:
+            item = self._itens.get(chave)
+            if item is None:
+                return None
+            expira_em, valor = item
+            if expira_em < time.monotonic():
+                del self._itens[chave]
+                return None
+            self._itens.move_to_end(chave)
+            return valor
+
+    def guardar(self, chave: str, valor: Any, ttl: int):
+        with self._lock:
+            self._itens[chave] = (time.monotonic() + ttl, valor)
+            self._itens.move_to_end(chave)
+            while len(self._itens) > self.tamanho_maximo:
+                self._itens.popitem(last=False)
+                self._despejos += 1
+
+    def remover(self, *chaves: str):
+        with self._lock:
+            for chave in chaves:
+                self._itens.pop(chave, None)
+
+    def incrementar(self, chave: str) -> int:
+        with self._lock:
+            self._contadores[chave] = self._contadores.get(chave, 0) + 1
+            return self._contadores[chave]
+
+    def obter_contador(self, chave: str) -> int:
+        return self._contadores.get(chave, 0)
+
+    def limpar(self):
+        with self._lock:
+            self._itens.clear()
+            self._contadores.clear()
+
+    @property
+    def despejos(self) -> int:
+        return self._despejos
+
+    def __len__(self):
+        return len(self._itens)
+
+class CacheRedis(BackendCache):
+    """Cache compartilhado em um servidor Redis (ou compatível)"""
+
+    nome = "redis"
+
+    def __init__(self, url: str = None, prefixo: str = "gestao_estoque:", cliente=None):
+        if cliente is None:
+            import redis
+            cliente = redis.Redis.from_url(url)
+        self.cliente = cliente
+        self.prefixo = prefixo
+
+    def obter(self, chave: str) -> Optional[Any]:
+        valor = self.cliente.get(self.prefixo + chave)
+        return None if valor is None else json.loads(valor)
+
+    def guardar(self, chave: str, valor: Any, ttl: int):
+        self.cliente.set(self.prefixo + chave, json.dumps(valor), ex=ttl)
+
+    def remover(self, *chaves: str):
+        if chaves:
+            self.cliente.delete(*(self.prefixo + chave for chave in chaves))
+
+    def incrementar(self, chave: str) -> int:
+        return self.cliente.incr(self.prefixo + chave)
+
+    def obter_contador(self, chave: str) -> int:
+        return int(self.cliente.get(self.prefixo + chave) or 0)
+
+    def limpar(self):
+        chaves = list(self.cliente.scan_iter(match=self.prefixo + "*", count=1000))
+        if chaves:
+            self.cliente.delete(*chaves)
+
+    @property
+    def despejos(self) -> int:
+        # Despejos por limite de memória são feitos pelo próprio Redis
+        return int(self.cliente.info("stats").get("evicted_keys", 0))
+
+class CacheProdutos:
+    """
+    Cache dos campos descritivos de produtos individuais e de páginas da
+    listagem. A versão da tabela (ETag) não passa por aqui: é lida do banco a
+    cada requisição, pela chave primária de versoes_tabelas
+    """
+
+    def __init__(self, backend: Optional[BackendCache], ttl: int):
+        self.backend = backend
+        self.ttl = ttl
+        self.acertos = 0
+        self.faltas = 0
+        self.invalidacoes = 0
+
+    @property
+    def ativo(self) -> bool:
+        return self.backend is not None
+
+    def _registrar(self, valor):
+        if valor is None:
+            self.faltas += 1
+        else:
+            self.acertos += 1
+        return valor
+
+    def _geracao(self) -> int:
+        return self.backend.obter_contador("produtos:geracao") if self.ativo else 0
+
+    def chave_produto(self, produto_id: int) -> str:
+        """Chave de um produto; como a de chave_lista, deve ser calculada antes da consulta ao banco"""
+        return f"produtos:{self._geracao()}:{produto_id}"
+
+    def chave_lista(self, skip: int, limit: int, after_id: Optional[int]) -> str:
+        """
+        Chave de uma página da listagem. A geração muda a cada escrita,
+        invalidando todas as entradas de uma vez; por isso a chave deve ser
+        calculada antes da consulta ao banco e reaproveitada ao guardar a
+        página: se uma escrita ocorrer no meio, a página lida fica sob a
+        geração antiga e nunca é servida.
+        """
+        return f"produtos:lista:{self._geracao()}:{skip}:{limit}:{after_id}"
+
+    def obter(self, chave: str) -> Optional[dict]:
+        if not self.ativo:
+            return None
+        return self._registrar(self.backend.obter(chave))
+
+    def guardar(self, chave: str, produto: dict):
+        """Guarda o produto sob a chave obtida antes da consulta (ver chave_produto)"""
+        if self.ativo:
+            self.backend.guardar(chave, _descritivos(produto), self.ttl)
+
+    def obter_lista(self, chave: str) -> Optional[List[dict]]:
+        if not self.ativo:
+            return None
+        return self._registrar(self.backend.obter(chave))
+
+    def guardar_lista(self, chave: str, produtos: List[dict]):
+        """Guarda a página sob a chave obtida antes da consulta (ver chave_lista)"""
+        if self.ativo:
+            self.backend.guardar(chave, [_descritivos(produto) for produto in produtos], self.ttl)
+
+    def invalidar(self):
+        """
+        Descarta todos os produtos e páginas da listagem, avançando a geração;
+        as entradas antigas deixam de ser lidas e expiram pelo TTL ou pelo LRU
+        """
+        if self.ativo:
+            self.invalidacoes += 1
+            self.backend.incrementar("produtos:geracao")
+
+    def limpar(self):
+        if self.ativo:
+            self.invalidacoes += 1
+            self.backend.limpar()
+
+    def estatisticas(self) -> dict:
+        return {
+            "backend": self.backend.nome if self.ativo else "desativado",
+            "acertos": self.acertos,
+            "faltas": self.faltas,
+            "despejos": self.backend.despejos if self.ativo else 0,
+            "invalidacoes": self.invalidacoes,
+        }
+
+def criar_backend_cache() -> Optional[BackendCache]:
+    """Cria o backend definido em CACHE_BACKEND"""
+    if settings.CACHE_BACKEND == "memoria":
+        return CacheMemoria(tamanho_maximo=settings.CACHE_TAMANHO_MAXIMO)
+    if settings.CACHE_BACKEND == "redis":
+        return CacheRedis(url=settings.CACHE_URL)
+    return None
+
+# Backend compartilhado pelos caches da aplicação
+backend_cache = criar_backend_cache()
+
+# Instância global do cache de produtos
+cache_produtos = CacheProdutos(backend_cache, ttl=settings.CACHE_TTL_SEGUNDOS)
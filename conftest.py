@@ -0,0 +1,79 @@
+"""
+Configuração dos testes automatizados (pytest)
+
+Os testes rodam em processo contra um banco SQLite temporário. Os scripts
+test_api.py, simple_test.py e debug_test.py dependem da API e do PostgreSQL
+no ar e continuam sendo executados manualmente.
+"""
+
+import os
+import tempfile
+
+# Precisa ser definido antes de importar config/database
+_diretorio_banco = tempfile.mkdtemp(prefix="gestao_estoque_testes_")
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_diretorio_banco, 'testes.db')}"
+# A sonda do banco roda só ao subir a aplicação, fora das contagens de SQL dos testes
+os.environ["SONDA_BANCO_INTERVALO"] = "3600"
+
+from contextlib import contextmanager
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import event
+
+import models
+from cache import cache_produtos
+from database import Base, SessionLocal, engine
+
+collect_ignore = ["test_api.py", "simple_test.py", "debug_test.py"]
+
+@pytest.fixture(autouse=True)
+def banco_limpo():
+    """Recria as tabelas antes de cada teste"""
+    Base.metadata.drop_all(bind=engine)
+    Base.metadata.create_all(bind=engine)
+    cache_produtos.limpar()
+    cache_produtos.acertos = cache_produtos.faltas = cache_produtos.invalidacoes = 0
+    yield
+
+@pytest.fixture
+def db():
+    session = SessionLocal()
+    try:
+        yield session
+    finally:
+        session.close()
+
+@pytest.fixture
+def client():
+    import main
+    with TestClient(main.app) as test_client:
+        yield test_client
+
+@pytest.fixture
+def criar_produto(db):
+    """Cria um produto diretamente no banco e retorna o ID"""
+    def _criar(nome="Produto Teste", preco=10.0, quantidade_estoque=100, descricao=None):
+        produto = models.Produto(nome=nome, descricao=descricao, preco=preco,
+                                 quantidade_estoque=quantidade_estoque)
+        db.add(produto)
+        db.commit()
+        return produto.id
+    return _criar
+
+@pytest.fixture
+def contar_queries():
+    """Context manager que registra os comandos SQL executados no engine"""
+    @contextmanager
+    def _contar():
+        comandos = []
+
+        def registrar(conn, cursor, statement, parameters, context, executemany):
+            comandos.append(statement)
+
+        event.listen(engine, "before_cursor_execute", registrar)
+        try:
+            yield comandos
+        finally:
+            event.remove(engine, "before_cursor_execute", registrar)
+    return _contar
@@ -1,201 +1,1314 @@
-from sqlalchemy.orm import Session
-from sqlalchemy import and_
-from typing import List, Optional
+from sqlalchemy.orm import Session, selectinload
+from sqlalchemy import and_, case, column, delete, event, func, insert, literal, literal_column, or_, select, table, tuple_, update
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.exc import IntegrityError
+from typing import Dict, List, Optional, Tuple
+from datetime import datetime, timedelta, timezone
+import hashlib
+import json
+import re
+import metricas
 import models
 import schemas
+from cache import cache_produtos
+from config import settings
 from fastapi import HTTPException
 
-# Operações CRUD para Produtos
+# Tabela FTS5 usada pela busca de produtos no SQLite (ver models.DDL_BUSCA_SQLITE)
+produtos_busca = table("produtos_busca", column("rowid"), column("produtos_busca"))
+
+# Colunas lidas pelas consultas que montam dicionários direto das linhas, na
+# ordem dos campos dos schemas de resposta
+COLUNAS_PRODUTO = (models.Produto.sku, models.Produto.nome, models.Produto.descricao,
+                   models.Produto.preco, models.Produto.quantidade_estoque, models.Produto.id,
+                   models.Produto.quantidade_reservada)
+CAMPOS_PRODUTO = tuple(coluna.key for coluna in COLUNAS_PRODUTO)
+COLUNAS_ESTOQUE = (models.Produto.id, models.Produto.quantidade_estoque, models.Produto.quantidade_reservada)
+COLUNAS_ITEM_PEDIDO = (models.ItemPedido.produto_id, models.ItemPedido.quantidade, models.ItemPedido.id,
+                       models.ItemPedido.pedido_id, models.ItemPedido.nome_produto,
+                       models.ItemPedido.preco_unitario, models.ItemPedido.valor_total_item)
+COLUNAS_PEDIDO = (models.Pedido.id, models.Pedido.cliente, models.Pedido.valorTotalPedido, models.Pedido.dataPedido)
+
+def inserir_retornando_ids(db: Session, modelo, linhas: List[dict]) -> List[int]:
+    """
+    Insere as linhas com um único INSERT de várias linhas e retorna os IDs na
+    ordem das linhas. O SQLAlchemy só garante essa ordem com uma coluna
+    sentinela, que o SQLite não tem: sem ela, cairia em um INSERT por linha.
+    No SQLite a transação já tem o banco bloqueado para escrita e os rowids
+    são atribuídos em sequência, na ordem das linhas; basta ordená-los.
+    """
+    if db.get_bind().dialect.name == "sqlite":
+        return sorted(db.execute(insert(modelo).returning(modelo.id), linhas).scalars())
+    return db.execute(insert(modelo).returning(modelo.id, sort_by_parameter_order=True), linhas).scalars().all()
+
+def consulta_estoque(produto_ids: List[int]):
+    """Estoque atual dos produtos, lido pela chave primária, para completar os dados do cache"""
+    return select(*COLUNAS_ESTOQUE).where(models.Produto.id.in_(produto_ids))
+
+def completar_estoque(produtos: List[dict], estoque) -> List[dict]:
+    """
+    Junta os campos descritivos vindos do cache com as linhas de
+    consulta_estoque, no formato de schemas.Produto. Produtos excluídos
+    depois de entrar no cache (sem linha de estoque) são descartados.
+    """
+    atual = {linha["id"]: linha for linha in estoque}
+    return [
+        {campo: atual[produto["id"]][campo] if campo in atual[produto["id"]] else produto[campo]
+         for campo in CAMPOS_PRODUTO}
+        for produto in produtos if produto["id"] in atual
+    ]
+
+def _trigramas(texto: str) -> set:
+    """Trigramas de cada palavra, com o mesmo preenchimento usado pelo pg_trgm"""
+    return {
+        trigrama
+        for palavra in re.findall(r"\w+", texto.lower())
+        for trigrama in (f"  {palavra} "[i:i + 3] for i in range(len(palavra) + 1))
+    }
+
+def _similaridade_palavras(termo: str, texto: str) -> float:
+    """Fração dos trigramas do termo presentes no texto (aproxima o word_similarity do pg_trgm)"""
+    do_termo = _trigramas(termo)
+    return len(do_termo & _trigramas(texto)) / len(do_termo) if do_termo else 0.0
+
 class ProdutoCRUD:
+    @staticmethod
+    def _commit_sku_unico(db: Session, sku: Optional[str]):
+        """Commit de uma escrita em produtos; SKU já usado por outro produto vira 409"""
+        try:
+            db.commit()
+        except IntegrityError as erro:
+            db.rollback()
+            if "sku" in str(erro.orig).lower():
+                raise HTTPException(status_code=409, detail=f"Já existe um produto com o SKU {sku}")
+            raise
+    
     @staticmethod
     def criar_produto(db: Session, produto: schemas.ProdutoCreate) -> models.Produto:
         db_produto = models.Produto(**produto.model_dump())
         db.add(db_produto)
-        db.commit()
+        ResumoEstoqueCRUD.registrar(db, antes=[], depois=[(produto.preco, produto.quantidade_estoque)])
+        VersaoTabelaCRUD.incrementar(db, "produtos")
+        ProdutoCRUD._commit_sku_unico(db, produto.sku)
         db.refresh(db_produto)
+        cache_produtos.invalidar()
         return db_produto
     
     @staticmethod
-    def obter_produto(db: Session, produto_id: int) -> Optional[models.Produto]:
-        return db.query(models.Produto).filter(models.Produto.id == produto_id).first()
+    def obter_produto(db: Session, produto_id: int) -> Optional[schemas.Produto]:
+        dados = ProdutoCRUD.obter_produto_dados(db, produto_id)
+        return schemas.Produto.model_validate(dados) if dados is not None else None
+    
+    @staticmethod
+    def obter_produto_dados(db: Session, produto_id: int) -> Optional[dict]:
+        """Produto como dicionário no formato de schemas.Produto, sem montar o objeto ORM"""
+        chave = cache_produtos.chave_produto(produto_id)
+        em_cache = cache_produtos.obter(chave)
+        if em_cache is not None:
+            produto = completar_estoque([em_cache], db.execute(consulta_estoque([produto_id])).mappings())
+            return produto[0] if produto else None
+        
+        linha = db.execute(
+            select(*COLUNAS_PRODUTO).where(models.Produto.id == produto_id)
+        ).mappings().first()
+        if linha is None:
+            return None
+        produto = dict(linha)
+        cache_produtos.guardar(chave, produto)
+        return produto
+    
+    @staticmethod
+    def listar_produtos(db: Session, skip: int = 0, limit: int = 100, after_id: Optional[int] = None) -> List[schemas.Produto]:
+        return [
+            schemas.Produto.model_validate(produto)
+            for produto in ProdutoCRUD.listar_produtos_dados(db, skip=skip, limit=limit, after_id=after_id)
+        ]
+    
+    @staticmethod
+    def listar_produtos_dados(db: Session, skip: int = 0, limit: int = 100, after_id: Optional[int] = None) -> List[dict]:
+        """Página de produtos como dicionários no formato de schemas.Produto"""
+        chave = cache_produtos.chave_lista(skip, limit, after_id)
+        em_cache = cache_produtos.obter_lista(chave)
+        if em_cache is not None:
+            if not em_cache:
+                return []
+            estoque = db.execute(consulta_estoque([produto["id"] for produto in em_cache])).mappings()
+            produtos = completar_estoque(em_cache, estoque)
+            # Página com produtos excluídos por outro worker: lida de novo, para
+            # vir completa e manter o X-Next-Cursor
+            if len(produtos) == len(em_cache):
+                return produtos
+        
+        query = select(*COLUNAS_PRODUTO).order_by(models.Produto.id).limit(limit)
+        if after_id is not None:
+            # Paginação por cursor: busca direto no índice da chave primária
+            query = query.where(models.Produto.id > after_id)
+        else:
+            query = query.offset(skip)
+        produtos = [dict(linha) for linha in db.execute(query).mappings()]
+        cache_produtos.guardar_lista(chave, produtos)
+        return produtos
+    
+    @staticmethod
+    def listar_baixo_estoque(db: Session, limite: int, limit: int = 100,
+                             cursor: Optional[Tuple[int, int]] = None) -> List[models.Produto]:
+        """
+        Produtos com quantidade_estoque abaixo de `limite`, ordenados por
+        (quantidade_estoque, id). O cursor é o par (quantidade_estoque, id) do
+        último produto da página anterior; a busca percorre só o trecho do
+        índice ix_produtos_quantidade_estoque_id (ou do índice parcial, no
+        limite padrão) abaixo do limite.
+        """
+        query = db.query(models.Produto).filter(models.Produto.quantidade_estoque < limite)
+        if cursor is not None:
+            query = query.filter(tuple_(models.Produto.quantidade_estoque, models.Produto.id) > tuple_(*cursor))
+        return query.order_by(models.Produto.quantidade_estoque, models.Produto.id).limit(limit).all()
     
     @staticmethod
-    def listar_produtos(db: Session, skip: int = 0, limit: int = 100) -> List[models.Produto]:
-        return db.query(models.Produto).offset(skip).limit(limit).all()
+    def buscar_produtos(db: Session, termo: str, limit: int = 20) -> List[models.Produto]:
+        """
+        Busca produtos pelo nome ou descrição, aceitando prefixos, trechos e
+        pequenos erros de digitação. Os resultados vêm ordenados por relevância:
+        primeiro os nomes que começam com o termo, depois os que o contêm e por
+        fim os mais parecidos.
+        
+        No PostgreSQL usa os índices GIN de trigramas (pg_trgm); no SQLite, a
+        tabela FTS5 produtos_busca com tokenizador de trigramas.
+        """
+        nome = models.Produto.nome
+        prefixo = case((nome.istartswith(termo, autoescape=True), 0), else_=1)
+        contem = case((nome.icontains(termo, autoescape=True), 0), else_=1)
+        query = db.query(models.Produto)
+        
+        if db.get_bind().dialect.name == "postgresql":
+            similaridade = func.word_similarity(termo, nome)
+            query = query.filter(or_(
+                nome.icontains(termo, autoescape=True),
+                models.Produto.descricao.icontains(termo, autoescape=True),
+                literal(termo).op("<%")(nome),
+            )).order_by(prefixo, contem, similaridade.desc(), models.Produto.id)
+        elif len(termo) >= 3:
+            com_fts = query.join(produtos_busca, produtos_busca.c.rowid == models.Produto.id)
+            
+            # Com o tokenizador de trigramas, o termo entre aspas casa como trecho
+            encontrados = (
+                com_fts.filter(produtos_busca.c.produtos_busca.op("MATCH")('"' + termo.replace('"', '""') + '"'))
+                .order_by(prefixo, contem, models.Produto.id)
+                .limit(limit)
+                .all()
+            )
+            if len(encontrados) >= limit:
+                return encontrados
+            
+            # Completa com nomes parecidos: candidatos com qualquer trigrama do termo,
+            # filtrados pelo mesmo critério do operador <% do pg_trgm
+            trigramas = {termo.lower()[i:i + 3] for i in range(len(termo) - 2)}
+            expressao = " OR ".join('"' + trigrama.replace('"', '""') + '"' for trigrama in sorted(trigramas))
+            vistos = {produto.id for produto in encontrados}
+            candidatos = (
+                com_fts.filter(produtos_busca.c.produtos_busca.op("MATCH")(expressao))
+                # bm25 com peso maior para o nome do que para a descrição
+                .order_by(func.bm25(literal_column("produtos_busca"), 10.0, 1.0))
+                .limit(limit * 10)
+                .all()
+            )
+            parecidos = [
+                produto for produto in candidatos
+                if produto.id not in vistos and _similaridade_palavras(termo, produto.nome) >= 0.6
+            ]
+            parecidos.sort(key=lambda produto: -_similaridade_palavras(termo, produto.nome))
+            return (encontrados + parecidos)[:limit]
+        else:
+            # Termos curtos demais para trigramas: apenas prefixo e trecho
+            query = query.filter(or_(
+                nome.icontains(termo, autoescape=True),
+                models.Produto.descricao.icontains(termo, autoescape=True),
+            )).order_by(prefixo, contem, models.Produto.id)
+        
+        return query.limit(limit).all()
     
     @staticmethod
     def atualizar_produto(db: Session, produto_id: int, produto_update: schemas.ProdutoUpdate) -> Optional[models.Produto]:
-        db_produto = db.query(models.Produto).filter(models.Produto.id == produto_id).first()
+        db_produto = db.query(models.Produto).filter(models.Produto.id == produto_id).with_for_update().first()
         if not db_produto:
             return None
         
+        antes = (db_produto.preco, db_produto.quantidade_estoque)
         update_data = produto_update.model_dump(exclude_unset=True)
+        if update_data.get("quantidade_estoque", db_produto.quantidade_reservada) < db_produto.quantidade_reservada:
+            db.rollback()
+            raise HTTPException(
+                status_code=400,
+                detail=f"Quantidade em estoque menor que a reservada ({db_produto.quantidade_reservada})"
+            )
         for field, value in update_data.items():
             setattr(db_produto, field, value)
         
-        db.commit()
+        ResumoEstoqueCRUD.registrar(db, antes=[antes], depois=[(db_produto.preco, db_produto.quantidade_estoque)])
+        VersaoTabelaCRUD.incrementar(db, "produtos")
+        ProdutoCRUD._commit_sku_unico(db, db_produto.sku)
         db.refresh(db_produto)
+        cache_produtos.invalidar()
         return db_produto
     
     @staticmethod
     def excluir_produto(db: Session, produto_id: int) -> bool:
-        db_produto = db.query(models.Produto).filter(models.Produto.id == produto_id).first()
+        db_produto = db.query(models.Produto).filter(models.Produto.id == produto_id).with_for_update().first()
         if not db_produto:
             return False
+        if db_produto.quantidade_reservada:
+            db.rollback()
+            raise HTTPException(status_code=400, detail="Produto possui reservas ativas")
         
         db.delete(db_produto)
+        ResumoEstoqueCRUD.registrar(db, antes=[(db_produto.preco, db_produto.quantidade_estoque)], depois=[])
+        VersaoTabelaCRUD.incrementar(db, "produtos")
         db.commit()
+        cache_produtos.invalidar()
         return True
     
     @staticmethod
-    def atualizar_estoque(db: Session, produto_id: int, quantidade: int) -> bool:
-        """Atualiza a quantidade em estoque de um produto"""
-        db_produto = db.query(models.Produto).filter(models.Produto.id == produto_id).first()
-        if not db_produto:
-            return False
+    def upsert_produtos(db: Session, produtos: List[schemas.ProdutoCreate]) -> Tuple[int, List[Tuple[int, str]]]:
+        """
+        Insere ou atualiza vários produtos com até dois comandos (SKUs novos e
+        existentes), usando o SKU como chave natural (INSERT ... ON CONFLICT no
+        PostgreSQL e no SQLite).
+        Produtos sem SKU são sempre inseridos. Como em atualizar_produto, o
+        estoque de um produto existente não pode ficar abaixo do reservado:
+        essas linhas são recusadas, assim como as de SKUs criados por outra
+        transação durante o comando. Retorna o número de produtos gravados e
+        as recusadas, como (posição em `produtos`, erro). Não faz commit; após
+        o commit o chamador deve limpar o cache de produtos.
+        """
+        # Um mesmo comando não pode atualizar a mesma linha duas vezes: prevalece
+        # a última ocorrência de cada SKU
+        linhas = {}
+        for indice, produto in enumerate(produtos):
+            linhas[produto.sku if produto.sku is not None else ("sem_sku", indice)] = (indice, produto.model_dump())
+        if not linhas:
+            return 0, []
+        
+        # Estado anterior dos produtos que serão sobrescritos, bloqueados até o
+        # commit: base do resumo do estoque e da checagem das reservas
+        skus = [linha["sku"] for _, linha in linhas.values() if linha["sku"] is not None]
+        existentes = {
+            sku: (preco, quantidade_estoque, quantidade_reservada)
+            for sku, preco, quantidade_estoque, quantidade_reservada in (
+                db.query(models.Produto.sku, models.Produto.preco, models.Produto.quantidade_estoque,
+                         models.Produto.quantidade_reservada)
+                .filter(models.Produto.sku.in_(skus))
+                .with_for_update()
+            )
+        } if skus else {}
+        
+        recusadas = []
+        for chave, (indice, linha) in list(linhas.items()):
+            reservada = existentes[linha["sku"]][2] if linha["sku"] in existentes else 0
+            if linha["quantidade_estoque"] < reservada:
+                recusadas.append((indice, f"quantidade_estoque: menor que a quantidade reservada ({reservada})"))
+                del linhas[chave]
+        if not linhas:
+            return 0, recusadas
         
-        nova_quantidade = db_produto.quantidadeEstoque + quantidade
-        if nova_quantidade < 0:
+        dialeto = db.get_bind().dialect.name
+        insert_dialeto = postgresql_insert if dialeto == "postgresql" else sqlite_insert
+        # SKUs novos só são inseridos: se outra transação criou o mesmo SKU depois
+        # da leitura acima, o estado anterior dele não é conhecido
+        novos = [linha for _, linha in linhas.values() if linha["sku"] not in existentes]
+        atualizados = [linha for _, linha in linhas.values() if linha["sku"] in existentes]
+        gravados = []
+        if novos:
+            stmt = insert_dialeto(models.Produto).on_conflict_do_nothing(index_elements=[models.Produto.sku])
+            gravados += db.scalars(stmt.returning(models.Produto.sku), novos).all()
+        if atualizados:
+            stmt = insert_dialeto(models.Produto)
+            stmt = stmt.on_conflict_do_update(
+                index_elements=[models.Produto.sku],
+                set_={
+                    "nome": stmt.excluded.nome,
+                    "descricao": stmt.excluded.descricao,
+                    "preco": stmt.excluded.preco,
+                    "quantidade_estoque": stmt.excluded.quantidade_estoque,
+                },
+                # Garantia no próprio banco, além da checagem acima
+                where=stmt.excluded.quantidade_estoque >= models.Produto.quantidade_reservada,
+            )
+            gravados += db.scalars(stmt.returning(models.Produto.sku), atualizados).all()
+        
+        # O RETURNING traz só as linhas inseridas ou atualizadas de fato
+        skus_gravados = {sku for sku in gravados if sku is not None}
+        for chave, (indice, linha) in list(linhas.items()):
+            if linha["sku"] is not None and linha["sku"] not in skus_gravados:
+                recusadas.append((indice, f"sku: {linha['sku']} gravado por outra transação durante a importação"))
+                del linhas[chave]
+        if not linhas:
+            return 0, recusadas
+        
+        ResumoEstoqueCRUD.registrar(
+            db,
+            antes=[existentes[linha["sku"]][:2] for _, linha in linhas.values() if linha["sku"] in existentes],
+            depois=[(linha["preco"], linha["quantidade_estoque"]) for _, linha in linhas.values()],
+        )
+        VersaoTabelaCRUD.incrementar(db, "produtos")
+        return len(linhas), recusadas
+    
+    @staticmethod
+    def _aplicar_deltas_estoque(db: Session, deltas: Dict[int, int]) -> List[Tuple[int, float, int]]:
+        """
+        Soma a cada produto a variação informada em um único UPDATE, sem que
+        uma saída consuma unidades reservadas (ver ReservaCRUD), e registra a
+        diferença no resumo do estoque.
+        Retorna (id, preço, novo estoque) dos produtos atualizados; os que
+        faltarem na resposta não existem ou ficariam negativos, e nesse caso a
+        transação deve ser desfeita pelo chamador. Não faz commit.
+        """
+        delta_por_id = case(deltas, value=models.Produto.id)
+        atualizados = db.execute(
+            update(models.Produto)
+            .where(
+                models.Produto.id.in_(list(deltas)),
+                or_(
+                    delta_por_id >= 0,
+                    models.Produto.quantidade_estoque - models.Produto.quantidade_reservada + delta_por_id >= 0,
+                ),
+            )
+            .values(quantidade_estoque=models.Produto.quantidade_estoque + delta_por_id)
+            .returning(models.Produto.id, models.Produto.preco, models.Produto.quantidade_estoque)
+            .execution_options(synchronize_session=False)
+        ).all()
+        
+        # O RETURNING traz o estoque já alterado, mesmo sem bloqueio prévio das linhas
+        ResumoEstoqueCRUD.registrar(
+            db,
+            antes=[(preco, quantidade - deltas[produto_id]) for produto_id, preco, quantidade in atualizados],
+            depois=[(preco, quantidade) for _, preco, quantidade in atualizados],
+        )
+        VersaoTabelaCRUD.incrementar(db, "produtos")
+        return [tuple(linha) for linha in atualizados]
+    
+    @staticmethod
+    def atualizar_estoque(db: Session, produto_id: int, quantidade: int) -> Optional[schemas.Produto]:
+        """Soma `quantidade` (positiva ou negativa) ao estoque de um produto de forma atômica"""
+        if not ProdutoCRUD._aplicar_deltas_estoque(db, {produto_id: quantidade}):
+            db.rollback()
+            if db.get(models.Produto, produto_id) is None:
+                return None
             raise HTTPException(status_code=400, detail="Quantidade em estoque insuficiente")
         
-        db_produto.quantidadeEstoque = nova_quantidade
         db.commit()
-        return True
+        return ProdutoCRUD.obter_produto(db, produto_id)
+    
+    @staticmethod
+    def atualizar_estoque_em_lote(db: Session, ajustes: List[schemas.AjusteEstoqueLote]) -> List[dict]:
+        """
+        Aplica vários ajustes de estoque (ex.: recebimento de mercadoria) em um
+        único UPDATE. Ajustes do mesmo produto são somados. Se algum produto não
+        existir ou ficar com estoque negativo, nada é alterado.
+        """
+        deltas: Dict[int, int] = {}
+        for ajuste in ajustes:
+            deltas[ajuste.produto_id] = deltas.get(ajuste.produto_id, 0) + ajuste.delta
+        
+        atualizados = ProdutoCRUD._aplicar_deltas_estoque(db, deltas)
+        if len(atualizados) != len(deltas):
+            db.rollback()
+            rejeitados = sorted(set(deltas) - {produto_id for produto_id, _, _ in atualizados})
+            raise HTTPException(
+                status_code=400,
+                detail=f"Produtos inexistentes ou com estoque insuficiente: {rejeitados}"
+            )
+        
+        db.commit()
+        return [
+            {"produto_id": produto_id, "quantidade_estoque": quantidade}
+            for produto_id, _, quantidade in sorted(atualizados)
+        ]
 
 # Operações CRUD para Pedidos
 class PedidoCRUD:
+    @staticmethod
+    def _agrupar_itens(itens: List[schemas.ItemPedidoCreate]) -> Dict[int, int]:
+        """Soma as quantidades de itens repetidos do mesmo produto"""
+        quantidades: Dict[int, int] = {}
+        for item in itens:
+            quantidades[item.produto_id] = quantidades.get(item.produto_id, 0) + item.quantidade
+        return quantidades
+    
+    @staticmethod
+    def _baixar_estoque(db: Session, quantidades: Dict[int, int]) -> bool:
+        """
+        Baixa o estoque de vários produtos em um único UPDATE condicional.
+        Retorna False se algum produto não tinha estoque suficiente; nesse caso
+        a transação deve ser desfeita pelo chamador.
+        """
+        deltas = {produto_id: -quantidade for produto_id, quantidade in quantidades.items()}
+        return len(ProdutoCRUD._aplicar_deltas_estoque(db, deltas)) == len(quantidades)
+    
     @staticmethod
     def criar_pedido(db: Session, pedido: schemas.PedidoCreate) -> models.Pedido:
+        db_pedido = PedidoCRUD._inserir_pedido(db, pedido)
+        db.commit()
+        db.refresh(db_pedido)
+        metricas.PEDIDOS_CRIADOS.labels("pedido").inc()
+        return db_pedido
+    
+    @staticmethod
+    def criar_pedido_idempotente(db: Session, pedido: schemas.PedidoCreate, chave: str) -> Tuple[str, bool]:
+        """
+        Cria o pedido uma única vez por Idempotency-Key. Retorna o JSON da
+        resposta e se ele foi repetido de uma requisição anterior. A chave é
+        gravada antes de bloquear os produtos: uma requisição concorrente com
+        a mesma chave espera no índice único (PostgreSQL) e, quando a primeira
+        termina, recebe a resposta dela.
+        """
+        hash_requisicao = IdempotenciaCRUD.hash_requisicao(pedido)
+        resposta = IdempotenciaCRUD.obter_resposta(db, chave, hash_requisicao)
+        if resposta is not None:
+            return resposta, True
+        
+        registro = IdempotenciaCRUD.registrar(db, chave, hash_requisicao)
+        if registro is None:
+            resposta = IdempotenciaCRUD.obter_resposta(db, chave, hash_requisicao)
+            if resposta is None:
+                raise HTTPException(status_code=409, detail="Requisição com esta Idempotency-Key em andamento")
+            return resposta, True
+        
+        db_pedido = PedidoCRUD._inserir_pedido(db, pedido)
+        db.flush()
+        db.refresh(db_pedido)
+        resposta = schemas.Pedido.model_validate(db_pedido).model_dump_json()
+        registro.resposta = resposta
+        db.commit()
+        metricas.PEDIDOS_CRIADOS.labels("pedido").inc()
+        return resposta, False
+    
+    @staticmethod
+    def _inserir_pedido(db: Session, pedido: schemas.PedidoCreate) -> models.Pedido:
+        """Valida o pedido, baixa o estoque e adiciona o pedido à sessão. Não faz commit."""
+        quantidades = PedidoCRUD._agrupar_itens(pedido.itens)
+        produto_ids = sorted(quantidades)
+        
+        # Buscar e bloquear todos os produtos de uma vez, sempre na ordem crescente
+        # de ID para que pedidos concorrentes nunca entrem em deadlock
+        produtos = (
+            db.query(models.Produto)
+            .filter(models.Produto.id.in_(produto_ids))
+            .order_by(models.Produto.id)
+            .with_for_update()
+            .all()
+        )
+        produtos_por_id = {produto.id: produto for produto in produtos}
+        
         # Validar se todos os produtos existem e têm estoque suficiente
         valor_total = 0.0
-        itens_validados = []
-        
-        for item in pedido.itens:
-            produto = db.query(models.Produto).filter(models.Produto.id == item.produto_id).first()
+        for produto_id in produto_ids:
+            produto = produtos_por_id.get(produto_id)
             if not produto:
-                raise HTTPException(status_code=404, detail=f"Produto com ID {item.produto_id} não encontrado")
+                raise HTTPException(status_code=404, detail=f"Produto com ID {produto_id} não encontrado")
             
-            if produto.quantidade_estoque < item.quantidade:
+            disponivel = produto.quantidade_estoque - produto.quantidade_reservada
+            if disponivel < quantidades[produto_id]:
+                metricas.PEDIDOS_SEM_ESTOQUE.labels("pedido").inc()
                 raise HTTPException(
                     status_code=400, 
-                    detail=f"Estoque insuficiente para o produto '{produto.nome}'. Disponível: {produto.quantidade_estoque}, Solicitado: {item.quantidade}"
+                    detail=f"Estoque insuficiente para o produto '{produto.nome}'. Disponível: {disponivel}, Solicitado: {quantidades[produto_id]}"
                 )
             
-            valor_item = produto.preco * item.quantidade
-            valor_total += valor_item
-            
-            itens_validados.append({
-                'produto': produto,
-                'quantidade': item.quantidade,
-                'valor_item': valor_item
-            })
+            valor_total += produto.preco * quantidades[produto_id]
         
-        # Criar o pedido
+        if not PedidoCRUD._baixar_estoque(db, quantidades):
+            db.rollback()
+            metricas.PEDIDOS_SEM_ESTOQUE.labels("pedido").inc()
+            raise HTTPException(status_code=400, detail="Estoque insuficiente para um ou mais produtos do pedido")
+        
+        # Criar o pedido e gravar todos os itens em um único INSERT (os itens
+        # são carregados na resposta, depois do commit)
         db_pedido = models.Pedido(
             cliente=pedido.cliente,
             valorTotalPedido=valor_total
         )
         db.add(db_pedido)
-        db.flush()  # Para obter o ID do pedido
+        db.flush()
+        db.execute(insert(models.ItemPedido), [
+            {
+                "pedido_id": db_pedido.id,
+                "produto_id": produto_id,
+                "nome_produto": produtos_por_id[produto_id].nome,
+                "quantidade": quantidades[produto_id],
+                "preco_unitario": produtos_por_id[produto_id].preco,
+                "valor_total_item": produtos_por_id[produto_id].preco * quantidades[produto_id],
+            }
+            for produto_id in produto_ids
+        ])
+        
+        VersaoTabelaCRUD.incrementar(db, "pedidos")
+        return db_pedido
+    
+    @staticmethod
+    def criar_pedidos_em_lote(db: Session, pedidos: List[schemas.PedidoCreate], tamanho_chunk: int) -> List[dict]:
+        """
+        Cria vários pedidos de uma vez. Cada chunk de até `tamanho_chunk` pedidos
+        é validado em memória contra um único snapshot dos produtos e gravado em
+        uma transação, com INSERTs de várias linhas e um único UPDATE de estoque.
+        Pedidos inválidos são rejeitados individualmente sem afetar os demais.
+        """
+        resultados = []
+        for inicio in range(0, len(pedidos), tamanho_chunk):
+            chunk = pedidos[inicio:inicio + tamanho_chunk]
+            resultados.extend(PedidoCRUD._criar_chunk_pedidos(db, chunk, inicio))
+        return resultados
+    
+    @staticmethod
+    def _criar_chunk_pedidos(db: Session, pedidos: List[schemas.PedidoCreate], deslocamento: int) -> List[dict]:
+        quantidades_por_pedido = [PedidoCRUD._agrupar_itens(pedido.itens) for pedido in pedidos]
+        produto_ids = sorted({produto_id for quantidades in quantidades_por_pedido for produto_id in quantidades})
+        
+        produtos = (
+            db.query(models.Produto)
+            .filter(models.Produto.id.in_(produto_ids))
+            .order_by(models.Produto.id)
+            .with_for_update()
+            .all()
+        )
+        produtos_por_id = {produto.id: produto for produto in produtos}
+        estoque = {produto.id: produto.quantidade_estoque - produto.quantidade_reservada for produto in produtos}
         
-        # Criar os itens do pedido e atualizar estoque
-        for item_validado in itens_validados:
-            produto = item_validado['produto']
+        # Validar os pedidos em sequência, consumindo o estoque do snapshot
+        resultados = []
+        aceitos = []
+        baixa_total: Dict[int, int] = {}
+        for indice, (pedido, quantidades) in enumerate(zip(pedidos, quantidades_por_pedido), start=deslocamento):
+            erro = None
+            for produto_id, quantidade in sorted(quantidades.items()):
+                if produto_id not in produtos_por_id:
+                    erro = f"Produto com ID {produto_id} não encontrado"
+                    break
+                if estoque[produto_id] < quantidade:
+                    erro = (f"Estoque insuficiente para o produto '{produtos_por_id[produto_id].nome}'. "
+                            f"Disponível: {estoque[produto_id]}, Solicitado: {quantidade}")
+                    metricas.PEDIDOS_SEM_ESTOQUE.labels("lote").inc()
+                    break
             
-            # Criar item do pedido
-            db_item = models.ItemPedido(
-                pedido_id=db_pedido.id,
-                produto_id=produto.id,
-                nome_produto=produto.nome,
-                quantidade=item_validado['quantidade'],
-                preco_unitario=produto.preco,
-                valor_total_item=item_validado['valor_item']
-            )
-            db.add(db_item)
+            resultado = {"indice": indice, "sucesso": erro is None, "pedido_id": None, "erro": erro}
+            resultados.append(resultado)
+            if erro:
+                continue
             
-            # Atualizar estoque
-            produto.quantidade_estoque -= item_validado['quantidade']
+            for produto_id, quantidade in quantidades.items():
+                estoque[produto_id] -= quantidade
+                baixa_total[produto_id] = baixa_total.get(produto_id, 0) + quantidade
+            aceitos.append((resultado, pedido, quantidades))
+        
+        if not aceitos:
+            db.rollback()
+            return resultados
+        
+        if not PedidoCRUD._baixar_estoque(db, baixa_total):
+            db.rollback()
+            for resultado, _, _ in aceitos:
+                resultado.update(sucesso=False, erro="Estoque alterado por outra operação durante o lote")
+            metricas.PEDIDOS_SEM_ESTOQUE.labels("lote").inc(len(aceitos))
+            return resultados
+        
+        # Inserir todos os pedidos do chunk em um único INSERT de várias linhas
+        pedido_ids = inserir_retornando_ids(db, models.Pedido, [
+            {
+                "cliente": pedido.cliente,
+                "valorTotalPedido": sum(produtos_por_id[produto_id].preco * quantidade
+                                        for produto_id, quantidade in quantidades.items()),
+            }
+            for _, pedido, quantidades in aceitos
+        ])
         
+        itens = []
+        for pedido_id, (resultado, _, quantidades) in zip(pedido_ids, aceitos):
+            resultado["pedido_id"] = pedido_id
+            for produto_id, quantidade in sorted(quantidades.items()):
+                produto = produtos_por_id[produto_id]
+                itens.append({
+                    "pedido_id": pedido_id,
+                    "produto_id": produto_id,
+                    "nome_produto": produto.nome,
+                    "quantidade": quantidade,
+                    "preco_unitario": produto.preco,
+                    "valor_total_item": produto.preco * quantidade,
+                })
+        db.execute(insert(models.ItemPedido), itens)
+        
+        VersaoTabelaCRUD.incrementar(db, "pedidos")
         db.commit()
-        db.refresh(db_pedido)
-        return db_pedido
+        metricas.PEDIDOS_CRIADOS.labels("lote").inc(len(aceitos))
+        return resultados
     
     @staticmethod
     def obter_pedido(db: Session, pedido_id: int) -> Optional[models.Pedido]:
-        return db.query(models.Pedido).filter(models.Pedido.id == pedido_id).first()
+        return (
+            db.query(models.Pedido)
+            .options(selectinload(models.Pedido.itens))
+            .filter(models.Pedido.id == pedido_id)
+            .first()
+        )
+    
+    @staticmethod
+    def listar_pedidos(db: Session, skip: int = 0, limit: int = 100, after_id: Optional[int] = None) -> List[models.Pedido]:
+        # Itens de todos os pedidos da página em uma única consulta extra
+        query = db.query(models.Pedido).options(selectinload(models.Pedido.itens)).order_by(models.Pedido.id)
+        if after_id is not None:
+            # Paginação por cursor: busca direto no índice da chave primária
+            return query.filter(models.Pedido.id > after_id).limit(limit).all()
+        return query.offset(skip).limit(limit).all()
+    
+    @staticmethod
+    def itens_por_pedido(db: Session, pedido_ids: List[int]) -> Dict[int, List[dict]]:
+        """Itens dos pedidos informados, em uma consulta, no formato de schemas.ItemPedido"""
+        itens: Dict[int, List[dict]] = {pedido_id: [] for pedido_id in pedido_ids}
+        if not pedido_ids:
+            return itens
+        for item in db.execute(
+            select(*COLUNAS_ITEM_PEDIDO)
+            .where(models.ItemPedido.pedido_id.in_(pedido_ids))
+            .order_by(models.ItemPedido.pedido_id, models.ItemPedido.id)
+        ).mappings():
+            itens[item["pedido_id"]].append(dict(item))
+        return itens
+    
+    @staticmethod
+    def _montar_pedidos_dados(db: Session, linhas) -> List[dict]:
+        pedidos = [dict(linha) for linha in linhas]
+        itens = PedidoCRUD.itens_por_pedido(db, [pedido["id"] for pedido in pedidos])
+        # Mesma ordem de campos de schemas.Pedido
+        return [
+            {"id": pedido["id"], "cliente": pedido["cliente"], "itens": itens[pedido["id"]],
+             "valorTotalPedido": pedido["valorTotalPedido"], "dataPedido": pedido["dataPedido"]}
+            for pedido in pedidos
+        ]
     
     @staticmethod
-    def listar_pedidos(db: Session, skip: int = 0, limit: int = 100) -> List[models.Pedido]:
-        return db.query(models.Pedido).offset(skip).limit(limit).all()
+    def obter_pedido_dados(db: Session, pedido_id: int) -> Optional[dict]:
+        """Pedido com itens como dicionário, lido por colunas, sem objetos ORM"""
+        linhas = db.execute(select(*COLUNAS_PEDIDO).where(models.Pedido.id == pedido_id)).mappings().all()
+        pedidos = PedidoCRUD._montar_pedidos_dados(db, linhas)
+        return pedidos[0] if pedidos else None
+    
+    @staticmethod
+    def listar_pedidos_dados(db: Session, skip: int = 0, limit: int = 100, after_id: Optional[int] = None) -> List[dict]:
+        """Página de pedidos com itens como dicionários (mesma paginação de listar_pedidos)"""
+        query = select(*COLUNAS_PEDIDO).order_by(models.Pedido.id).limit(limit)
+        if after_id is not None:
+            query = query.where(models.Pedido.id > after_id)
+        else:
+            query = query.offset(skip)
+        return PedidoCRUD._montar_pedidos_dados(db, db.execute(query).mappings().all())
     
     @staticmethod
     def atualizar_pedido(db: Session, pedido_id: int, pedido_update: schemas.PedidoUpdate) -> Optional[models.Pedido]:
-        db_pedido = db.query(models.Pedido).filter(models.Pedido.id == pedido_id).first()
+        db_pedido = db.query(models.Pedido).filter(models.Pedido.id == pedido_id).with_for_update().first()
         if not db_pedido:
             return None
         
-        update_data = pedido_update.model_dump(exclude_unset=True)
-        
-        # Se há novos itens, recriar o pedido
-        if 'itens' in update_data:
-            # Restaurar estoque dos itens antigos
-            for item in db_pedido.itens:
-                produto = db.query(models.Produto).filter(models.Produto.id == item.produto_id).first()
-                if produto:
-                    produto.quantidade_estoque += item.quantidade
-            
-            # Remover itens antigos
-            db.query(models.ItemPedido).filter(models.ItemPedido.pedido_id == pedido_id).delete()
-            
-            # Criar novos itens (similar ao criar_pedido)
-            valor_total = 0.0
-            for item in update_data['itens']:
-                produto = db.query(models.Produto).filter(models.Produto.id == item.produto_id).first()
-                if not produto:
-                    raise HTTPException(status_code=404, detail=f"Produto com ID {item.produto_id} não encontrado")
-                
-                if produto.quantidade_estoque < item.quantidade:
-                    raise HTTPException(
-                        status_code=400, 
-                        detail=f"Estoque insuficiente para o produto '{produto.nome}'"
-                    )
-                
-                valor_item = produto.preco * item.quantidade
-                valor_total += valor_item
-                
-                db_item = models.ItemPedido(
-                    pedido_id=pedido_id,
-                    produto_id=produto.id,
-                    nome_produto=produto.nome,
-                    quantidade=item.quantidade,
-                    preco_unitario=produto.preco,
-                    valor_total_item=valor_item
-                )
-                db.add(db_item)
-                produto.quantidade_estoque -= item.quantidade
-            
-            db_pedido.valorTotalPedido = valor_total
+        if pedido_update.itens is not None:
+            PedidoCRUD._atualizar_itens(db, db_pedido, pedido_update.itens)
         
-        # Atualizar outros campos
-        if 'cliente' in update_data:
-            db_pedido.cliente = update_data['cliente']
+        if pedido_update.cliente is not None:
+            db_pedido.cliente = pedido_update.cliente
         
+        VersaoTabelaCRUD.incrementar(db, "pedidos")
         db.commit()
         db.refresh(db_pedido)
         return db_pedido
     
+    @staticmethod
+    def _atualizar_itens(db: Session, db_pedido: models.Pedido, itens: List[schemas.ItemPedidoCreate]):
+        """
+        Aplica a nova lista de itens comparando-a com a atual: o estoque só é
+        ajustado nos produtos cuja quantidade mudou, com um único UPDATE, e
+        só as linhas de itens_pedido alteradas são apagadas, atualizadas ou
+        inseridas. Itens mantidos conservam o preço unitário do pedido;
+        produtos novos entram com o preço atual. Não faz commit.
+        """
+        novas = PedidoCRUD._agrupar_itens(itens)
+        antigos: Dict[int, List[models.ItemPedido]] = {}
+        for item in db_pedido.itens:
+            antigos.setdefault(item.produto_id, []).append(item)
+        antigas = {produto_id: sum(item.quantidade for item in linhas) for produto_id, linhas in antigos.items()}
+        
+        # Variação de estoque por produto: positiva devolve, negativa baixa
+        deltas = {
+            produto_id: antigas.get(produto_id, 0) - novas.get(produto_id, 0)
+            for produto_id in set(antigas) | set(novas)
+            if antigas.get(produto_id, 0) != novas.get(produto_id, 0)
+        }
+        if not deltas:
+            return
+        
+        # Bloquear os produtos alterados sempre na ordem crescente de ID
+        produtos = {
+            produto.id: produto
+            for produto in db.query(models.Produto)
+            .filter(models.Produto.id.in_(sorted(deltas)))
+            .order_by(models.Produto.id)
+            .with_for_update()
+        }
+        for produto_id, delta in sorted(deltas.items()):
+            produto = produtos.get(produto_id)
+            if produto is None:
+                if produto_id in novas:
+                    db.rollback()
+                    raise HTTPException(status_code=404, detail=f"Produto com ID {produto_id} não encontrado")
+                continue
+            disponivel = produto.quantidade_estoque - produto.quantidade_reservada
+            if delta < 0 and disponivel < -delta:
+                db.rollback()
+                raise HTTPException(
+                    status_code=400,
+                    detail=f"Estoque insuficiente para o produto '{produto.nome}'. Disponível: {disponivel}, Solicitado: {-delta}"
+                )
+        
+        deltas_existentes = {produto_id: delta for produto_id, delta in deltas.items() if produto_id in produtos}
+        if deltas_existentes and len(ProdutoCRUD._aplicar_deltas_estoque(db, deltas_existentes)) != len(deltas_existentes):
+            db.rollback()
+            raise HTTPException(status_code=400, detail="Estoque insuficiente para um ou mais produtos do pedido")
+        
+        # Preço unitário de cada produto no pedido atualizado
+        precos = {produto_id: linhas[0].preco_unitario for produto_id, linhas in antigos.items()}
+        precos.update({produto_id: produtos[produto_id].preco for produto_id in novas if produto_id not in antigos})
+        
+        # Pedidos antigos podem ter mais de uma linha do mesmo produto: viram uma só
+        removidos = [produto_id for produto_id in deltas
+                     if produto_id in antigos and (produto_id not in novas or len(antigos[produto_id]) > 1)]
+        alterados = {produto_id: novas[produto_id] for produto_id in deltas
+                     if produto_id in antigos and produto_id in novas and len(antigos[produto_id]) == 1}
+        inseridos = [produto_id for produto_id in sorted(deltas)
+                     if produto_id in novas and produto_id not in alterados]
+        
+        if removidos:
+            db.execute(
+                delete(models.ItemPedido)
+                .where(models.ItemPedido.pedido_id == db_pedido.id, models.ItemPedido.produto_id.in_(removidos))
+                .execution_options(synchronize_session=False)
+            )
+        if alterados:
+            quantidade_por_produto = case(alterados, value=models.ItemPedido.produto_id)
+            db.execute(
+                update(models.ItemPedido)
+                .where(models.ItemPedido.pedido_id == db_pedido.id,
+                       models.ItemPedido.produto_id.in_(list(alterados)))
+                .values(quantidade=quantidade_por_produto,
+                        valor_total_item=models.ItemPedido.preco_unitario * quantidade_por_produto)
+                .execution_options(synchronize_session=False)
+            )
+        if inseridos:
+            db.execute(insert(models.ItemPedido), [
+                {
+                    "pedido_id": db_pedido.id,
+                    "produto_id": produto_id,
+                    "nome_produto": antigos[produto_id][0].nome_produto if produto_id in antigos else produtos[produto_id].nome,
+                    "quantidade": novas[produto_id],
+                    "preco_unitario": precos[produto_id],
+                    "valor_total_item": precos[produto_id] * novas[produto_id],
+                }
+                for produto_id in inseridos
+            ])
+        
+        db_pedido.valorTotalPedido = sum(precos[produto_id] * quantidade for produto_id, quantidade in novas.items())
+        # Os itens foram alterados direto no banco: recarregar na próxima leitura
+        db.expire(db_pedido, ["itens"])
+        return sorted(deltas_existentes)
+    
     @staticmethod
     def excluir_pedido(db: Session, pedido_id: int) -> bool:
-        db_pedido = db.query(models.Pedido).filter(models.Pedido.id == pedido_id).first()
-        if not db_pedido:
+        return bool(PedidoCRUD.excluir_pedidos(db, [pedido_id]))
+    
+    @staticmethod
+    def excluir_pedidos(db: Session, pedido_ids: List[int]) -> List[int]:
+        """
+        Exclui vários pedidos em uma transação e devolve ao estoque a soma dos
+        seus itens com um único UPDATE ... FROM (SELECT produto_id,
+        SUM(quantidade) ...), independente do número de pedidos e itens.
+        Retorna os IDs excluídos; os inexistentes são ignorados.
+        """
+        existentes = list(db.execute(
+            select(models.Pedido.id)
+            .where(models.Pedido.id.in_(sorted(set(pedido_ids))))
+            .order_by(models.Pedido.id)
+            .with_for_update()
+        ).scalars())
+        if not existentes:
+            db.rollback()
+            return []
+        
+        devolucao = (
+            select(models.ItemPedido.produto_id, func.sum(models.ItemPedido.quantidade).label("quantidade"))
+            .where(models.ItemPedido.pedido_id.in_(existentes))
+            .group_by(models.ItemPedido.produto_id)
+            .subquery()
+        )
+        
+        # Bloquear os produtos na ordem crescente de ID e guardar o estado anterior para o resumo
+        anteriores = db.execute(
+            select(models.Produto.id, models.Produto.preco, models.Produto.quantidade_estoque, devolucao.c.quantidade)
+            .join(devolucao, devolucao.c.produto_id == models.Produto.id)
+            .order_by(models.Produto.id)
+            .with_for_update(of=models.Produto)
+        ).all()
+        if anteriores:
+            db.execute(
+                update(models.Produto)
+                .where(models.Produto.id == devolucao.c.produto_id)
+                .values(quantidade_estoque=models.Produto.quantidade_estoque + devolucao.c.quantidade)
+                .execution_options(synchronize_session=False)
+            )
+        
+        db.execute(
+            delete(models.ItemPedido)
+            .where(models.ItemPedido.pedido_id.in_(existentes))
+            .execution_options(synchronize_session=False)
+        )
+        db.execute(
+            delete(models.Pedido)
+            .where(models.Pedido.id.in_(existentes))
+            .execution_options(synchronize_session=False)
+        )
+        
+        ResumoEstoqueCRUD.registrar(
+            db,
+            antes=[(preco, quantidade) for _, preco, quantidade, _ in anteriores],
+            depois=[(preco, quantidade + devolvida) for _, preco, quantidade, devolvida in anteriores],
+        )
+        VersaoTabelaCRUD.incrementar(db, "produtos", "pedidos")
+        db.commit()
+        cache_produtos.invalidar()
+        return existentes
+
+# Reservas de estoque com prazo de validade
+class ReservaCRUD:
+    """
+    Uma reserva separa unidades de estoque para um cliente até expirar. O
+    total reservado de cada produto fica em Produto.quantidade_reservada,
+    atualizado junto com as reservas, e o disponível para venda ou nova
+    reserva é quantidade_estoque - quantidade_reservada.
+    """
+    
+    @staticmethod
+    def _agora() -> datetime:
+        return datetime.now(timezone.utc)
+    
+    @staticmethod
+    def criar_reserva(db: Session, reserva: schemas.ReservaCreate, ttl_segundos: int) -> models.Reserva:
+        quantidades = PedidoCRUD._agrupar_itens(reserva.itens)
+        produto_ids = sorted(quantidades)
+        
+        # Bloqueia os produtos na ordem crescente de ID (sem deadlock entre reservas)
+        existentes = set(db.execute(
+            select(models.Produto.id)
+            .where(models.Produto.id.in_(produto_ids))
+            .order_by(models.Produto.id)
+            .with_for_update()
+        ).scalars())
+        for produto_id in produto_ids:
+            if produto_id not in existentes:
+                db.rollback()
+                raise HTTPException(status_code=404, detail=f"Produto com ID {produto_id} não encontrado")
+        
+        # Um único UPDATE condicional reserva todos os produtos que têm saldo disponível
+        delta_por_id = case(quantidades, value=models.Produto.id)
+        reservados = set(db.execute(
+            update(models.Produto)
+            .where(
+                models.Produto.id.in_(produto_ids),
+                models.Produto.quantidade_estoque - models.Produto.quantidade_reservada >= delta_por_id,
+            )
+            .values(quantidade_reservada=models.Produto.quantidade_reservada + delta_por_id)
+            .returning(models.Produto.id)
+            .execution_options(synchronize_session=False)
+        ).scalars())
+        if len(reservados) != len(produto_ids):
+            db.rollback()
+            raise HTTPException(
+                status_code=400,
+                detail=f"Estoque disponível insuficiente para os produtos: {sorted(set(produto_ids) - reservados)}"
+            )
+        
+        db_reserva = models.Reserva(
+            cliente=reserva.cliente,
+            expira_em=ReservaCRUD._agora() + timedelta(seconds=ttl_segundos),
+        )
+        db.add(db_reserva)
+        db.flush()
+        db.execute(insert(models.ItemReserva), [
+            {"reserva_id": db_reserva.id, "produto_id": produto_id, "quantidade": quantidades[produto_id]}
+            for produto_id in produto_ids
+        ])
+        VersaoTabelaCRUD.incrementar(db, "produtos")
+        db.commit()
+        db.refresh(db_reserva)
+        return db_reserva
+    
+    @staticmethod
+    def _bloquear(db: Session, reserva_id: int) -> Optional[models.Reserva]:
+        return db.query(models.Reserva).filter(models.Reserva.id == reserva_id).with_for_update().first()
+    
+    @staticmethod
+    def _liberar(db: Session, reserva_ids: List[int]):
+        """
+        Apaga as reservas e devolve as unidades ao disponível com um único
+        UPDATE. Não faz commit.
+        """
+        itens = db.execute(
+            delete(models.ItemReserva)
+            .where(models.ItemReserva.reserva_id.in_(reserva_ids))
+            .returning(models.ItemReserva.produto_id, models.ItemReserva.quantidade)
+            .execution_options(synchronize_session=False)
+        ).all()
+        db.execute(
+            delete(models.Reserva)
+            .where(models.Reserva.id.in_(reserva_ids))
+            .execution_options(synchronize_session=False)
+        )
+        
+        liberadas: Dict[int, int] = {}
+        for produto_id, quantidade in itens:
+            liberadas[produto_id] = liberadas.get(produto_id, 0) + quantidade
+        if liberadas:
+            db.execute(
+                update(models.Produto)
+                .where(models.Produto.id.in_(sorted(liberadas)))
+                .values(quantidade_reservada=models.Produto.quantidade_reservada
+                        - case(liberadas, value=models.Produto.id))
+                .execution_options(synchronize_session=False)
+            )
+            VersaoTabelaCRUD.incrementar(db, "produtos")
+    
+    @staticmethod
+    def liberar_reserva(db: Session, reserva_id: int) -> bool:
+        if ReservaCRUD._bloquear(db, reserva_id) is None:
+            db.rollback()
             return False
         
-        # Restaurar estoque dos produtos
-        for item in db_pedido.itens:
-            produto = db.query(models.Produto).filter(models.Produto.id == item.produto_id).first()
-            if produto:
-                produto.quantidade_estoque += item.quantidade
+        ReservaCRUD._liberar(db, [reserva_id])
+        db.commit()
+        return True
+    
+    @staticmethod
+    def confirmar_reserva(db: Session, reserva_id: int) -> models.Pedido:
+        """
+        Transforma a reserva em pedido: as unidades saem do estoque e do
+        reservado no mesmo UPDATE, com os preços atuais dos produtos.
+        """
+        db_reserva = ReservaCRUD._bloquear(db, reserva_id)
+        if db_reserva is None:
+            db.rollback()
+            raise HTTPException(status_code=404, detail="Reserva não encontrada")
+        
+        expira_em = db_reserva.expira_em
+        if expira_em.tzinfo is None:
+            # SQLite devolve a data sem fuso (gravada em UTC)
+            expira_em = expira_em.replace(tzinfo=timezone.utc)
+        if expira_em <= ReservaCRUD._agora():
+            ReservaCRUD._liberar(db, [reserva_id])
+            db.commit()
+            raise HTTPException(status_code=410, detail="Reserva expirada")
+        
+        cliente = db_reserva.cliente
+        quantidades = {item.produto_id: item.quantidade for item in db_reserva.itens}
+        db.delete(db_reserva)
+        
+        delta_por_id = case(quantidades, value=models.Produto.id)
+        produtos = db.execute(
+            update(models.Produto)
+            .where(models.Produto.id.in_(sorted(quantidades)))
+            .values(
+                quantidade_estoque=models.Produto.quantidade_estoque - delta_por_id,
+                quantidade_reservada=models.Produto.quantidade_reservada - delta_por_id,
+            )
+            .returning(models.Produto.id, models.Produto.nome, models.Produto.preco,
+                       models.Produto.quantidade_estoque)
+            .execution_options(synchronize_session=False)
+        ).all()
+        ResumoEstoqueCRUD.registrar(
+            db,
+            antes=[(preco, quantidade + quantidades[produto_id]) for produto_id, _, preco, quantidade in produtos],
+            depois=[(preco, quantidade) for _, _, preco, quantidade in produtos],
+        )
+        
+        db_pedido = models.Pedido(
+            cliente=cliente,
+            valorTotalPedido=sum(preco * quantidades[produto_id] for produto_id, _, preco, _ in produtos),
+        )
+        db.add(db_pedido)
+        db.flush()
+        db.execute(insert(models.ItemPedido), [
+            {
+                "pedido_id": db_pedido.id,
+                "produto_id": produto_id,
+                "nome_produto": nome,
+                "quantidade": quantidades[produto_id],
+                "preco_unitario": preco,
+                "valor_total_item": preco * quantidades[produto_id],
+            }
+            for produto_id, nome, preco, _ in sorted(produtos)
+        ])
+        
+        VersaoTabelaCRUD.incrementar(db, "pedidos", "produtos")
+        db.commit()
+        db.refresh(db_pedido)
+        metricas.PEDIDOS_CRIADOS.labels("reserva").inc()
+        return db_pedido
+    
+    @staticmethod
+    def liberar_expiradas(db: Session, tamanho_lote: int) -> int:
+        """
+        Libera as reservas vencidas em lotes de `tamanho_lote`, com um commit
+        por lote. No PostgreSQL as reservas bloqueadas por uma confirmação em
+        andamento são puladas (SKIP LOCKED) e ficam para a próxima execução.
+        Retorna o número de reservas liberadas.
+        """
+        total = 0
+        while True:
+            reserva_ids = list(db.execute(
+                select(models.Reserva.id)
+                .where(models.Reserva.expira_em <= ReservaCRUD._agora())
+                .order_by(models.Reserva.expira_em)
+                .limit(tamanho_lote)
+                .with_for_update(skip_locked=True)
+            ).scalars())
+            if not reserva_ids:
+                db.rollback()
+                return total
+            
+            ReservaCRUD._liberar(db, reserva_ids)
+            db.commit()
+            total += len(reserva_ids)
+            if len(reserva_ids) < tamanho_lote:
+                return total
+
+# Chaves de idempotência da criação de pedidos
+class IdempotenciaCRUD:
+    @staticmethod
+    def hash_requisicao(pedido: schemas.PedidoCreate) -> str:
+        """Identifica o corpo da requisição, para recusar a mesma chave com outro pedido"""
+        return hashlib.sha256(json.dumps(pedido.model_dump(mode="json"), sort_keys=True).encode()).hexdigest()
+    
+    @staticmethod
+    def obter_resposta(db: Session, chave: str, hash_requisicao: str) -> Optional[str]:
+        """Resposta já gravada para a chave (uma busca pela chave primária)"""
+        registro = db.get(models.ChaveIdempotencia, chave)
+        if registro is None or registro.resposta is None:
+            return None
+        if registro.hash_requisicao != hash_requisicao:
+            raise HTTPException(status_code=422, detail="Idempotency-Key já usada com outra requisição")
+        return registro.resposta
+    
+    @staticmethod
+    def registrar(db: Session, chave: str, hash_requisicao: str) -> Optional[models.ChaveIdempotencia]:
+        """
+        Grava a chave na transação atual, ainda sem resposta. Retorna None se
+        outra requisição gravou a mesma chave primeiro.
+        """
+        registro = models.ChaveIdempotencia(chave=chave, hash_requisicao=hash_requisicao)
+        db.add(registro)
+        try:
+            db.flush()
+        except IntegrityError:
+            db.rollback()
+            return None
+        return registro
+    
+    @staticmethod
+    def limpar_expiradas(db: Session, antes_de: datetime, tamanho_lote: int) -> int:
+        """Apaga as chaves criadas antes de `antes_de`, em lotes com um commit cada"""
+        tabela = models.ChaveIdempotencia
+        total = 0
+        while True:
+            lote = select(tabela.chave).where(tabela.criada_em < antes_de).limit(tamanho_lote).scalar_subquery()
+            apagadas = db.execute(
+                delete(tabela).where(tabela.chave.in_(lote)).execution_options(synchronize_session=False)
+            ).rowcount
+            db.commit()
+            total += apagadas
+            if apagadas < tamanho_lote:
+                return total
+
+# Consultas agregadas para o dashboard
+class EstatisticasCRUD:
+    @staticmethod
+    def calcular(db: Session, limite_baixo_estoque: int) -> dict:
+        """Monta as estatísticas do dashboard a partir do resumo do estoque"""
+        resumo = ResumoEstoqueCRUD.obter(db, limite_baixo_estoque)
+        baixo_estoque = models.Produto.quantidade_estoque < limite_baixo_estoque
+        
+        produtos_baixos = (
+            db.query(models.Produto.id, models.Produto.nome, models.Produto.quantidade_estoque)
+            .filter(baixo_estoque)
+            .order_by(models.Produto.quantidade_estoque, models.Produto.id)
+            .limit(10)
+            .all()
+        )
+        
+        ultimos_pedidos = (
+            db.query(models.Pedido.id, models.Pedido.cliente, models.Pedido.valorTotalPedido, models.Pedido.dataPedido)
+            .order_by(models.Pedido.dataPedido.desc(), models.Pedido.id.desc())
+            .limit(5)
+            .all()
+        )
+        
+        return {
+            "total_produtos": resumo["total_produtos"],
+            "total_pedidos": db.query(func.count(models.Pedido.id)).scalar(),
+            "total_unidades": resumo["total_unidades"],
+            "produtos_baixo_estoque": resumo["produtos_baixo_estoque"],
+            "produtos_sem_estoque": resumo["produtos_sem_estoque"],
+            "valor_total_estoque": resumo["valor_total_estoque"],
+            "limite_baixo_estoque": limite_baixo_estoque,
+            "baixo_estoque": [produto._asdict() for produto in produtos_baixos],
+            "ultimos_pedidos": [pedido._asdict() for pedido in ultimos_pedidos],
+        }
+
+
+# Resumo do estoque mantido incrementalmente
+class ResumoEstoqueCRUD:
+    CAMPOS = ("total_produtos", "total_unidades", "valor_total_estoque",
+              "produtos_baixo_estoque", "produtos_sem_estoque")
+    
+    @staticmethod
+    def _totais(estados: List[Tuple[float, int]], limite: int) -> Dict[str, float]:
+        return {
+            "total_produtos": len(estados),
+            "total_unidades": sum(quantidade for _, quantidade in estados),
+            "valor_total_estoque": sum(preco * quantidade for preco, quantidade in estados),
+            "produtos_baixo_estoque": sum(1 for _, quantidade in estados if quantidade < limite),
+            "produtos_sem_estoque": sum(1 for _, quantidade in estados if quantidade == 0),
+        }
+    
+    @staticmethod
+    def registrar(db: Session, antes: List[Tuple[float, int]], depois: List[Tuple[float, int]]):
+        """
+        Aplica ao resumo a diferença entre o estado anterior e o novo
+        (preço, quantidade) dos produtos alterados, na mesma transação da
+        alteração. Sem o registro de LIMITE_BAIXO_ESTOQUE nada é gravado
+        (as leituras recalculam até reconciliar criá-lo). Não faz commit.
+        """
+        limite = settings.LIMITE_BAIXO_ESTOQUE
+        totais_antes = ResumoEstoqueCRUD._totais(antes, limite)
+        totais_depois = ResumoEstoqueCRUD._totais(depois, limite)
+        deltas = {campo: totais_depois[campo] - totais_antes[campo] for campo in ResumoEstoqueCRUD.CAMPOS}
+        if not any(deltas.values()):
+            return
+        
+        tabela = models.ResumoEstoque
+        db.execute(
+            update(tabela)
+            .where(tabela.limite_baixo_estoque == limite)
+            .values({getattr(tabela, campo): getattr(tabela, campo) + delta for campo, delta in deltas.items()})
+            .execution_options(synchronize_session=False)
+        )
+    
+    @staticmethod
+    def recalcular(db: Session, limite: int) -> Dict[str, float]:
+        """Calcula os totais do zero, percorrendo a tabela de produtos"""
+        quantidade = models.Produto.quantidade_estoque
+        totais = db.query(
+            func.count(models.Produto.id),
+            func.coalesce(func.sum(quantidade), 0),
+            func.coalesce(func.sum(models.Produto.preco * quantidade), 0.0),
+            func.coalesce(func.sum(case((quantidade < limite, 1), else_=0)), 0),
+            func.coalesce(func.sum(case((quantidade == 0, 1), else_=0)), 0),
+        ).one()
+        return dict(zip(ResumoEstoqueCRUD.CAMPOS, totais))
+    
+    @staticmethod
+    def obter(db: Session, limite: int) -> Dict[str, float]:
+        """
+        Lê o resumo (O(1)). Só o registro de LIMITE_BAIXO_ESTOQUE é mantido
+        por registrar; outros limites, ou o registro ainda não criado (pela
+        migração 0009 ou por reconciliar), são recalculados a cada leitura.
+        """
+        if limite == settings.LIMITE_BAIXO_ESTOQUE:
+            resumo = db.get(models.ResumoEstoque, limite)
+            if resumo is not None:
+                return {campo: getattr(resumo, campo) for campo in ResumoEstoqueCRUD.CAMPOS}
+        return ResumoEstoqueCRUD.recalcular(db, limite)
+    
+    @staticmethod
+    def reconciliar(db: Session) -> List[dict]:
+        """
+        Recalcula o resumo de cada limite a partir dos produtos, corrige os
+        registros e retorna as divergências encontradas (valor gravado x real).
+        """
+        limites = {limite for (limite,) in db.query(models.ResumoEstoque.limite_baixo_estoque)}
+        limites.add(settings.LIMITE_BAIXO_ESTOQUE)
+        
+        divergencias = []
+        for limite in sorted(limites):
+            resumo = db.query(models.ResumoEstoque).filter(
+                models.ResumoEstoque.limite_baixo_estoque == limite
+            ).with_for_update().first()
+            if resumo is None:
+                resumo = models.ResumoEstoque(limite_baixo_estoque=limite)
+                db.add(resumo)
+            
+            for campo, valor_real in ResumoEstoqueCRUD.recalcular(db, limite).items():
+                valor_gravado = getattr(resumo, campo) or 0
+                if abs(valor_gravado - valor_real) > 1e-6:
+                    divergencias.append({
+                        "limite_baixo_estoque": limite,
+                        "campo": campo,
+                        "gravado": valor_gravado,
+                        "real": valor_real,
+                    })
+                setattr(resumo, campo, valor_real)
         
-        db.delete(db_pedido)
         db.commit()
-        return True 
\ No newline at end of file
+        return divergencias
+
+# Versões por tabela, usadas nos ETags das leituras de produtos e pedidos
+class VersaoTabelaCRUD:
+    @staticmethod
+    def consulta(tabela: str):
+        return select(models.VersaoTabela.versao).where(models.VersaoTabela.tabela == tabela)
+    
+    @staticmethod
+    def obter(db: Session, tabela: str) -> int:
+        """Versão atual da tabela (0 enquanto ela nunca foi alterada)"""
+        return db.execute(VersaoTabelaCRUD.consulta(tabela)).scalar() or 0
+    
+    @staticmethod
+    def incrementar(db: Session, *tabelas: str):
+        """
+        Marca as tabelas como alteradas na transação atual. As versões só são
+        avançadas no commit (ver _avancar_versoes_pendentes), uma vez por
+        tabela e sempre em ordem alfabética: as escritas que alteram produtos
+        e pedidos em ordens diferentes bloqueiam as linhas de versoes_tabelas
+        na mesma ordem e não entram em deadlock.
+        """
+        db.info.setdefault("versoes_pendentes", set()).update(tabelas)
+    
+    @staticmethod
+    def _avancar(db: Session, tabelas: List[str]):
+        dialeto = db.get_bind().dialect.name
+        insert_dialeto = postgresql_insert if dialeto == "postgresql" else sqlite_insert
+        stmt = insert_dialeto(models.VersaoTabela)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[models.VersaoTabela.tabela],
+            set_={"versao": models.VersaoTabela.versao + 1},
+        )
+        for tabela in sorted(tabelas):
+            db.execute(stmt, {"tabela": tabela, "versao": 1})
+
+def _avancar_versoes_pendentes(db: Session):
+    """Antes do commit: avança, dentro da transação, as versões marcadas por VersaoTabelaCRUD.incrementar"""
+    tabelas = db.info.pop("versoes_pendentes", None)
+    if tabelas:
+        # Grava antes as alterações pendentes da sessão: as linhas de versão
+        # são sempre as últimas bloqueadas pela transação
+        db.flush()
+        VersaoTabelaCRUD._avancar(db, tabelas)
+
+def _descartar_versoes_pendentes(db: Session, transacao):
+    """Fim da transação sem commit (rollback ou close): as alterações não valeram"""
+    if transacao.parent is None:
+        db.info.pop("versoes_pendentes", None)
+
+event.listen(Session, "before_commit", _avancar_versoes_pendentes)
+event.listen(Session, "after_transaction_end", _descartar_versoes_pendentes)
@@ -0,0 +1,128 @@
+"""
+Versões assíncronas das operações CRUD (DATABASE_BACKEND=async)
+
+As leituras usam a AsyncSession diretamente. As escritas reaproveitam as
+regras de crud.py por meio de AsyncSession.run_sync, que executa o código
+síncrono em um greenlet sem bloquear o event loop.
+"""
+
+from typing import List, Optional, Tuple
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import selectinload
+
+import crud
+import models
+import schemas
+from cache import cache_produtos
+
+# Operações CRUD assíncronas para Produtos
+class ProdutoCRUDAsync:
+    @staticmethod
+    async def criar_produto(db: AsyncSession, produto: schemas.ProdutoCreate) -> models.Produto:
+        return await db.run_sync(crud.ProdutoCRUD.criar_produto, produto)
+    
+    @staticmethod
+    async def obter_produto(db: AsyncSession, produto_id: int) -> Optional[schemas.Produto]:
+        chave = cache_produtos.chave_produto(produto_id)
+        em_cache = cache_produtos.obter(chave)
+        if em_cache is not None:
+            estoque = (await db.execute(crud.consulta_estoque([produto_id]))).mappings()
+            produto = crud.completar_estoque([em_cache], estoque)
+            return schemas.Produto.model_validate(produto[0]) if produto else None
+        
+        db_produto = await db.get(models.Produto, produto_id)
+        if not db_produto:
+            return None
+        produto = schemas.Produto.model_validate(db_produto)
+        cache_produtos.guardar(chave, produto.model_dump())
+        return produto
+    
+    @staticmethod
+    async def listar_produtos(db: AsyncSession, skip: int = 0, limit: int = 100, after_id: Optional[int] = None) -> List[schemas.Produto]:
+        chave = cache_produtos.chave_lista(skip, limit, after_id)
+        em_cache = cache_produtos.obter_lista(chave)
+        if em_cache is not None:
+            if not em_cache:
+                return []
+            estoque = (await db.execute(crud.consulta_estoque([produto["id"] for produto in em_cache]))).mappings()
+            produtos = crud.completar_estoque(em_cache, estoque)
+            # Página com produtos excluídos por outro worker: lida de novo (ver crud.listar_produtos_dados)
+            if len(produtos) == len(em_cache):
+                return [schemas.Produto.model_validate(produto) for produto in produtos]
+        
+        query = select(models.Produto).order_by(models.Produto.id).limit(limit)
+        if after_id is not None:
+            query = query.where(models.Produto.id > after_id)
+        else:
+            query = query.offset(skip)
+        produtos = [schemas.Produto.model_validate(produto) for produto in await db.scalars(query)]
+        cache_produtos.guardar_lista(chave, [produto.model_dump() for produto in produtos])
+        return produtos
+    
+    @staticmethod
+    async def atualizar_produto(db: AsyncSession, produto_id: int, produto_update: schemas.ProdutoUpdate) -> Optional[models.Produto]:
+        return await db.run_sync(crud.ProdutoCRUD.atualizar_produto, produto_id, produto_update)
+    
+    @staticmethod
+    async def excluir_produto(db: AsyncSession, produto_id: int) -> bool:
+        return await db.run_sync(crud.ProdutoCRUD.excluir_produto, produto_id)
+
+# Operações CRUD assíncronas para Pedidos
+class PedidoCRUDAsync:
+    @staticmethod
+    def _com_itens(pedido: Optional[models.Pedido]) -> Optional[models.Pedido]:
+        # Os itens precisam estar carregados antes de sair do greenlet
+        if pedido is not None:
+            pedido.itens
+        return pedido
+    
+    @staticmethod
+    async def criar_pedido(db: AsyncSession, pedido: schemas.PedidoCreate) -> models.Pedido:
+        return await db.run_sync(
+            lambda sessao: PedidoCRUDAsync._com_itens(crud.PedidoCRUD.criar_pedido(sessao, pedido))
+        )
+    
+    @staticmethod
+    async def criar_pedido_idempotente(db: AsyncSession, pedido: schemas.PedidoCreate, chave: str) -> Tuple[str, bool]:
+        return await db.run_sync(crud.PedidoCRUD.criar_pedido_idempotente, pedido, chave)
+    
+    @staticmethod
+    async def obter_pedido(db: AsyncSession, pedido_id: int) -> Optional[models.Pedido]:
+        query = (
+            select(models.Pedido)
+            .options(selectinload(models.Pedido.itens))
+            .where(models.Pedido.id == pedido_id)
+        )
+        return (await db.scalars(query)).first()
+    
+    @staticmethod
+    async def listar_pedidos(db: AsyncSession, skip: int = 0, limit: int = 100, after_id: Optional[int] = None) -> List[models.Pedido]:
+        query = (
+            select(models.Pedido)
+            .options(selectinload(models.Pedido.itens))
+            .order_by(models.Pedido.id)
+            .limit(limit)
+        )
+        if after_id is not None:
+            query = query.where(models.Pedido.id > after_id)
+        else:
+            query = query.offset(skip)
+        return list((await db.scalars(query)).all())
+    
+    @staticmethod
+    async def atualizar_pedido(db: AsyncSession, pedido_id: int, pedido_update: schemas.PedidoUpdate) -> Optional[models.Pedido]:
+        return await db.run_sync(
+            lambda sessao: PedidoCRUDAsync._com_itens(crud.PedidoCRUD.atualizar_pedido(sessao, pedido_id, pedido_update))
+        )
+    
+    @staticmethod
+    async def excluir_pedido(db: AsyncSession, pedido_id: int) -> bool:
+        return await db.run_sync(crud.PedidoCRUD.excluir_pedido, pedido_id)
+
+# Versões por tabela (ETags) lidas pela AsyncSession
+class VersaoTabelaCRUDAsync:
+    @staticmethod
+    async def obter(db: AsyncSession, tabela: str) -> int:
+        return (await db.scalar(crud.VersaoTabelaCRUD.consulta(tabela))) or 0
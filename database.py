@@ -1,4 +1,8 @@
-from sqlalchemy import create_engine
+import time
+from datetime import datetime, timezone
+from typing import Optional
+
+from sqlalchemy import create_engine, text
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 from config import settings
@@ -28,7 +32,8 @@ def get_db():
     finally:
         db.close()
 
-# Função para criar todas as tabelas
+# Função para criar todas as tabelas direto dos modelos (testes e benchmarks com
+# banco descartável; a aplicação usa as migrações: python migrar.py)
 def create_tables():
     Base.metadata.create_all(bind=engine)
 
@@ -36,8 +41,79 @@ def create_tables():
 def test_database_connection():
     try:
         with engine.connect() as connection:
-            connection.execute("SELECT 1")
+            connection.execute(text("SELECT 1"))
         return True
     except Exception as e:
         print(f"Erro na conexão com o banco: {e}")
-        return False 
\ No newline at end of file
+        return False
+
+class SondaBanco:
+    """
+    Verificação do banco feita em segundo plano (ver main.sondar_periodicamente).
+    As rotas de saúde só leem o resultado da última sonda, sem abrir conexões,
+    então podem ser consultadas a todo momento pelos balanceadores de carga.
+    """
+
+    def __init__(self, engine, intervalo: float):
+        self.engine = engine
+        self.intervalo = intervalo
+        # Substituído por inteiro a cada sonda: leitores nunca veem um estado pela metade
+        self.ultima: Optional[dict] = None
+
+    def sondar(self) -> bool:
+        """Executa um SELECT 1 e guarda o resultado e a latência"""
+        inicio = time.perf_counter()
+        try:
+            with self.engine.connect() as connection:
+                connection.execute(text("SELECT 1"))
+            online, erro = True, None
+        except Exception as e:
+            online, erro = False, str(e)
+        self.ultima = {
+            "online": online,
+            "erro": erro,
+            "latencia_ms": round((time.perf_counter() - inicio) * 1000, 2),
+            "verificado_em": datetime.now(timezone.utc),
+            "monotonico": time.monotonic(),
+        }
+        return online
+
+    def pool(self) -> dict:
+        """Conexões do pool neste momento (contadores em memória, sem acessar o banco)"""
+        pool = self.engine.pool
+        # Pools sem limite (ex.: SQLite em memória) não têm esses contadores
+        if not hasattr(pool, "checkedout"):
+            return {"tamanho": None, "em_uso": None, "livres": None, "overflow": None, "utilizacao": None}
+        tamanho, em_uso = pool.size(), pool.checkedout()
+        return {
+            "tamanho": tamanho,
+            "em_uso": em_uso,
+            "livres": pool.checkedin(),
+            "overflow": pool.overflow(),
+            "utilizacao": round(em_uso / tamanho, 3) if tamanho else None,
+        }
+
+    def situacao(self) -> dict:
+        """
+        Último resultado da sonda e o estado do pool. O banco só conta como
+        pronto se a última sonda passou e tem no máximo três intervalos (uma
+        sonda travada ou a tarefa parada também deixam a API fora do ar)
+        """
+        ultima = self.ultima
+        if ultima is None:
+            return {"pronto": False, "database": "verificando", "erro": None, "latencia_ms": None,
+                    "verificado_em": None, "idade_segundos": None, "pool": self.pool()}
+
+        idade = time.monotonic() - ultima["monotonico"]
+        recente = idade <= 3 * self.intervalo
+        return {
+            "pronto": ultima["online"] and recente,
+            "database": ("online" if ultima["online"] else "offline") if recente else "desatualizado",
+            "erro": ultima["erro"],
+            "latencia_ms": ultima["latencia_ms"],
+            "verificado_em": ultima["verificado_em"],
+            "idade_segundos": round(idade, 3),
+            "pool": self.pool(),
+        }
+
+sonda_banco = SondaBanco(engine, settings.SONDA_BANCO_INTERVALO) 
\ No newline at end of file
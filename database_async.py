@@ -0,0 +1,33 @@
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from config import settings
+
+# Drivers assíncronos equivalentes aos da URL síncrona
+DRIVERS_ASYNC = {
+    "postgresql://": "postgresql+asyncpg://",
+    "postgresql+psycopg2://": "postgresql+asyncpg://",
+    "sqlite://": "sqlite+aiosqlite://",
+}
+
+def converter_url_async(url: str) -> str:
+    """Troca o driver da URL do banco pelo equivalente assíncrono"""
+    for prefixo, prefixo_async in DRIVERS_ASYNC.items():
+        if url.startswith(prefixo):
+            return prefixo_async + url[len(prefixo):]
+    return url
+
+# Criar engine assíncrona (asyncpg no PostgreSQL)
+async_engine = create_async_engine(
+    converter_url_async(settings.DATABASE_URL),
+    pool_pre_ping=True,  # Verifica conexão antes de usar
+    pool_recycle=300,    # Recicla conexões a cada 5 minutos
+    echo=settings.DEBUG  # Log SQL em modo debug
+)
+
+# Criar sessão assíncrona; os objetos continuam acessíveis após o commit
+# porque não é possível recarregar atributos fora do event loop
+AsyncSessionLocal = async_sessionmaker(bind=async_engine, autoflush=False, expire_on_commit=False)
+
+# Função para obter a sessão assíncrona do banco
+async def get_db():
+    async with AsyncSessionLocal() as db:
+        yield db
@@ -99,7 +99,7 @@ REM Verificar API
 echo [INFO] Verificando API...
 set timeout=30
 :wait_api
-curl -f http://localhost:8000/ >nul 2>&1
+curl -f http://localhost:8000/saude/pronto >nul 2>&1
 if %errorlevel% equ 0 (
     echo [INFO] API está funcionando
     goto show_info
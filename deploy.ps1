@@ -165,7 +165,7 @@ function Test-Services {
     
     while ($timeout -gt 0 -and -not $apiReady) {
         try {
-            $response = Invoke-WebRequest -Uri "http://localhost:8000/" -UseBasicParsing -TimeoutSec 5
+            $response = Invoke-WebRequest -Uri "http://localhost:8000/saude/pronto" -UseBasicParsing -TimeoutSec 5
             if ($response.StatusCode -eq 200) {
                 $apiReady = $true
                 Write-Info "API está funcionando"
@@ -116,7 +116,7 @@ check_health() {
     print_message "Verificando API..."
     timeout=30
     while [ $timeout -gt 0 ]; do
-        if curl -f http://localhost:8000/ > /dev/null 2>&1; then
+        if curl -f http://localhost:8000/saude/pronto > /dev/null 2>&1; then
             print_message "API está funcionando!"
             break
         fi
@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+"""
+Exportação dos pedidos com seus itens em CSV ou NDJSON
+
+Os pedidos são lidos com cursor no servidor (yield_per) em blocos de
+`tamanho_chunk`, e os itens de cada bloco em uma única consulta. Cada bloco
+é gravado na saída assim que fica pronto, então a memória não cresce com o
+número de pedidos exportados.
+
+Uso via linha de comando:
+    python exportacao.py pedidos.csv --de 2024-01-01 --ate 2024-01-02
+    python exportacao.py pedidos.ndjson --chunk 5000
+"""
+
+import argparse
+import csv
+import io
+import json
+from datetime import date, datetime, time
+from typing import Iterator, Optional, Union
+
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+import crud
+import models
+from config import settings
+
+FORMATOS = ("csv", "ndjson")
+
+# CSV: uma linha por item, com os dados do pedido repetidos
+COLUNAS_CSV = ["pedido_id", "cliente", "dataPedido", "valorTotalPedido", "item_id", "produto_id",
+               "nome_produto", "quantidade", "preco_unitario", "valor_total_item"]
+
+def _como_datetime(valor: Union[date, datetime, None]) -> Optional[datetime]:
+    """Datas sem horário valem a partir da meia-noite"""
+    if valor is None or isinstance(valor, datetime):
+        return valor
+    return datetime.combine(valor, time.min)
+
+def _pedidos(db: Session, de: Optional[datetime], ate: Optional[datetime], tamanho_chunk: int):
+    """Blocos de pedidos (id, cliente, dataPedido, valorTotalPedido) lidos pelo cursor no servidor"""
+    pedido = models.Pedido
+    query = select(pedido.id, pedido.cliente, pedido.dataPedido, pedido.valorTotalPedido)
+    if de is not None:
+        query = query.where(pedido.dataPedido >= de)
+    if ate is not None:
+        query = query.where(pedido.dataPedido < ate)
+    # Mesma ordem do índice ix_pedidos_dataPedido: o primeiro bloco sai sem ordenar o período todo
+    query = query.order_by(pedido.dataPedido, pedido.id).execution_options(yield_per=tamanho_chunk)
+    return db.execute(query).partitions()
+
+def _data_iso(valor: Optional[datetime]) -> Optional[str]:
+    return valor.isoformat() if valor is not None else None
+
+def _bloco_csv(pedidos, itens) -> str:
+    buffer = io.StringIO()
+    escritor = csv.writer(buffer)
+    for pedido in pedidos:
+        dados_pedido = [pedido.id, pedido.cliente, _data_iso(pedido.dataPedido), pedido.valorTotalPedido]
+        if not itens[pedido.id]:
+            escritor.writerow(dados_pedido + [None] * 6)
+        for item in itens[pedido.id]:
+            escritor.writerow(dados_pedido + [item["id"], item["produto_id"], item["nome_produto"], item["quantidade"],
+                                              item["preco_unitario"], item["valor_total_item"]])
+    return buffer.getvalue()
+
+def _bloco_ndjson(pedidos, itens) -> str:
+    # Mesmo formato de GET /pedidos/{id}
+    return "".join(
+        json.dumps({
+            "id": pedido.id,
+            "cliente": pedido.cliente,
+            "itens": itens[pedido.id],
+            "valorTotalPedido": pedido.valorTotalPedido,
+            "dataPedido": _data_iso(pedido.dataPedido),
+        }, ensure_ascii=False) + "\n"
+        for pedido in pedidos
+    )
+
+def exportar_pedidos(db: Session, formato: str, de: Union[date, datetime, None] = None,
+                     ate: Union[date, datetime, None] = None,
+                     tamanho_chunk: int = settings.TAMANHO_CHUNK_EXPORTACAO) -> Iterator[str]:
+    """
+    Gera o conteúdo da exportação em pedaços de texto, um por bloco de
+    pedidos. `de` é inclusivo e `ate` exclusivo.
+    """
+    if formato == "csv":
+        buffer = io.StringIO()
+        csv.writer(buffer).writerow(COLUNAS_CSV)
+        yield buffer.getvalue()
+    montar_bloco = _bloco_csv if formato == "csv" else _bloco_ndjson
+
+    for pedidos in _pedidos(db, _como_datetime(de), _como_datetime(ate), tamanho_chunk):
+        yield montar_bloco(pedidos, crud.PedidoCRUD.itens_por_pedido(db, [pedido.id for pedido in pedidos]))
+
+def exportar_pedidos_em_sessao(formato: str, de: Union[date, datetime, None] = None,
+                               ate: Union[date, datetime, None] = None,
+                               tamanho_chunk: int = settings.TAMANHO_CHUNK_EXPORTACAO) -> Iterator[str]:
+    """
+    Igual a exportar_pedidos, com uma sessão própria que vive enquanto a
+    resposta é transmitida (a sessão da requisição pode ser fechada antes)
+    """
+    from database import SessionLocal
+
+    db = SessionLocal()
+    try:
+        yield from exportar_pedidos(db, formato, de, ate, tamanho_chunk)
+    finally:
+        db.close()
+
+def main():
+    """Exporta os pedidos do banco configurado para um arquivo"""
+    parser = argparse.ArgumentParser(description="Exporta os pedidos com seus itens (CSV ou NDJSON)")
+    parser.add_argument("arquivo", help="Caminho do arquivo de saída")
+    parser.add_argument("--formato", choices=FORMATOS, help="Formato do arquivo (padrão: pela extensão)")
+    parser.add_argument("--de", type=datetime.fromisoformat, help="Data/hora inicial (inclusiva), ISO 8601")
+    parser.add_argument("--ate", type=datetime.fromisoformat, help="Data/hora final (exclusiva), ISO 8601")
+    parser.add_argument("--chunk", type=int, default=settings.TAMANHO_CHUNK_EXPORTACAO,
+                        help="Pedidos lidos por bloco")
+    args = parser.parse_args()
+
+    formato = args.formato or ("ndjson" if args.arquivo.lower().endswith((".ndjson", ".jsonl")) else "csv")
+    with open(args.arquivo, "w", encoding="utf-8", newline="") as saida:
+        for pedaco in exportar_pedidos_em_sessao(formato, args.de, args.ate, args.chunk):
+            saida.write(pedaco)
+    print(f"✅ Pedidos exportados para {args.arquivo}")
+
+if __name__ == "__main__":
+    main()
@@ -63,27 +63,18 @@ async function apiRequest(endpoint, options = {}) {
 // Dashboard
 async function carregarDashboard() {
     try {
-        const [produtosData, pedidosData] = await Promise.all([
-            apiRequest('/produtos/'),
-            apiRequest('/pedidos/')
-        ]);
-        
-        produtos = produtosData;
-        pedidos = pedidosData;
+        // Totais calculados no servidor, sem baixar todos os produtos e pedidos
+        const estatisticas = await apiRequest('/estatisticas');
         
         // Atualizar estatísticas
-        document.getElementById('total-produtos').textContent = produtos.length;
-        document.getElementById('total-pedidos').textContent = pedidos.length;
-        
-        const produtosBaixoEstoque = produtos.filter(p => p.quantidade_estoque < 10).length;
-        document.getElementById('produtos-baixo-estoque').textContent = produtosBaixoEstoque;
-        
-        const valorTotalEstoque = produtos.reduce((total, p) => total + (p.preco * p.quantidade_estoque), 0);
-        document.getElementById('valor-total-estoque').textContent = `R$ ${valorTotalEstoque.toFixed(2)}`;
+        document.getElementById('total-produtos').textContent = estatisticas.total_produtos;
+        document.getElementById('total-pedidos').textContent = estatisticas.total_pedidos;
+        document.getElementById('produtos-baixo-estoque').textContent = estatisticas.produtos_baixo_estoque;
+        document.getElementById('valor-total-estoque').textContent = `R$ ${estatisticas.valor_total_estoque.toFixed(2)}`;
         
         // Listar produtos em baixo estoque
         const baixoEstoqueList = document.getElementById('baixo-estoque-list');
-        const produtosBaixo = produtos.filter(p => p.quantidade_estoque < 10);
+        const produtosBaixo = estatisticas.baixo_estoque;
         baixoEstoqueList.innerHTML = produtosBaixo.length > 0 
             ? produtosBaixo.map(p => `
                 <div class="d-flex justify-content-between align-items-center mb-2">
@@ -95,7 +86,7 @@ async function carregarDashboard() {
         
         // Listar últimos pedidos
         const ultimosPedidosList = document.getElementById('ultimos-pedidos-list');
-        const ultimosPedidos = pedidos.slice(-5).reverse();
+        const ultimosPedidos = estatisticas.ultimos_pedidos;
         ultimosPedidosList.innerHTML = ultimosPedidos.length > 0
             ? ultimosPedidos.map(p => `
                 <div class="d-flex justify-content-between align-items-center mb-2">
@@ -254,8 +245,12 @@ async function carregarPedidos() {
     }
 }
 
-function showPedidoModal() {
+async function showPedidoModal() {
     const modal = new bootstrap.Modal(document.getElementById('pedidoModal'));
+    // O dashboard não carrega mais a lista de produtos
+    if (produtos.length === 0) {
+        produtos = await apiRequest('/produtos/');
+    }
     carregarProdutosParaSelect();
     modal.show();
 }
@@ -483,29 +478,24 @@ async function carregarEstoque() {
 
 function ajustarEstoque(produtoId) {
     const produto = produtos.find(p => p.id === produtoId);
-    const novaQuantidade = prompt(`Ajustar estoque de "${produto.nome}"\nQuantidade atual: ${produto.quantidade_estoque}\nNova quantidade:`, produto.quantidade_estoque);
+    const ajuste = prompt(`Ajustar estoque de "${produto.nome}"\nQuantidade atual: ${produto.quantidade_estoque}\nAjuste (use + para entrada e - para saída):`, '0');
     
-    if (novaQuantidade !== null && !isNaN(novaQuantidade)) {
-        const quantidade = parseInt(novaQuantidade);
-        if (quantidade >= 0) {
-            atualizarEstoqueProduto(produtoId, quantidade);
+    if (ajuste !== null && !isNaN(ajuste)) {
+        const delta = parseInt(ajuste);
+        if (produto.quantidade_estoque + delta >= 0) {
+            atualizarEstoqueProduto(produtoId, delta);
         } else {
-            alert('A quantidade deve ser maior ou igual a zero');
+            alert('O estoque não pode ficar negativo');
         }
     }
 }
 
-async function atualizarEstoqueProduto(produtoId, novaQuantidade) {
+async function atualizarEstoqueProduto(produtoId, delta) {
     try {
-        const produto = produtos.find(p => p.id === produtoId);
-        await apiRequest(`/produtos/${produtoId}`, {
-            method: 'PUT',
-            body: JSON.stringify({
-                nome: produto.nome,
-                descricao: produto.descricao,
-                preco: produto.preco,
-                quantidade_estoque: novaQuantidade
-            })
+        // Envia apenas a variação; o servidor aplica sobre o valor atual
+        await apiRequest(`/produtos/${produtoId}/estoque`, {
+            method: 'PATCH',
+            body: JSON.stringify({ delta: delta })
         });
         
         carregarEstoque();
@@ -0,0 +1,143 @@
+#!/usr/bin/env python3
+"""
+Importação de catálogo de produtos a partir de arquivos CSV ou NDJSON
+
+O arquivo é lido em streaming, linha a linha, e gravado em chunks com
+upsert pelo SKU, sem carregar o catálogo inteiro em memória.
+
+Uso via linha de comando:
+    python importacao.py catalogo.csv
+    python importacao.py catalogo.ndjson --chunk 10000
+"""
+
+import argparse
+import codecs
+import csv
+import json
+import sys
+from typing import BinaryIO, Iterator, List, Optional, Tuple
+
+from pydantic import ValidationError
+from sqlalchemy.orm import Session
+
+import crud
+import schemas
+from cache import cache_produtos
+from config import settings
+
+FORMATOS = ("csv", "ndjson")
+
+# Limite de linhas rejeitadas detalhadas no relatório final
+MAX_ERROS_REPORTADOS = 1000
+
+def detectar_formato(nome_arquivo: Optional[str]) -> str:
+    """Deduz o formato pela extensão do arquivo (padrão: csv)"""
+    if nome_arquivo and nome_arquivo.lower().endswith((".ndjson", ".jsonl")):
+        return "ndjson"
+    return "csv"
+
+def _ler_csv(arquivo: BinaryIO) -> Iterator[Tuple[int, object]]:
+    texto = codecs.getreader("utf-8-sig")(arquivo)
+    leitor = csv.DictReader(texto)
+    for registro in leitor:
+        # Células vazias contam como campo não informado
+        yield leitor.line_num, {campo: valor for campo, valor in registro.items() if valor not in ("", None)}
+
+def _ler_ndjson(arquivo: BinaryIO) -> Iterator[Tuple[int, object]]:
+    for numero, linha in enumerate(codecs.getreader("utf-8-sig")(arquivo), start=1):
+        if not linha.strip():
+            continue
+        try:
+            yield numero, json.loads(linha)
+        except json.JSONDecodeError as e:
+            yield numero, ValueError(f"JSON inválido: {e.msg}")
+
+def importar_produtos(db: Session, arquivo: BinaryIO, formato: str, tamanho_chunk: int) -> dict:
+    """
+    Valida cada linha contra schemas.ProdutoCreate e grava os produtos válidos
+    em chunks de `tamanho_chunk` linhas, com um commit por chunk. Linhas
+    inválidas, ou que deixariam o estoque de um produto abaixo do reservado,
+    são ignoradas e relatadas no resultado.
+    """
+    leitor = _ler_ndjson if formato == "ndjson" else _ler_csv
+
+    linhas_lidas = 0
+    importadas = 0
+    rejeitadas = 0
+    erros = []
+    chunk = []
+
+    def rejeitar(numero: int, mensagem: str):
+        nonlocal rejeitadas
+        rejeitadas += 1
+        if len(erros) < MAX_ERROS_REPORTADOS:
+            erros.append({"linha": numero, "erro": mensagem})
+
+    def gravar(chunk: List[Tuple[int, schemas.ProdutoCreate]]) -> int:
+        gravadas, recusadas = crud.ProdutoCRUD.upsert_produtos(db, [produto for _, produto in chunk])
+        db.commit()
+        cache_produtos.limpar()
+        for indice, mensagem in recusadas:
+            rejeitar(chunk[indice][0], mensagem)
+        return gravadas
+
+    for numero, registro in leitor(arquivo):
+        linhas_lidas += 1
+        if isinstance(registro, Exception):
+            rejeitar(numero, str(registro))
+            continue
+        if not isinstance(registro, dict):
+            rejeitar(numero, "Registro deve ser um objeto")
+            continue
+        try:
+            chunk.append((numero, schemas.ProdutoCreate.model_validate(registro)))
+        except ValidationError as e:
+            rejeitar(numero, "; ".join(
+                f"{'.'.join(str(parte) for parte in erro['loc'])}: {erro['msg']}" for erro in e.errors()
+            ))
+            continue
+
+        if len(chunk) >= tamanho_chunk:
+            importadas += gravar(chunk)
+            chunk = []
+
+    if chunk:
+        importadas += gravar(chunk)
+    erros.sort(key=lambda erro: erro["linha"])
+
+    return {
+        "linhas_lidas": linhas_lidas,
+        "importadas": importadas,
+        "rejeitadas": rejeitadas,
+        "erros": erros,
+    }
+
+def main():
+    """Importa um arquivo de catálogo direto no banco configurado"""
+    parser = argparse.ArgumentParser(description="Importa um catálogo de produtos (CSV ou NDJSON)")
+    parser.add_argument("arquivo", help="Caminho do arquivo a importar")
+    parser.add_argument("--formato", choices=FORMATOS, help="Formato do arquivo (padrão: pela extensão)")
+    parser.add_argument("--chunk", type=int, default=settings.TAMANHO_CHUNK_IMPORTACAO,
+                        help="Linhas gravadas por transação")
+    args = parser.parse_args()
+
+    from database import SessionLocal
+
+    db = SessionLocal()
+    try:
+        with open(args.arquivo, "rb") as arquivo:
+            resultado = importar_produtos(db, arquivo, args.formato or detectar_formato(args.arquivo), args.chunk)
+    finally:
+        db.close()
+
+    print(f"📦 Linhas lidas: {resultado['linhas_lidas']}")
+    print(f"✅ Produtos importados: {resultado['importadas']}")
+    print(f"❌ Linhas rejeitadas: {resultado['rejeitadas']}")
+    for erro in resultado["erros"]:
+        print(f"   - Linha {erro['linha']}: {erro['erro']}")
+
+    if resultado["rejeitadas"]:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -3,9 +3,10 @@
 
 -- Criar extensões necessárias
 CREATE EXTENSION IF NOT EXISTS "uuid-ossp";
+CREATE EXTENSION IF NOT EXISTS pg_trgm;  -- Busca de produtos por similaridade
 
 -- Comentário sobre o banco
 COMMENT ON DATABASE gestao_estoque IS 'Banco de dados para API de Gestão de Estoque';
 
--- Verificar se as tabelas já existem (serão criadas pelo SQLAlchemy)
+-- As tabelas são criadas pelas migrações (serviço migrate do docker-compose: python migrar.py)
 -- Este script serve principalmente para configurações iniciais 
\ No newline at end of file
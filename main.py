@@ -1,15 +1,42 @@
-from fastapi import FastAPI, Depends, HTTPException, status
+from fastapi import FastAPI, Depends, File, Header, HTTPException, Query, Request, Response, UploadFile, status
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import JSONResponse, StreamingResponse
 from sqlalchemy.orm import Session
-from typing import List
+from contextlib import asynccontextmanager
+import asyncio
+from datetime import date, datetime, timedelta, timezone
+from typing import List, Optional, Union
 import models
 import schemas
 import crud
-from database import engine, get_db, create_tables, test_database_connection
+import importacao
+import exportacao
+import metricas
+from respostas import (RESPOSTA_304, definir_proximo_cursor, etag_fraco, resposta_idempotente,
+                       resposta_nao_modificada, resposta_rapida)
+from cache import backend_cache, cache_produtos
+from database import engine, get_db, sonda_banco, SessionLocal
 from config import settings
 
-# Criar tabelas no banco de dados
-create_tables()
+# O schema vem das migrações (python migrar.py antes do deploy): ao subir, os
+# workers não criam nem conferem tabelas
+
+@asynccontextmanager
+async def ciclo_de_vida(app: FastAPI):
+    """Tarefas em segundo plano enquanto a aplicação está no ar"""
+    if settings.VERIFICAR_SCHEMA_AO_SUBIR:
+        # Falha ao subir (uvicorn encerra) se o banco não estiver na última migração
+        import migrar
+        await run_in_threadpool(migrar.verificar_versao, engine)
+    
+    # Primeira verificação do banco antes de aceitar requisições
+    await run_in_threadpool(sonda_banco.sondar)
+    limpeza = asyncio.create_task(limpar_periodicamente())
+    sonda = asyncio.create_task(sondar_periodicamente())
+    yield
+    limpeza.cancel()
+    sonda.cancel()
 
 # Configuração da aplicação FastAPI
 app = FastAPI(
@@ -17,9 +44,15 @@ app = FastAPI(
     description="API CRUD completa para gestão de produtos, estoque e pedidos",
     version=settings.APP_VERSION,
     docs_url="/docs",
-    redoc_url="/redoc"
+    redoc_url="/redoc",
+    lifespan=ciclo_de_vida,
 )
 
+# Métricas do Prometheus (GET /metrics)
+if settings.METRICAS_ATIVAS:
+    app.add_middleware(metricas.MiddlewareMetricas)
+    metricas.instrumentar_engine(engine)
+
 # Configuração de CORS
 app.add_middleware(
     CORSMiddleware,
@@ -27,6 +60,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "ETag", "Idempotent-Replayed"],
 )
 
 # Endpoints para Produtos
@@ -36,6 +70,7 @@ def criar_produto(produto: schemas.ProdutoCreate, db: Session = Depends(get_db))
     """
     Cria um novo produto com as seguintes informações:
     
+    - **sku**: Código do produto no fornecedor (opcional, único; um SKU já cadastrado responde 409)
     - **nome**: Nome do produto (obrigatório)
     - **descricao**: Descrição do produto (opcional)
     - **preco**: Preço unitário (deve ser maior que zero)
@@ -43,30 +78,126 @@ def criar_produto(produto: schemas.ProdutoCreate, db: Session = Depends(get_db))
     """
     return crud.ProdutoCRUD.criar_produto(db=db, produto=produto)
 
-@app.get("/produtos/", response_model=List[schemas.Produto], 
+@app.post("/produtos/importar", response_model=schemas.ResultadoImportacao,
+          summary="Importar Produtos", description="Importa um catálogo de produtos a partir de CSV ou NDJSON")
+def importar_produtos(arquivo: UploadFile = File(...),
+                      formato: Optional[str] = Query(None, pattern="^(csv|ndjson)$"),
+                      tamanho_chunk: Optional[int] = Query(None, ge=1),
+                      db: Session = Depends(get_db)):
+    """
+    Importa produtos em massa a partir de um arquivo:
+    
+    - **arquivo**: CSV com cabeçalho ou NDJSON (um objeto JSON por linha) com os campos do produto
+    - **formato**: csv ou ndjson (padrão: deduzido pela extensão do arquivo)
+    - **tamanho_chunk**: Linhas gravadas por transação (padrão: configuração TAMANHO_CHUNK_IMPORTACAO)
+    
+    Produtos com **sku** já cadastrado são atualizados; os demais são inseridos.
+    Linhas inválidas são ignoradas e listadas no resultado.
+    """
+    return importacao.importar_produtos(
+        db=db,
+        arquivo=arquivo.file,
+        formato=formato or importacao.detectar_formato(arquivo.filename),
+        tamanho_chunk=tamanho_chunk or settings.TAMANHO_CHUNK_IMPORTACAO,
+    )
+
+@app.get("/produtos/", response_model=List[schemas.Produto], responses=RESPOSTA_304,
          summary="Listar Produtos", description="Retorna lista de todos os produtos")
-def listar_produtos(skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
+def listar_produtos(request: Request, response: Response, skip: int = 0, limit: int = 100,
+                    after_id: Optional[int] = None, db: Session = Depends(get_db)):
     """
-    Lista todos os produtos com paginação:
+    Lista todos os produtos, ordenados por ID, com paginação:
     
     - **skip**: Número de registros para pular (padrão: 0)
     - **limit**: Número máximo de registros a retornar (padrão: 100)
+    - **after_id**: Cursor; retorna os produtos com ID maior que este (ignora skip)
+    
+    Quando houver uma próxima página, o cabeçalho **X-Next-Cursor** traz o
+    valor a ser enviado em after_id. Com **If-None-Match** igual ao ETag
+    recebido, retorna 304 se nenhum produto mudou desde então.
     """
-    produtos = crud.ProdutoCRUD.listar_produtos(db=db, skip=skip, limit=limit)
+    nao_modificado = resposta_nao_modificada(
+        request, response, etag_fraco("produtos", crud.VersaoTabelaCRUD.obter(db, "produtos")))
+    if nao_modificado:
+        return nao_modificado
+    
+    if settings.SERIALIZACAO_RAPIDA:
+        produtos = crud.ProdutoCRUD.listar_produtos_dados(db=db, skip=skip, limit=limit, after_id=after_id)
+        definir_proximo_cursor(response, produtos, limit, lambda produto: str(produto["id"]))
+        return resposta_rapida(response, produtos)
+    
+    produtos = crud.ProdutoCRUD.listar_produtos(db=db, skip=skip, limit=limit, after_id=after_id)
+    definir_proximo_cursor(response, produtos, limit)
     return produtos
 
-@app.get("/produtos/{produto_id}", response_model=schemas.Produto,
+@app.get("/produtos/busca", response_model=List[schemas.Produto],
+         summary="Buscar Produtos", description="Busca produtos por nome ou descrição, ordenados por relevância")
+def buscar_produtos(q: str = Query(..., min_length=1, max_length=100),
+                    limit: int = Query(20, ge=1, le=100),
+                    db: Session = Depends(get_db)):
+    """
+    Busca produtos pelo nome ou pela descrição, tolerando erros de digitação:
+    
+    - **q**: Termo buscado (prefixo, trecho ou nome aproximado)
+    - **limit**: Número máximo de resultados (padrão: 20)
+    """
+    termo = q.strip()
+    if not termo:
+        return []
+    return crud.ProdutoCRUD.buscar_produtos(db=db, termo=termo, limit=limit)
+
+@app.get("/produtos/baixo-estoque", response_model=List[schemas.Produto],
+         summary="Produtos com Baixo Estoque",
+         description="Retorna os produtos com estoque abaixo do limite, do menor para o maior")
+def listar_baixo_estoque(response: Response,
+                         limite: int = Query(settings.LIMITE_BAIXO_ESTOQUE, ge=0),
+                         limit: int = Query(100, ge=1, le=1000),
+                         cursor: Optional[str] = None,
+                         db: Session = Depends(get_db)):
+    """
+    Lista os produtos com quantidade_estoque menor que o limite, ordenados por
+    quantidade e ID:
+    
+    - **limite**: Estoque abaixo deste valor é considerado baixo (padrão: LIMITE_BAIXO_ESTOQUE)
+    - **limit**: Número máximo de registros a retornar (padrão: 100)
+    - **cursor**: Valor de X-Next-Cursor da página anterior, no formato "quantidade:id"
+    """
+    posicao = None
+    if cursor is not None:
+        try:
+            quantidade, produto_id = (int(parte) for parte in cursor.split(":"))
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Cursor inválido; use o formato quantidade:id")
+        posicao = (quantidade, produto_id)
+    
+    produtos = crud.ProdutoCRUD.listar_baixo_estoque(db=db, limite=limite, limit=limit, cursor=posicao)
+    definir_proximo_cursor(response, produtos, limit,
+                           lambda produto: f"{produto.quantidade_estoque}:{produto.id}")
+    return produtos
+
+@app.get("/produtos/{produto_id}", response_model=schemas.Produto, responses=RESPOSTA_304,
          summary="Obter Produto", description="Retorna um produto específico por ID")
-def obter_produto(produto_id: int, db: Session = Depends(get_db)):
+def obter_produto(produto_id: int, request: Request, response: Response, db: Session = Depends(get_db)):
     """
     Obtém um produto específico pelo ID:
     
     - **produto_id**: ID único do produto
+    
+    Aceita **If-None-Match** com o ETag recebido (304 se nada mudou).
     """
-    produto = crud.ProdutoCRUD.obter_produto(db=db, produto_id=produto_id)
+    # O ETag é da tabela inteira: o registro é buscado antes para que um id
+    # inexistente responda 404 mesmo com If-None-Match
+    versao = crud.VersaoTabelaCRUD.obter(db, "produtos")
+    if settings.SERIALIZACAO_RAPIDA:
+        produto = crud.ProdutoCRUD.obter_produto_dados(db=db, produto_id=produto_id)
+    else:
+        produto = crud.ProdutoCRUD.obter_produto(db=db, produto_id=produto_id)
     if produto is None:
         raise HTTPException(status_code=404, detail="Produto não encontrado")
-    return produto
+    nao_modificado = resposta_nao_modificada(request, response, etag_fraco("produtos", versao))
+    if nao_modificado:
+        return nao_modificado
+    return resposta_rapida(response, produto) if settings.SERIALIZACAO_RAPIDA else produto
 
 @app.put("/produtos/{produto_id}", response_model=schemas.Produto,
          summary="Atualizar Produto", description="Atualiza um produto existente")
@@ -75,13 +206,45 @@ def atualizar_produto(produto_id: int, produto: schemas.ProdutoUpdate, db: Sessi
     Atualiza um produto existente:
     
     - **produto_id**: ID do produto a ser atualizado
-    - **produto**: Dados para atualização (todos os campos são opcionais)
+    - **produto**: Dados para atualização (todos os campos são opcionais; SKU de outro produto responde 409)
     """
     produto_atualizado = crud.ProdutoCRUD.atualizar_produto(db=db, produto_id=produto_id, produto_update=produto)
     if produto_atualizado is None:
         raise HTTPException(status_code=404, detail="Produto não encontrado")
     return produto_atualizado
 
+@app.patch("/produtos/estoque", response_model=List[schemas.EstoqueProduto],
+           summary="Ajustar Estoque em Lote", description="Aplica vários ajustes de estoque de uma vez")
+def ajustar_estoque_em_lote(ajustes: List[schemas.AjusteEstoqueLote], db: Session = Depends(get_db)):
+    """
+    Ajusta o estoque de vários produtos em uma única operação (ex.: recebimento de mercadoria):
+    
+    - **ajustes**: Lista de **produto_id** e **delta** (positivo para entrada, negativo para saída)
+    
+    A operação é atômica: se algum produto não existir ou ficar com estoque
+    negativo, nenhum ajuste é aplicado.
+    """
+    if not ajustes:
+        return []
+    return crud.ProdutoCRUD.atualizar_estoque_em_lote(db=db, ajustes=ajustes)
+
+@app.patch("/produtos/{produto_id}/estoque", response_model=schemas.Produto,
+           summary="Ajustar Estoque", description="Soma uma variação ao estoque de um produto")
+def ajustar_estoque(produto_id: int, ajuste: schemas.AjusteEstoque, db: Session = Depends(get_db)):
+    """
+    Ajusta o estoque de um produto de forma atômica:
+    
+    - **produto_id**: ID do produto
+    - **delta**: Variação da quantidade (positiva para entrada, negativa para saída)
+    
+    O ajuste é aplicado sobre o valor atual no banco, sem sobrescrever
+    alterações concorrentes. Retorna erro 400 se o estoque ficaria negativo.
+    """
+    produto = crud.ProdutoCRUD.atualizar_estoque(db=db, produto_id=produto_id, quantidade=ajuste.delta)
+    if produto is None:
+        raise HTTPException(status_code=404, detail="Produto não encontrado")
+    return produto
+
 @app.delete("/produtos/{produto_id}", status_code=status.HTTP_204_NO_CONTENT,
             summary="Excluir Produto", description="Remove um produto do sistema")
 def excluir_produto(produto_id: int, db: Session = Depends(get_db)):
@@ -97,7 +260,8 @@ def excluir_produto(produto_id: int, db: Session = Depends(get_db)):
 # Endpoints para Pedidos
 @app.post("/pedidos/", response_model=schemas.Pedido, status_code=status.HTTP_201_CREATED,
           summary="Criar Pedido", description="Cria um novo pedido e atualiza o estoque")
-def criar_pedido(pedido: schemas.PedidoCreate, db: Session = Depends(get_db)):
+def criar_pedido(pedido: schemas.PedidoCreate, idempotency_key: Optional[str] = Header(None, max_length=255),
+                 db: Session = Depends(get_db)):
     """
     Cria um novo pedido com as seguintes informações:
     
@@ -111,36 +275,145 @@ def criar_pedido(pedido: schemas.PedidoCreate, db: Session = Depends(get_db)):
     - Verifica se há estoque suficiente
     - Calcula os valores totais
     - Atualiza o estoque dos produtos
+    
+    Com o cabeçalho **Idempotency-Key**, repetições da mesma requisição (ex.:
+    após um timeout) devolvem o pedido já criado, com o cabeçalho
+    **Idempotent-Replayed: true**, em vez de criar outro.
     """
     try:
-        return crud.PedidoCRUD.criar_pedido(db=db, pedido=pedido)
+        if idempotency_key is None:
+            return crud.PedidoCRUD.criar_pedido(db=db, pedido=pedido)
+        resposta, repetida = crud.PedidoCRUD.criar_pedido_idempotente(db=db, pedido=pedido, chave=idempotency_key)
+        return resposta_idempotente(resposta, repetida)
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Erro interno: {str(e)}")
 
-@app.get("/pedidos/", response_model=List[schemas.Pedido],
+@app.post("/pedidos/lote", response_model=schemas.ResultadoLotePedidos,
+          summary="Criar Pedidos em Lote", description="Cria vários pedidos em uma única requisição")
+def criar_pedidos_em_lote(pedidos: List[schemas.PedidoCreate], tamanho_chunk: Optional[int] = Query(None, ge=1),
+                          db: Session = Depends(get_db)):
+    """
+    Cria vários pedidos de uma vez (integrações de marketplace):
+    
+    - **pedidos**: Lista de pedidos no mesmo formato de POST /pedidos/
+    - **tamanho_chunk**: Pedidos gravados por transação (padrão: configuração TAMANHO_CHUNK_PEDIDOS_LOTE)
+    
+    Cada pedido é aceito ou rejeitado individualmente; o resultado informa,
+    na ordem de envio, o ID do pedido criado ou o motivo da falha.
+    """
+    resultados = crud.PedidoCRUD.criar_pedidos_em_lote(
+        db=db, pedidos=pedidos, tamanho_chunk=tamanho_chunk or settings.TAMANHO_CHUNK_PEDIDOS_LOTE
+    )
+    total_sucesso = sum(1 for resultado in resultados if resultado["sucesso"])
+    return {
+        "total": len(resultados),
+        "sucesso": total_sucesso,
+        "falhas": len(resultados) - total_sucesso,
+        "resultados": resultados,
+    }
+
+@app.get("/pedidos/", response_model=List[schemas.Pedido], responses=RESPOSTA_304,
          summary="Listar Pedidos", description="Retorna lista de todos os pedidos")
-def listar_pedidos(skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
+def listar_pedidos(request: Request, response: Response, skip: int = 0, limit: int = 100,
+                   after_id: Optional[int] = None, db: Session = Depends(get_db)):
     """
-    Lista todos os pedidos com paginação:
+    Lista todos os pedidos, ordenados por ID, com paginação:
     
     - **skip**: Número de registros para pular (padrão: 0)
     - **limit**: Número máximo de registros a retornar (padrão: 100)
+    - **after_id**: Cursor; retorna os pedidos com ID maior que este (ignora skip)
+    
+    Quando houver uma próxima página, o cabeçalho **X-Next-Cursor** traz o
+    valor a ser enviado em after_id. Com **If-None-Match** igual ao ETag
+    recebido, retorna 304 se nenhum pedido mudou desde então.
     """
-    pedidos = crud.PedidoCRUD.listar_pedidos(db=db, skip=skip, limit=limit)
+    nao_modificado = resposta_nao_modificada(
+        request, response, etag_fraco("pedidos", crud.VersaoTabelaCRUD.obter(db, "pedidos")))
+    if nao_modificado:
+        return nao_modificado
+    
+    if settings.SERIALIZACAO_RAPIDA:
+        pedidos = crud.PedidoCRUD.listar_pedidos_dados(db=db, skip=skip, limit=limit, after_id=after_id)
+        definir_proximo_cursor(response, pedidos, limit, lambda pedido: str(pedido["id"]))
+        return resposta_rapida(response, pedidos)
+    
+    pedidos = crud.PedidoCRUD.listar_pedidos(db=db, skip=skip, limit=limit, after_id=after_id)
+    definir_proximo_cursor(response, pedidos, limit)
     return pedidos
 
-@app.get("/pedidos/{pedido_id}", response_model=schemas.Pedido,
+@app.delete("/pedidos/", response_model=schemas.ResultadoExclusaoPedidos,
+            summary="Excluir Pedidos em Lote", description="Remove vários pedidos e restaura o estoque")
+def excluir_pedidos(ids: List[int] = Query(default=[], description="IDs dos pedidos (ex.: ?ids=1&ids=2)"),
+                    db: Session = Depends(get_db)):
+    """
+    Cancela vários pedidos em uma única transação:
+    
+    - **ids**: IDs dos pedidos a remover (até MAX_PEDIDOS_EXCLUSAO_LOTE por requisição)
+    
+    O estoque de todos os itens é restaurado de uma vez. IDs inexistentes
+    são ignorados e listados em nao_encontrados.
+    """
+    if not ids:
+        raise HTTPException(status_code=400, detail="Informe ao menos um pedido em ids (ex.: ?ids=1&ids=2)")
+    if len(ids) > settings.MAX_PEDIDOS_EXCLUSAO_LOTE:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Informe no máximo {settings.MAX_PEDIDOS_EXCLUSAO_LOTE} pedidos por requisição"
+        )
+    excluidos = crud.PedidoCRUD.excluir_pedidos(db=db, pedido_ids=ids)
+    return {"excluidos": excluidos, "nao_encontrados": sorted(set(ids) - set(excluidos))}
+
+@app.get("/pedidos/export", summary="Exportar Pedidos",
+         description="Exporta os pedidos com seus itens em CSV ou NDJSON, transmitidos em streaming",
+         response_class=StreamingResponse,
+         responses={200: {"content": {"text/csv": {}, "application/x-ndjson": {}}}})
+def exportar_pedidos(formato: str = Query("csv", pattern="^(csv|ndjson)$"),
+                     de: Union[datetime, date, None] = None, ate: Union[datetime, date, None] = None,
+                     tamanho_chunk: Optional[int] = Query(None, ge=1)):
+    """
+    Exporta todos os pedidos do período, com seus itens:
+    
+    - **formato**: csv (uma linha por item) ou ndjson (um pedido por linha, com os itens)
+    - **de**: Data (AAAA-MM-DD) ou data/hora inicial, inclusiva (opcional)
+    - **ate**: Data (AAAA-MM-DD) ou data/hora final, exclusiva (opcional)
+    - **tamanho_chunk**: Pedidos lidos por bloco (padrão: configuração TAMANHO_CHUNK_EXPORTACAO)
+    
+    O arquivo é enviado aos poucos, conforme os blocos são lidos do banco.
+    """
+    tipos = {"csv": "text/csv; charset=utf-8", "ndjson": "application/x-ndjson"}
+    return StreamingResponse(
+        exportacao.exportar_pedidos_em_sessao(
+            formato, de, ate, tamanho_chunk or settings.TAMANHO_CHUNK_EXPORTACAO
+        ),
+        media_type=tipos[formato],
+        headers={"Content-Disposition": f'attachment; filename="pedidos.{formato}"'},
+    )
+
+@app.get("/pedidos/{pedido_id}", response_model=schemas.Pedido, responses=RESPOSTA_304,
          summary="Obter Pedido", description="Retorna um pedido específico por ID")
-def obter_pedido(pedido_id: int, db: Session = Depends(get_db)):
+def obter_pedido(pedido_id: int, request: Request, response: Response, db: Session = Depends(get_db)):
     """
     Obtém um pedido específico pelo ID:
     
     - **pedido_id**: ID único do pedido
+    
+    Aceita **If-None-Match** com o ETag recebido (304 se nada mudou).
     """
-    pedido = crud.PedidoCRUD.obter_pedido(db=db, pedido_id=pedido_id)
+    # O ETag é da tabela inteira: o registro é buscado antes para que um id
+    # inexistente responda 404 mesmo com If-None-Match
+    versao = crud.VersaoTabelaCRUD.obter(db, "pedidos")
+    if settings.SERIALIZACAO_RAPIDA:
+        pedido = crud.PedidoCRUD.obter_pedido_dados(db=db, pedido_id=pedido_id)
+    else:
+        pedido = crud.PedidoCRUD.obter_pedido(db=db, pedido_id=pedido_id)
     if pedido is None:
         raise HTTPException(status_code=404, detail="Pedido não encontrado")
-    return pedido
+    nao_modificado = resposta_nao_modificada(request, response, etag_fraco("pedidos", versao))
+    if nao_modificado:
+        return nao_modificado
+    return resposta_rapida(response, pedido) if settings.SERIALIZACAO_RAPIDA else pedido
 
 @app.put("/pedidos/{pedido_id}", response_model=schemas.Pedido,
          summary="Atualizar Pedido", description="Atualiza um pedido existente")
@@ -152,9 +425,9 @@ def atualizar_pedido(pedido_id: int, pedido: schemas.PedidoUpdate, db: Session =
     - **pedido**: Dados para atualização
     
     O sistema automaticamente:
-    - Restaura o estoque dos itens antigos
-    - Valida os novos itens
-    - Atualiza o estoque dos novos itens
+    - Compara os novos itens com os atuais, produto a produto
+    - Ajusta o estoque só dos produtos cuja quantidade mudou
+    - Mantém o preço unitário dos itens que continuam no pedido
     - Recalcula o valor total
     """
     pedido_atualizado = crud.PedidoCRUD.atualizar_pedido(db=db, pedido_id=pedido_id, pedido_update=pedido)
@@ -176,14 +449,156 @@ def excluir_pedido(pedido_id: int, db: Session = Depends(get_db)):
     if not sucesso:
         raise HTTPException(status_code=404, detail="Pedido não encontrado")
 
-# Endpoint de saúde da API
+# Endpoints para Reservas de estoque
+@app.post("/reservas/", response_model=schemas.Reserva, status_code=status.HTTP_201_CREATED,
+          summary="Reservar Estoque", description="Separa unidades do estoque por um tempo limitado")
+def criar_reserva(reserva: schemas.ReservaCreate, db: Session = Depends(get_db)):
+    """
+    Reserva produtos para um cliente (ex.: enquanto o pagamento é processado):
+    
+    - **cliente**: Nome do cliente (obrigatório)
+    - **itens**: Produtos e quantidades a reservar
+    - **ttl_segundos**: Validade da reserva (padrão: configuração RESERVA_TTL_SEGUNDOS)
+    
+    As unidades reservadas deixam de estar disponíveis para pedidos e outras
+    reservas até a confirmação, a liberação ou o vencimento da reserva.
+    """
+    return crud.ReservaCRUD.criar_reserva(
+        db=db, reserva=reserva, ttl_segundos=reserva.ttl_segundos or settings.RESERVA_TTL_SEGUNDOS
+    )
+
+@app.post("/reservas/{reserva_id}/confirmar", response_model=schemas.Pedido, status_code=status.HTTP_201_CREATED,
+          summary="Confirmar Reserva", description="Transforma uma reserva em pedido")
+def confirmar_reserva(reserva_id: int, db: Session = Depends(get_db)):
+    """
+    Cria o pedido com os itens da reserva e baixa o estoque reservado:
+    
+    - **reserva_id**: ID da reserva
+    
+    Retorna 410 se a reserva já venceu (as unidades são liberadas).
+    """
+    return crud.ReservaCRUD.confirmar_reserva(db=db, reserva_id=reserva_id)
+
+@app.delete("/reservas/{reserva_id}", status_code=status.HTTP_204_NO_CONTENT,
+            summary="Liberar Reserva", description="Cancela uma reserva e devolve as unidades ao disponível")
+def liberar_reserva(reserva_id: int, db: Session = Depends(get_db)):
+    """
+    Cancela uma reserva ainda não confirmada:
+    
+    - **reserva_id**: ID da reserva
+    """
+    if not crud.ReservaCRUD.liberar_reserva(db=db, reserva_id=reserva_id):
+        raise HTTPException(status_code=404, detail="Reserva não encontrada")
+
+def limpar_expirados():
+    """Libera as reservas vencidas e apaga as chaves de idempotência antigas"""
+    db = SessionLocal()
+    try:
+        crud.ReservaCRUD.liberar_expiradas(db, settings.RESERVA_LOTE_LIMPEZA)
+        crud.IdempotenciaCRUD.limpar_expiradas(
+            db,
+            antes_de=datetime.now(timezone.utc) - timedelta(hours=settings.IDEMPOTENCIA_TTL_HORAS),
+            tamanho_lote=settings.IDEMPOTENCIA_LOTE_LIMPEZA,
+        )
+    finally:
+        db.close()
+
+async def limpar_periodicamente():
+    """Executa limpar_expirados a cada RESERVA_INTERVALO_LIMPEZA segundos"""
+    while True:
+        await asyncio.sleep(settings.RESERVA_INTERVALO_LIMPEZA)
+        try:
+            await run_in_threadpool(limpar_expirados)
+        except Exception as e:
+            print(f"Erro na limpeza de reservas e chaves expiradas: {e}")
+
+async def sondar_periodicamente():
+    """Verifica o banco a cada SONDA_BANCO_INTERVALO segundos"""
+    while True:
+        await asyncio.sleep(settings.SONDA_BANCO_INTERVALO)
+        await run_in_threadpool(sonda_banco.sondar)
+
+# Estatísticas do dashboard
+@app.get("/estatisticas", response_model=schemas.Estatisticas, summary="Estatísticas do Dashboard",
+         description="Retorna os totais de produtos, pedidos e estoque calculados no banco")
+def obter_estatisticas(db: Session = Depends(get_db)):
+    """
+    Resumo para o dashboard, calculado com agregações no banco:
+    
+    - Total de produtos e de pedidos
+    - Produtos em baixo estoque (abaixo de LIMITE_BAIXO_ESTOQUE) e os de menor estoque
+    - Valor total do estoque
+    - Cinco pedidos mais recentes
+    
+    O resultado fica em cache por CACHE_TTL_ESTATISTICAS segundos.
+    """
+    if backend_cache is not None:
+        em_cache = backend_cache.obter("estatisticas")
+        if em_cache is not None:
+            return em_cache
+    
+    estatisticas = schemas.Estatisticas(
+        **crud.EstatisticasCRUD.calcular(db=db, limite_baixo_estoque=settings.LIMITE_BAIXO_ESTOQUE)
+    ).model_dump(mode="json")
+    if backend_cache is not None:
+        backend_cache.guardar("estatisticas", estatisticas, settings.CACHE_TTL_ESTATISTICAS)
+    return estatisticas
+
+# Estatísticas do cache de produtos
+@app.get("/cache/estatisticas", summary="Estatísticas do Cache",
+         description="Retorna os contadores do cache de leitura dos produtos")
+def estatisticas_cache():
+    """
+    Contadores do cache de produtos deste processo:
+    
+    - **acertos** / **faltas**: leituras atendidas ou não pelo cache
+    - **despejos**: entradas descartadas por limite de tamanho
+    - **invalidacoes**: descartes causados por escritas nos dados dos produtos (o estoque não fica no cache)
+    """
+    return cache_produtos.estatisticas()
+
+# Métricas para o Prometheus
+@app.get("/metrics", include_in_schema=False)
+def metricas_prometheus():
+    """Métricas deste processo no formato texto do Prometheus"""
+    return Response(content=metricas.gerar(), media_type=metricas.TIPO_CONTEUDO)
+
+# Endpoints de saúde da API (async: respondem mesmo com o threadpool ocupado)
+@app.get("/saude/vivo", summary="Liveness", description="Indica se o processo está respondendo")
+async def saude_vivo():
+    """
+    Verificação de liveness: não acessa o banco nem outros serviços. Uma
+    falha aqui indica que o processo deve ser reiniciado.
+    """
+    return {"status": "online"}
+
+@app.get("/saude/pronto", response_model=schemas.Prontidao, summary="Readiness",
+         description="Indica se a API está pronta para receber tráfego",
+         responses={503: {"model": schemas.Prontidao, "description": "Banco indisponível"}})
+async def saude_pronto():
+    """
+    Verificação de readiness, a partir da última verificação do banco feita em
+    segundo plano a cada SONDA_BANCO_INTERVALO segundos (não abre conexões):
+    
+    - **database**: online, offline, desatualizado (verificação atrasada) ou verificando (ao subir)
+    - **latencia_ms**: duração da última verificação
+    - **pool**: conexões do pool e utilização
+    
+    Responde 503 enquanto o banco não estiver disponível.
+    """
+    situacao = schemas.Prontidao(**sonda_banco.situacao())
+    if not situacao.pronto:
+        return JSONResponse(status_code=503, content=situacao.model_dump(mode="json"))
+    return situacao
+
 @app.get("/", summary="Status da API", description="Verifica se a API está funcionando")
 def status_api():
     """
     Endpoint de verificação de status da API.
-    Retorna uma mensagem confirmando que a API está funcionando.
+    Retorna uma mensagem confirmando que a API está funcionando, com o estado
+    do banco segundo a última verificação em segundo plano.
     """
-    db_status = "online" if test_database_connection() else "offline"
+    db_status = "online" if sonda_banco.situacao()["pronto"] else "offline"
     
     return {
         "message": f"{settings.APP_NAME} funcionando!",
@@ -194,18 +609,26 @@ def status_api():
         "redoc": "/redoc"
     }
 
+# Backend assíncrono: troca as rotas de CRUD pelas versões com AsyncSession
+if settings.DATABASE_BACKEND == "async":
+    import rotas_async
+    rotas_async.substituir_rotas(app)
+    if settings.METRICAS_ATIVAS:
+        from database_async import async_engine
+        metricas.instrumentar_engine(async_engine.sync_engine, nome="async")
+
 # Tratamento de erros personalizado
 @app.exception_handler(404)
 async def not_found_handler(request, exc):
-    return {"detail": "Recurso não encontrado"}
+    return JSONResponse(status_code=404, content={"detail": "Recurso não encontrado"})
 
 @app.exception_handler(400)
 async def bad_request_handler(request, exc):
-    return {"detail": str(exc.detail)}
+    return JSONResponse(status_code=400, content={"detail": str(exc.detail)})
 
 @app.exception_handler(500)
 async def internal_error_handler(request, exc):
-    return {"detail": "Erro interno do servidor"}
+    return JSONResponse(status_code=500, content={"detail": "Erro interno do servidor"})
 
 if __name__ == "__main__":
     import uvicorn
@@ -0,0 +1,176 @@
+"""
+Métricas da aplicação no formato do Prometheus (GET /metrics)
+
+- latência e requisições em andamento por rota (middleware ASGI);
+- comandos SQL e tempo no banco por requisição (eventos do engine);
+- tamanho do pool de conexões, retiradas, conexões abertas e tempo de uso
+  de cada conexão (eventos do pool, que continuam valendo após engine.dispose());
+- contadores de negócio (pedidos criados e recusados por falta de estoque).
+
+As rotas são identificadas pelo caminho declarado (ex.: /produtos/{produto_id}),
+não pela URL, para manter limitado o número de séries. Os valores são de
+cada processo, como os de GET /cache/estatisticas.
+"""
+
+import time
+from contextvars import ContextVar
+from typing import Optional
+
+from prometheus_client import CONTENT_TYPE_LATEST, CollectorRegistry, Counter, Gauge, Histogram, generate_latest
+from prometheus_client.core import GaugeMetricFamily
+from prometheus_client.process_collector import ProcessCollector
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+registro = CollectorRegistry()
+ProcessCollector(registry=registro)
+
+DURACAO_REQUISICAO = Histogram(
+    "http_requisicao_duracao_segundos", "Duração das requisições HTTP",
+    ["metodo", "rota", "status"], registry=registro,
+)
+REQUISICOES_EM_ANDAMENTO = Gauge(
+    "http_requisicoes_em_andamento", "Requisições HTTP sendo atendidas", registry=registro,
+)
+SQL_POR_REQUISICAO = Histogram(
+    "http_requisicao_sql_comandos", "Comandos SQL executados por requisição",
+    ["metodo", "rota"], buckets=(0, 1, 2, 3, 5, 8, 13, 21, 34, 55, 89), registry=registro,
+)
+# Contador em vez de histograma (mais barato): a média por requisição é a
+# razão entre este total e http_requisicao_duracao_segundos_count
+SQL_TEMPO_POR_ROTA = Counter(
+    "http_requisicao_sql_duracao_segundos", "Tempo gasto no banco pelas requisições",
+    ["metodo", "rota"], registry=registro,
+)
+RETIRADAS_POOL = Counter(
+    "db_pool_retiradas_total", "Conexões retiradas do pool", ["engine"], registry=registro,
+)
+CONEXOES_ABERTAS = Counter(
+    "db_pool_conexoes_abertas_total", "Conexões novas abertas com o banco", ["engine"], registry=registro,
+)
+USO_CONEXAO = Histogram(
+    "db_pool_uso_segundos", "Tempo entre a retirada de uma conexão e sua devolução ao pool",
+    ["engine"], buckets=(0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1, 5, 30), registry=registro,
+)
+
+PEDIDOS_CRIADOS = Counter(
+    "pedidos_criados_total", "Pedidos criados", ["origem"], registry=registro,
+)
+PEDIDOS_SEM_ESTOQUE = Counter(
+    "pedidos_recusados_sem_estoque_total", "Pedidos recusados por estoque insuficiente",
+    ["origem"], registry=registro,
+)
+
+# Contagem [comandos, segundos] da requisição atual; também chega às rotas
+# síncronas, que copiam o contexto ao rodar no threadpool
+_sql_requisicao: ContextVar[Optional[list]] = ContextVar("sql_requisicao", default=None)
+
+class MiddlewareMetricas:
+    """Middleware ASGI que mede cada requisição HTTP"""
+
+    def __init__(self, app):
+        self.app = app
+        # Séries já resolvidas por (método, rota, status): evita o custo de labels() a cada requisição
+        self._series = {}
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        metodo = scope["method"]
+        status = 500
+
+        async def enviar(mensagem):
+            nonlocal status
+            if mensagem["type"] == "http.response.start":
+                status = mensagem["status"]
+            await send(mensagem)
+
+        sql = [0, 0.0]
+        token = _sql_requisicao.set(sql)
+        REQUISICOES_EM_ANDAMENTO.inc()
+        inicio = time.perf_counter()
+        try:
+            await self.app(scope, receive, enviar)
+        finally:
+            duracao = time.perf_counter() - inicio
+            REQUISICOES_EM_ANDAMENTO.dec()
+            _sql_requisicao.reset(token)
+            # O roteador do FastAPI guarda no scope a rota atendida
+            rota = getattr(scope.get("route"), "path", "desconhecida")
+            series = self._series.get((metodo, rota, status))
+            if series is None:
+                series = self._series[(metodo, rota, status)] = (
+                    DURACAO_REQUISICAO.labels(metodo, rota, str(status)),
+                    SQL_POR_REQUISICAO.labels(metodo, rota),
+                    SQL_TEMPO_POR_ROTA.labels(metodo, rota),
+                )
+            series[0].observe(duracao)
+            series[1].observe(sql[0])
+            series[2].inc(sql[1])
+
+# Comandos fora de uma requisição (ex.: limpeza periódica) não são medidos
+def _antes_do_comando(conn, cursor, statement, parameters, context, executemany):
+    conn.info["metricas_inicio"] = time.perf_counter()
+
+def _depois_do_comando(conn, cursor, statement, parameters, context, executemany):
+    sql = _sql_requisicao.get()
+    if sql is not None:
+        sql[0] += 1
+        sql[1] += time.perf_counter() - conn.info.get("metricas_inicio", 0.0)
+
+class ColetorPool:
+    """Estado do pool de conexões de cada engine, lido no momento da coleta"""
+
+    def __init__(self):
+        self.engines = {}
+
+    def collect(self):
+        for metrica, descricao in (
+            ("size", "Conexões mantidas pelo pool"),
+            ("checkedout", "Conexões em uso"),
+            ("checkedin", "Conexões livres no pool"),
+            ("overflow", "Conexões além do tamanho do pool"),
+        ):
+            familia = GaugeMetricFamily(f"db_pool_{metrica}", descricao, labels=["engine"])
+            for nome, engine in self.engines.items():
+                # Pools sem limite (ex.: SQLite em memória) não têm esses contadores
+                if hasattr(engine.pool, metrica):
+                    familia.add_metric([nome], getattr(engine.pool, metrica)())
+            yield familia
+
+coletor_pool = ColetorPool()
+registro.register(coletor_pool)
+
+def instrumentar_engine(engine: Engine, nome: str = "sync"):
+    """Registra os eventos de SQL e as métricas do pool de um engine"""
+    event.listen(engine, "before_cursor_execute", _antes_do_comando)
+    event.listen(engine, "after_cursor_execute", _depois_do_comando)
+    coletor_pool.engines[nome] = engine
+
+    # Eventos registrados no engine passam para o pool novo criado por
+    # engine.dispose(). O pool não tem evento antes da espera por uma conexão;
+    # a saturação aparece em db_pool_checkedout e no tempo de uso das conexões
+    retiradas, abertas, uso = RETIRADAS_POOL.labels(nome), CONEXOES_ABERTAS.labels(nome), USO_CONEXAO.labels(nome)
+
+    def ao_abrir(conexao_dbapi, registro_conexao):
+        abertas.inc()
+
+    def ao_retirar(conexao_dbapi, registro_conexao, proxy):
+        retiradas.inc()
+        registro_conexao.info["metricas_retirada"] = time.perf_counter()
+
+    def ao_devolver(conexao_dbapi, registro_conexao):
+        retirada = registro_conexao.info.pop("metricas_retirada", None)
+        if retirada is not None:
+            uso.observe(time.perf_counter() - retirada)
+
+    event.listen(engine, "connect", ao_abrir)
+    event.listen(engine, "checkout", ao_retirar)
+    event.listen(engine, "checkin", ao_devolver)
+
+def gerar() -> bytes:
+    return generate_latest(registro)
+
+TIPO_CONTEUDO = CONTENT_TYPE_LATEST
@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+"""
+Migrações do schema do banco
+
+Aplica as migrações pendentes do Alembic (migrations/) no banco de
+DATABASE_URL. Deve rodar uma única vez antes de cada deploy: a API não cria
+nem altera tabelas ao subir. Execuções simultâneas no PostgreSQL são
+serializadas por um advisory lock (ver migrations/env.py).
+
+Bancos criados antes das migrações (tabelas do antigo create_tables(), sem
+alembic_version) são reconhecidos: o schema original é marcado como 0001 e
+só as migrações seguintes são aplicadas.
+
+Com VERIFICAR_SCHEMA_AO_SUBIR=true a API compara, ao subir, a versão do banco
+com a última migração (verificar_versao) e não inicia se forem diferentes.
+
+Uso:
+    python migrar.py              # aplica as migrações pendentes
+    python migrar.py --verificar  # só compara as versões (código 1 se divergirem)
+"""
+
+import argparse
+import logging
+import os
+import sys
+from typing import Optional
+
+from alembic import command
+from alembic.config import Config
+from alembic.runtime.migration import MigrationContext
+from alembic.script import ScriptDirectory
+from sqlalchemy import inspect
+from sqlalchemy.engine import Engine
+
+DIRETORIO = os.path.dirname(os.path.abspath(__file__))
+
+def _config(connection=None) -> Config:
+    config = Config()
+    config.set_main_option("script_location", os.path.join(DIRETORIO, "migrations"))
+    # Bancos sem alembic_version, mas com as tabelas do create_tables() antigo,
+    # são marcados na migração 0001 antes do upgrade (ver migrations/env.py)
+    config.attributes["adotar_schema_existente"] = True
+    if connection is not None:
+        config.attributes["connection"] = connection
+    return config
+
+def versao_migracoes() -> str:
+    """Última migração disponível no código"""
+    return ScriptDirectory.from_config(_config()).get_current_head()
+
+def versao_banco(engine: Engine) -> Optional[str]:
+    """Migração aplicada no banco (None se o banco nunca foi migrado)"""
+    with engine.connect() as connection:
+        return MigrationContext.configure(connection).get_current_revision()
+
+def verificar_versao(engine: Engine):
+    """Lança RuntimeError se o banco não estiver na última migração"""
+    atual, esperada = versao_banco(engine), versao_migracoes()
+    if atual != esperada:
+        raise RuntimeError(
+            f"Schema do banco na versão {atual or '(sem migrações)'}, mas a aplicação espera {esperada}. "
+            f"Rode `python migrar.py` antes de subir a API."
+        )
+
+def aplicar_migracoes(engine: Optional[Engine] = None):
+    """Leva o banco até a última migração (por padrão, o de DATABASE_URL)"""
+    if engine is None:
+        command.upgrade(_config(), "head")
+        return
+    with engine.connect() as connection:
+        command.upgrade(_config(connection), "head")
+
+def main():
+    parser = argparse.ArgumentParser(description="Aplica as migrações do schema no banco de DATABASE_URL")
+    parser.add_argument("--verificar", action="store_true",
+                        help="Só compara a versão do banco com a última migração")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING, format="%(message)s")
+
+    from database import engine
+
+    antes, esperada = versao_banco(engine), versao_migracoes()
+    if args.verificar:
+        if antes != esperada:
+            print(f"❌ Banco na versão {antes or '(sem migrações)'}; última migração: {esperada}")
+            return 1
+        print(f"✅ Banco na última migração ({esperada})")
+        return 0
+
+    if antes == esperada:
+        print(f"✅ Nada a aplicar: banco já na versão {esperada}")
+        return 0
+    if antes is None and inspect(engine).has_table("produtos"):
+        antes = "(schema anterior às migrações, marcado como 0001)"
+    print(f"🔄 Migrando o banco de {antes or '(vazio)'} para {esperada}...")
+    logging.getLogger("alembic.runtime.migration").setLevel(logging.INFO)
+    aplicar_migracoes()
+    logging.getLogger("alembic.runtime.migration").setLevel(logging.WARNING)
+    print(f"✅ Banco na versão {versao_banco(engine)}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,216 +1,325 @@
 #!/usr/bin/env python3
 """
 Script de Migração: SQLite para PostgreSQL
-Este script migra dados de um banco SQLite para PostgreSQL
+
+Migra os dados de um banco SQLite para o PostgreSQL de DATABASE_URL:
+
+- lê cada tabela em blocos, pelo rowid do SQLite (igual ao id nas tabelas
+  com chave inteira), sem carregar tudo em memória;
+- grava cada bloco com COPY FROM STDIN, numa transação que também registra
+  o progresso (tabela migracao_sqlite_progresso). Se o processo cair, basta
+  rodar de novo: a migração continua do último bloco gravado;
+- divide as tabelas em fatias de IDs migradas em paralelo; produtos,
+  pedidos, reservas e chaves de idempotência vão juntos e os itens de
+  pedido e de reserva depois deles, por causa das FKs;
+- ao final ajusta as sequences (setval), recalcula o resumo do estoque e
+  confere contagem e checksum de cada tabela nos dois bancos.
+
+O schema de destino precisa existir antes (alembic upgrade head).
+
+Uso:
+    python migrate_sqlite_to_postgres.py --sqlite estoque.db --paralelo 4
+    python migrate_sqlite_to_postgres.py --reiniciar   # apaga o destino e recomeça
 """
 
+import argparse
+import hashlib
+import io
+import os
 import sqlite3
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+
 import psycopg2
-import os
-from datetime import datetime
+
+import crud
 from config import settings
+from database import SessionLocal
 
-def conectar_sqlite():
-    """Conecta ao banco SQLite"""
-    try:
-        conn = sqlite3.connect('estoque.db')
-        print("✅ Conectado ao SQLite")
-        return conn
-    except Exception as e:
-        print(f"❌ Erro ao conectar ao SQLite: {e}")
-        return None
+# Colunas migradas de cada tabela. resumo_estoque e versoes_tabelas não entram:
+# são derivadas e refeitas em finalizar()
+TABELAS = {
+    "produtos": ["id", "sku", "nome", "descricao", "preco", "quantidade_estoque", "quantidade_reservada"],
+    "pedidos": ["id", "cliente", "valorTotalPedido", "dataPedido"],
+    "itens_pedido": ["id", "pedido_id", "produto_id", "nome_produto", "quantidade",
+                     "preco_unitario", "valor_total_item"],
+    "reservas": ["id", "cliente", "criada_em", "expira_em"],
+    "itens_reserva": ["id", "reserva_id", "produto_id", "quantidade"],
+    "chaves_idempotencia": ["chave", "hash_requisicao", "resposta", "criada_em"],
+}
+
+# Tabelas de uma mesma fase não dependem umas das outras
+FASES = [["produtos", "pedidos", "reservas", "chaves_idempotencia"], ["itens_pedido", "itens_reserva"]]
+
+TABELA_PROGRESSO = "migracao_sqlite_progresso"
+
+def conectar_sqlite(caminho: str) -> sqlite3.Connection:
+    """Conecta ao banco SQLite (somente leitura)"""
+    return sqlite3.connect(f"file:{caminho}?mode=ro", uri=True, check_same_thread=False)
 
 def conectar_postgres():
-    """Conecta ao banco PostgreSQL"""
-    try:
-        # Extrair parâmetros da URL do banco
-        db_url = settings.DATABASE_URL
-        if db_url.startswith('postgresql://'):
-            db_url = db_url.replace('postgresql://', '')
-        
-        # Parse da URL
-        if '@' in db_url:
-            auth, rest = db_url.split('@')
-            user, password = auth.split(':')
-            host_port_db = rest.split('/')
-            host_port = host_port_db[0].split(':')
-            host = host_port[0]
-            port = host_port[1] if len(host_port) > 1 else '5432'
-            database = host_port_db[1]
-        else:
-            user = settings.POSTGRES_USER
-            password = settings.POSTGRES_PASSWORD
-            host = settings.POSTGRES_HOST
-            port = settings.POSTGRES_PORT
-            database = settings.POSTGRES_DB
-        
-        conn = psycopg2.connect(
-            host=host,
-            port=port,
-            database=database,
-            user=user,
-            password=password
-        )
-        print("✅ Conectado ao PostgreSQL")
-        return conn
-    except Exception as e:
-        print(f"❌ Erro ao conectar ao PostgreSQL: {e}")
-        return None
-
-def migrar_produtos(sqlite_conn, postgres_conn):
-    """Migra dados da tabela produtos"""
+    """Conecta ao PostgreSQL de DATABASE_URL, com datas em UTC"""
+    url = settings.DATABASE_URL.replace("postgresql+psycopg2://", "postgresql://")
+    return psycopg2.connect(url, options="-c timezone=UTC")
+
+def colunas_origem(sqlite_conn, tabela: str) -> list:
+    """
+    Colunas da tabela que existem no SQLite. Bancos antigos não têm sku,
+    quantidade_reservada nem as tabelas de reservas e de idempotência
+    (lista vazia); no destino essas colunas ficam com o valor padrão.
+    """
+    existentes = {linha[1].lower() for linha in sqlite_conn.execute(f'PRAGMA table_info("{tabela}")')}
+    return [coluna for coluna in TABELAS[tabela] if coluna.lower() in existentes]
+
+def _lista_colunas(colunas: list) -> str:
+    return ", ".join(f'"{coluna}"' for coluna in colunas)
+
+def _valor_copy(valor) -> str:
+    """Valor no formato texto do COPY"""
+    if valor is None:
+        return "\\N"
+    if isinstance(valor, float):
+        return repr(valor)
+    return (str(valor).replace("\\", "\\\\").replace("\t", "\\t")
+            .replace("\n", "\\n").replace("\r", "\\r"))
+
+def preparar_progresso(postgres_conn, sqlite_conn, paralelo: int, chunk: int):
+    """Cria a tabela de progresso e divide em fatias as tabelas ainda não registradas"""
+    with postgres_conn.cursor() as cursor:
+        cursor.execute(f"""
+            CREATE TABLE IF NOT EXISTS {TABELA_PROGRESSO} (
+                tabela VARCHAR(50) NOT NULL,
+                fatia INTEGER NOT NULL,
+                id_inicial BIGINT NOT NULL,
+                id_final BIGINT NOT NULL,
+                ultimo_id BIGINT NOT NULL,
+                linhas BIGINT NOT NULL DEFAULT 0,
+                concluida BOOLEAN NOT NULL DEFAULT FALSE,
+                PRIMARY KEY (tabela, fatia)
+            )
+        """)
+        for tabela in TABELAS:
+            cursor.execute(f"SELECT 1 FROM {TABELA_PROGRESSO} WHERE tabela = %s LIMIT 1", (tabela,))
+            if cursor.fetchone():
+                continue  # Retomada: mantém as fatias da primeira execução
+
+            if colunas_origem(sqlite_conn, tabela):
+                minimo, maximo, total = sqlite_conn.execute(
+                    f'SELECT MIN(rowid), MAX(rowid), COUNT(*) FROM "{tabela}"').fetchone()
+            else:
+                total = 0
+            if not total:
+                cursor.execute(f"INSERT INTO {TABELA_PROGRESSO} VALUES (%s, 0, 0, -1, 0, 0, TRUE)", (tabela,))
+                continue
+            # Tabelas pequenas ficam numa fatia só
+            fatias = max(1, min(paralelo, total // chunk))
+            tamanho = (maximo - minimo) // fatias + 1
+            for fatia in range(fatias):
+                inicio = minimo + fatia * tamanho
+                fim = maximo if fatia == fatias - 1 else inicio + tamanho - 1
+                cursor.execute(
+                    f"INSERT INTO {TABELA_PROGRESSO} VALUES (%s, %s, %s, %s, %s, 0, FALSE)",
+                    (tabela, fatia, inicio, fim, inicio - 1),
+                )
+    postgres_conn.commit()
+
+def migrar_fatia(caminho_sqlite: str, tabela: str, fatia: int, chunk: int) -> int:
+    """Copia uma fatia de IDs em blocos; cada bloco e seu progresso são gravados juntos"""
+    sqlite_conn = conectar_sqlite(caminho_sqlite)
+    postgres_conn = conectar_postgres()
     try:
-        # Buscar dados do SQLite
-        cursor_sqlite = sqlite_conn.cursor()
-        cursor_sqlite.execute("SELECT id, nome, descricao, preco, quantidade_estoque FROM produtos")
-        produtos = cursor_sqlite.fetchall()
-        
-        if not produtos:
-            print("ℹ️  Nenhum produto encontrado no SQLite")
-            return
-        
-        # Inserir no PostgreSQL
-        cursor_postgres = postgres_conn.cursor()
-        
-        # Limpar tabela produtos (se existir)
-        cursor_postgres.execute("DELETE FROM produtos")
-        
-        # Inserir produtos
-        for produto in produtos:
-            cursor_postgres.execute("""
-                INSERT INTO produtos (id, nome, descricao, preco, quantidade_estoque)
-                VALUES (%s, %s, %s, %s, %s)
-            """, produto)
-        
-        postgres_conn.commit()
-        print(f"✅ {len(produtos)} produtos migrados com sucesso")
-        
-    except Exception as e:
-        print(f"❌ Erro ao migrar produtos: {e}")
-        postgres_conn.rollback()
-
-def migrar_pedidos(sqlite_conn, postgres_conn):
-    """Migra dados das tabelas pedidos e itens_pedido"""
+        colunas = colunas_origem(sqlite_conn, tabela)
+        # O rowid guia os blocos e o progresso, mas não é copiado
+        consulta = (f'SELECT rowid, {_lista_colunas(colunas)} FROM "{tabela}" '
+                    f'WHERE rowid > ? AND rowid <= ? ORDER BY rowid LIMIT ?')
+        copy = f"COPY {tabela} ({_lista_colunas(colunas)}) FROM STDIN"
+
+        with postgres_conn.cursor() as cursor:
+            cursor.execute(
+                f"SELECT id_final, ultimo_id, concluida FROM {TABELA_PROGRESSO} WHERE tabela = %s AND fatia = %s",
+                (tabela, fatia),
+            )
+            id_final, ultimo_id, concluida = cursor.fetchone()
+            postgres_conn.commit()
+
+            copiadas = 0
+            while not concluida:
+                linhas = sqlite_conn.execute(consulta, (ultimo_id, id_final, chunk)).fetchall()
+                if linhas:
+                    buffer = io.StringIO()
+                    for linha in linhas:
+                        buffer.write("\t".join(_valor_copy(valor) for valor in linha[1:]))
+                        buffer.write("\n")
+                    buffer.seek(0)
+                    cursor.copy_expert(copy, buffer)
+                    ultimo_id = linhas[-1][0]
+                concluida = len(linhas) < chunk
+                cursor.execute(
+                    f"UPDATE {TABELA_PROGRESSO} SET ultimo_id = %s, linhas = linhas + %s, concluida = %s "
+                    f"WHERE tabela = %s AND fatia = %s",
+                    (ultimo_id, len(linhas), concluida, tabela, fatia),
+                )
+                postgres_conn.commit()
+                copiadas += len(linhas)
+        return copiadas
+    finally:
+        sqlite_conn.close()
+        postgres_conn.close()
+
+def migrar(caminho_sqlite: str, paralelo: int, chunk: int):
+    """Executa as fases em ordem; as fatias de uma fase rodam em paralelo"""
+    postgres_conn = conectar_postgres()
     try:
-        cursor_sqlite = sqlite_conn.cursor()
-        cursor_postgres = postgres_conn.cursor()
-        
-        # Migrar pedidos
-        cursor_sqlite.execute("SELECT id, cliente, valorTotalPedido, dataPedido FROM pedidos")
-        pedidos = cursor_sqlite.fetchall()
-        
-        if not pedidos:
-            print("ℹ️  Nenhum pedido encontrado no SQLite")
-            return
-        
-        # Limpar tabelas
-        cursor_postgres.execute("DELETE FROM itens_pedido")
-        cursor_postgres.execute("DELETE FROM pedidos")
-        
-        # Inserir pedidos
-        for pedido in pedidos:
-            cursor_postgres.execute("""
-                INSERT INTO pedidos (id, cliente, valorTotalPedido, dataPedido)
-                VALUES (%s, %s, %s, %s)
-            """, pedido)
-        
-        # Migrar itens de pedido
-        cursor_sqlite.execute("""
-            SELECT id, pedido_id, produto_id, nome_produto, quantidade, 
-                   preco_unitario, valor_total_item 
-            FROM itens_pedido
-        """)
-        itens = cursor_sqlite.fetchall()
-        
-        for item in itens:
-            cursor_postgres.execute("""
-                INSERT INTO itens_pedido 
-                (id, pedido_id, produto_id, nome_produto, quantidade, preco_unitario, valor_total_item)
-                VALUES (%s, %s, %s, %s, %s, %s, %s)
-            """, item)
-        
-        postgres_conn.commit()
-        print(f"✅ {len(pedidos)} pedidos e {len(itens)} itens migrados com sucesso")
-        
-    except Exception as e:
-        print(f"❌ Erro ao migrar pedidos: {e}")
-        postgres_conn.rollback()
-
-def verificar_migracao(postgres_conn):
-    """Verifica se a migração foi bem-sucedida"""
+        with postgres_conn.cursor() as cursor:
+            cursor.execute(f"SELECT tabela, fatia FROM {TABELA_PROGRESSO} WHERE NOT concluida ORDER BY tabela, fatia")
+            pendentes = cursor.fetchall()
+    finally:
+        postgres_conn.close()
+
+    with ThreadPoolExecutor(max_workers=paralelo) as executor:
+        for fase in FASES:
+            fatias = [(tabela, fatia) for tabela, fatia in pendentes if tabela in fase]
+            if not fatias:
+                continue
+            inicio = time.perf_counter()
+            copiadas = list(executor.map(
+                lambda tarefa: migrar_fatia(caminho_sqlite, tarefa[0], tarefa[1], chunk), fatias
+            ))
+            duracao = time.perf_counter() - inicio
+            print(f"📦 {', '.join(fase)}: {sum(copiadas)} linhas em {len(fatias)} fatia(s), "
+                  f"{duracao:.1f}s ({sum(copiadas) / max(duracao, 1e-9):.0f} linhas/s)")
+
+def finalizar(postgres_conn):
+    """Ajusta as sequences dos IDs e refaz os dados derivados dos produtos"""
+    with postgres_conn.cursor() as cursor:
+        for tabela, colunas in TABELAS.items():
+            if "id" not in colunas:
+                continue
+            cursor.execute(
+                f"SELECT setval(pg_get_serial_sequence(%s, 'id'), COALESCE(MAX(id), 1), MAX(id) IS NOT NULL) "
+                f"FROM {tabela}",
+                (tabela,),
+            )
+        # Os ETags antigos deixam de valer
+        cursor.execute("DELETE FROM resumo_estoque")
+        cursor.execute("UPDATE versoes_tabelas SET versao = versao + 1")
+    postgres_conn.commit()
+
+    # O resumo do estoque é recalculado a partir dos produtos migrados
+    with SessionLocal() as db:
+        crud.ResumoEstoqueCRUD.reconciliar(db)
+
+def _valor_canonico(valor) -> str:
+    """Representação igual nos dois bancos (datas do SQLite vêm como texto, em UTC)"""
+    if valor is None:
+        return "\\N"
+    if isinstance(valor, str) and len(valor) >= 19 and valor[4] == "-" and valor[10] in " T":
+        try:
+            valor = datetime.fromisoformat(valor)
+        except ValueError:
+            pass
+    if isinstance(valor, datetime):
+        if valor.tzinfo is not None:
+            valor = valor.astimezone(timezone.utc).replace(tzinfo=None)
+        return valor.isoformat()
+    if isinstance(valor, float):
+        return repr(valor)
+    return str(valor)
+
+def _checksum(linhas) -> tuple:
+    """Contagem e soma (mod 2^64) do hash de cada linha; não depende da ordem de leitura"""
+    total = 0
+    soma = 0
+    for linha in linhas:
+        texto = "\t".join(_valor_canonico(valor) for valor in linha).encode("utf-8")
+        soma = (soma + int.from_bytes(hashlib.blake2b(texto, digest_size=8).digest(), "big")) % 2 ** 64
+        total += 1
+    return total, soma
+
+def verificar_tabela(caminho_sqlite: str, tabela: str) -> bool:
+    sqlite_conn = conectar_sqlite(caminho_sqlite)
+    postgres_conn = conectar_postgres()
     try:
-        cursor = postgres_conn.cursor()
-        
-        # Contar produtos
-        cursor.execute("SELECT COUNT(*) FROM produtos")
-        total_produtos = cursor.fetchone()[0]
-        
-        # Contar pedidos
-        cursor.execute("SELECT COUNT(*) FROM pedidos")
-        total_pedidos = cursor.fetchone()[0]
-        
-        # Contar itens
-        cursor.execute("SELECT COUNT(*) FROM itens_pedido")
-        total_itens = cursor.fetchone()[0]
-        
-        print("\n📊 Resumo da Migração:")
-        print(f"   Produtos: {total_produtos}")
-        print(f"   Pedidos: {total_pedidos}")
-        print(f"   Itens de Pedido: {total_itens}")
-        
-        if total_produtos > 0 or total_pedidos > 0:
-            print("✅ Migração concluída com sucesso!")
+        colunas = _lista_colunas(colunas_origem(sqlite_conn, tabela))
+        if colunas:
+            origem = _checksum(sqlite_conn.execute(f'SELECT {colunas} FROM "{tabela}"'))
         else:
-            print("⚠️  Nenhum dado foi migrado")
-            
-    except Exception as e:
-        print(f"❌ Erro ao verificar migração: {e}")
+            # Tabela ausente no SQLite: o destino deve continuar vazio
+            origem, colunas = (0, 0), "1"
+        # Cursor nomeado: as linhas vêm do servidor aos poucos
+        with postgres_conn.cursor(name=f"verificar_{tabela}") as cursor:
+            cursor.itersize = 10000
+            cursor.execute(f"SELECT {colunas} FROM {tabela}")
+            destino = _checksum(cursor)
+    finally:
+        sqlite_conn.close()
+        postgres_conn.close()
+
+    confere = origem == destino
+    print(f"   {'✅' if confere else '❌'} {tabela}: SQLite {origem[0]} linhas / {origem[1]:016x}, "
+          f"PostgreSQL {destino[0]} linhas / {destino[1]:016x}")
+    return confere
+
+def reiniciar(postgres_conn):
+    """Apaga os dados migrados e o progresso, para recomeçar do zero"""
+    with postgres_conn.cursor() as cursor:
+        cursor.execute(f"TRUNCATE {', '.join(TABELAS)} RESTART IDENTITY")
+        cursor.execute(f"DROP TABLE IF EXISTS {TABELA_PROGRESSO}")
+    postgres_conn.commit()
 
 def main():
     """Função principal de migração"""
+    parser = argparse.ArgumentParser(description="Migra os dados do SQLite para o PostgreSQL de DATABASE_URL")
+    parser.add_argument("--sqlite", default="estoque.db", help="Arquivo do banco SQLite (padrão: estoque.db)")
+    parser.add_argument("--paralelo", type=int, default=4, help="Fatias migradas ao mesmo tempo")
+    parser.add_argument("--chunk", type=int, default=50000, help="Linhas por bloco (COPY + commit)")
+    parser.add_argument("--reiniciar", action="store_true",
+                        help="Apaga os dados migrados do destino e recomeça do zero")
+    parser.add_argument("--sem-verificacao", action="store_true", help="Pula a conferência de checksums")
+    args = parser.parse_args()
+
     print("🔄 Iniciando migração de SQLite para PostgreSQL")
     print("=" * 50)
-    
-    # Conectar aos bancos
-    sqlite_conn = conectar_sqlite()
-    if not sqlite_conn:
-        return
-    
+
+    if not os.path.exists(args.sqlite):
+        print(f"❌ Arquivo {args.sqlite} não encontrado")
+        sys.exit(1)
+
+    sqlite_conn = conectar_sqlite(args.sqlite)
     postgres_conn = conectar_postgres()
-    if not postgres_conn:
-        sqlite_conn.close()
-        return
-    
     try:
-        # Verificar se o arquivo SQLite existe
-        if not os.path.exists('estoque.db'):
-            print("❌ Arquivo estoque.db não encontrado")
-            return
-        
-        # Executar migração
-        print("\n📦 Migrando produtos...")
-        migrar_produtos(sqlite_conn, postgres_conn)
-        
-        print("\n🛒 Migrando pedidos...")
-        migrar_pedidos(sqlite_conn, postgres_conn)
-        
-        print("\n🔍 Verificando migração...")
-        verificar_migracao(postgres_conn)
-        
-        print("\n🎉 Migração concluída!")
-        print("\n💡 Próximos passos:")
-        print("   1. Teste a aplicação com o novo banco")
-        print("   2. Faça backup do banco PostgreSQL")
-        print("   3. Remova o arquivo estoque.db se não for mais necessário")
-        
-    except Exception as e:
-        print(f"❌ Erro durante a migração: {e}")
-    
+        if args.reiniciar:
+            print("🧹 Limpando o destino...")
+            reiniciar(postgres_conn)
+        preparar_progresso(postgres_conn, sqlite_conn, args.paralelo, args.chunk)
     finally:
-        # Fechar conexões
         sqlite_conn.close()
+
+    try:
+        migrar(args.sqlite, args.paralelo, args.chunk)
+        finalizar(postgres_conn)
+        print("🔢 Sequences ajustadas e resumo do estoque recalculado")
+    finally:
         postgres_conn.close()
-        print("\n🔒 Conexões fechadas")
+
+    if args.sem_verificacao:
+        print("\n🎉 Migração concluída (sem verificação)")
+        return
+
+    print("\n🔍 Verificando contagens e checksums...")
+    with ThreadPoolExecutor(max_workers=len(TABELAS)) as executor:
+        resultados = list(executor.map(lambda tabela: verificar_tabela(args.sqlite, tabela), TABELAS))
+    if not all(resultados):
+        print("\n❌ Divergências encontradas entre os bancos")
+        sys.exit(1)
+
+    print("\n🎉 Migração concluída!")
+    print("\n💡 Próximos passos:")
+    print("   1. Teste a aplicação com o novo banco")
+    print("   2. Faça backup do banco PostgreSQL")
+    print(f"   3. Remova a tabela {TABELA_PROGRESSO} e o arquivo {args.sqlite} se não forem mais necessários")
 
 if __name__ == "__main__":
-    main() 
\ No newline at end of file
+    main()
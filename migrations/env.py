@@ -0,0 +1,104 @@
+"""
+Ambiente das migrações do Alembic
+
+Usa o mesmo DATABASE_URL da aplicação e os metadados de models.py. O
+migrar.py também pode passar uma conexão pronta em config.attributes e
+pedir que bancos anteriores às migrações sejam adotados (ver
+schema_anterior_as_migracoes).
+"""
+
+from logging.config import fileConfig
+
+from alembic import context
+from sqlalchemy import engine_from_config, inspect, pool, text
+
+import models
+from config import settings
+
+config = context.config
+config.set_main_option("sqlalchemy.url", settings.DATABASE_URL.replace("%", "%%"))
+
+if config.config_file_name is not None:
+    fileConfig(config.config_file_name)
+
+target_metadata = models.Base.metadata
+
+# Chave do advisory lock que serializa execuções simultâneas no PostgreSQL
+CHAVE_LOCK_MIGRACOES = 72510001
+
+# Migração que reproduz o schema do create_tables() de antes das migrações
+REVISAO_SCHEMA_ORIGINAL = "0001"
+
+def schema_anterior_as_migracoes(connection) -> bool:
+    """Banco com as tabelas da aplicação, mas sem a tabela alembic_version"""
+    inspetor = inspect(connection)
+    return inspetor.has_table("produtos") and not inspetor.has_table("alembic_version")
+
+def incluir_objeto(dialeto):
+    """Ignora no autogenerate as estruturas de busca que só existem em um dos bancos"""
+    def _incluir(objeto, nome, tipo, refletido, comparado_com):
+        if tipo == "table" and nome.startswith("produtos_busca"):
+            return False  # Tabela FTS5 do SQLite (migração 0003)
+        if tipo == "index" and nome.endswith("_trgm") and dialeto != "postgresql":
+            return False
+        return True
+    return _incluir
+
+def run_migrations_offline():
+    """Gera o SQL das migrações sem conectar ao banco (alembic upgrade --sql)"""
+    context.configure(
+        url=config.get_main_option("sqlalchemy.url"),
+        target_metadata=target_metadata,
+        literal_binds=True,
+        dialect_opts={"paramstyle": "named"},
+    )
+    with context.begin_transaction():
+        context.run_migrations()
+
+def migrar_na_conexao(connection):
+    # Dois deploys migrando ao mesmo tempo: o segundo espera o primeiro e, ao
+    # ler a versão do banco, não encontra mais nada a aplicar. O lock é de
+    # sessão porque algumas migrações saem da transação (CONCURRENTLY)
+    bloquear = connection.dialect.name == "postgresql"
+    if bloquear:
+        connection.execute(text("SELECT pg_advisory_lock(:chave)"), {"chave": CHAVE_LOCK_MIGRACOES})
+        connection.commit()
+    try:
+        context.configure(
+            connection=connection,
+            target_metadata=target_metadata,
+            include_object=incluir_objeto(connection.dialect.name),
+            # SQLite não tem ALTER TABLE completo; o Alembic recria a tabela
+            render_as_batch=connection.dialect.name == "sqlite",
+        )
+        with context.begin_transaction():
+            # Bancos criados pelo create_tables() antigo (migrar.py): marca o
+            # schema original e aplica só o que veio depois, sem recriar tabelas.
+            # Dentro do lock, para que dois deploys não marquem o banco duas vezes
+            if config.attributes.get("adotar_schema_existente") and schema_anterior_as_migracoes(connection):
+                context.get_context().stamp(context.script, REVISAO_SCHEMA_ORIGINAL)
+            context.run_migrations()
+    finally:
+        if bloquear:
+            connection.execute(text("SELECT pg_advisory_unlock(:chave)"), {"chave": CHAVE_LOCK_MIGRACOES})
+            connection.commit()
+
+def run_migrations_online():
+    """Aplica as migrações no banco configurado"""
+    connection = config.attributes.get("connection")
+    if connection is not None:
+        migrar_na_conexao(connection)
+        return
+
+    connectable = engine_from_config(
+        config.get_section(config.config_ini_section, {}),
+        prefix="sqlalchemy.",
+        poolclass=pool.NullPool,
+    )
+    with connectable.connect() as connection:
+        migrar_na_conexao(connection)
+
+if context.is_offline_mode():
+    run_migrations_offline()
+else:
+    run_migrations_online()
@@ -0,0 +1,63 @@
+"""schema inicial
+
+Tabelas produtos, pedidos e itens_pedido exatamente como o create_tables()
+original as criava, antes de qualquer migração. Bancos já existentes têm
+esse schema: o migrar.py os marca nesta versão (sem alembic_version) e
+aplica só as migrações seguintes, que trazem as colunas e tabelas
+adicionadas depois. Com o alembic direto: `alembic stamp 0001` antes do
+primeiro `alembic upgrade head`.
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-17
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0001"
+down_revision = None
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    op.create_table(
+        "produtos",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("nome", sa.String(length=100), nullable=False),
+        sa.Column("descricao", sa.Text(), nullable=True),
+        sa.Column("preco", sa.Float(), nullable=False),
+        sa.Column("quantidade_estoque", sa.Integer(), nullable=False),
+    )
+    op.create_index("ix_produtos_id", "produtos", ["id"])
+    op.create_index("ix_produtos_nome", "produtos", ["nome"])
+
+    op.create_table(
+        "pedidos",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("cliente", sa.String(length=100), nullable=False),
+        sa.Column("valorTotalPedido", sa.Float(), nullable=False),
+        sa.Column("dataPedido", sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=True),
+    )
+    op.create_index("ix_pedidos_id", "pedidos", ["id"])
+
+    op.create_table(
+        "itens_pedido",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("pedido_id", sa.Integer(), sa.ForeignKey("pedidos.id"), nullable=False),
+        sa.Column("produto_id", sa.Integer(), sa.ForeignKey("produtos.id"), nullable=False),
+        sa.Column("nome_produto", sa.String(length=100), nullable=False),
+        sa.Column("quantidade", sa.Integer(), nullable=False),
+        sa.Column("preco_unitario", sa.Float(), nullable=False),
+        sa.Column("valor_total_item", sa.Float(), nullable=False),
+    )
+    op.create_index("ix_itens_pedido_id", "itens_pedido", ["id"])
+
+def downgrade():
+    op.drop_index("ix_itens_pedido_id", table_name="itens_pedido")
+    op.drop_table("itens_pedido")
+    op.drop_index("ix_pedidos_id", table_name="pedidos")
+    op.drop_table("pedidos")
+    op.drop_index("ix_produtos_nome", table_name="produtos")
+    op.drop_index("ix_produtos_id", table_name="produtos")
+    op.drop_table("produtos")
@@ -0,0 +1,42 @@
+"""índices da consulta de baixo estoque
+
+- ix_produtos_quantidade_estoque_id: (quantidade_estoque, id), atende
+  GET /produtos/baixo-estoque com qualquer limite e a paginação por cursor;
+- ix_produtos_baixo_estoque: o mesmo índice, parcial, só com as linhas
+  abaixo do limite padrão (10). Fica pequeno mesmo com catálogos grandes.
+
+No PostgreSQL os índices são criados com CONCURRENTLY, sem bloquear as
+escritas na tabela de produtos durante a migração.
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-17
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0002"
+down_revision = "0001"
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    with op.get_context().autocommit_block():
+        op.create_index(
+            "ix_produtos_quantidade_estoque_id", "produtos", ["quantidade_estoque", "id"],
+            if_not_exists=True, postgresql_concurrently=True,
+        )
+        op.create_index(
+            "ix_produtos_baixo_estoque", "produtos", ["quantidade_estoque", "id"],
+            if_not_exists=True, postgresql_concurrently=True,
+            postgresql_where=sa.text("quantidade_estoque < 10"),
+            sqlite_where=sa.text("quantidade_estoque < 10"),
+        )
+
+def downgrade():
+    with op.get_context().autocommit_block():
+        op.drop_index("ix_produtos_baixo_estoque", table_name="produtos",
+                      if_exists=True, postgresql_concurrently=True)
+        op.drop_index("ix_produtos_quantidade_estoque_id", table_name="produtos",
+                      if_exists=True, postgresql_concurrently=True)
@@ -0,0 +1,65 @@
+"""busca de produtos por similaridade
+
+- PostgreSQL: extensão pg_trgm e índices GIN de trigramas em nome e
+  descricao (criados com CONCURRENTLY);
+- SQLite: tabela FTS5 produtos_busca com tokenizador de trigramas, triggers
+  de sincronização e carga inicial dos produtos existentes.
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-17
+"""
+
+from alembic import op
+
+revision = "0003"
+down_revision = "0002"
+branch_labels = None
+depends_on = None
+
+DDL_SQLITE = [
+    "CREATE VIRTUAL TABLE IF NOT EXISTS produtos_busca USING fts5("
+    "nome, descricao, content='produtos', content_rowid='id', tokenize='trigram')",
+    "CREATE TRIGGER IF NOT EXISTS produtos_busca_ai AFTER INSERT ON produtos BEGIN "
+    "INSERT INTO produtos_busca(rowid, nome, descricao) VALUES (new.id, new.nome, new.descricao); END",
+    "CREATE TRIGGER IF NOT EXISTS produtos_busca_ad AFTER DELETE ON produtos BEGIN "
+    "INSERT INTO produtos_busca(produtos_busca, rowid, nome, descricao) "
+    "VALUES ('delete', old.id, old.nome, old.descricao); END",
+    "CREATE TRIGGER IF NOT EXISTS produtos_busca_au AFTER UPDATE OF nome, descricao ON produtos BEGIN "
+    "INSERT INTO produtos_busca(produtos_busca, rowid, nome, descricao) "
+    "VALUES ('delete', old.id, old.nome, old.descricao); "
+    "INSERT INTO produtos_busca(rowid, nome, descricao) VALUES (new.id, new.nome, new.descricao); END",
+    "INSERT INTO produtos_busca(produtos_busca) VALUES ('rebuild')",
+]
+
+def upgrade():
+    dialeto = op.get_bind().dialect.name
+    if dialeto == "postgresql":
+        op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+        with op.get_context().autocommit_block():
+            op.create_index(
+                "ix_produtos_nome_trgm", "produtos", ["nome"],
+                postgresql_using="gin", postgresql_ops={"nome": "gin_trgm_ops"},
+                if_not_exists=True, postgresql_concurrently=True,
+            )
+            op.create_index(
+                "ix_produtos_descricao_trgm", "produtos", ["descricao"],
+                postgresql_using="gin", postgresql_ops={"descricao": "gin_trgm_ops"},
+                if_not_exists=True, postgresql_concurrently=True,
+            )
+    elif dialeto == "sqlite":
+        for comando in DDL_SQLITE:
+            op.execute(comando)
+
+def downgrade():
+    dialeto = op.get_bind().dialect.name
+    if dialeto == "postgresql":
+        with op.get_context().autocommit_block():
+            op.drop_index("ix_produtos_descricao_trgm", table_name="produtos",
+                          if_exists=True, postgresql_concurrently=True)
+            op.drop_index("ix_produtos_nome_trgm", table_name="produtos",
+                          if_exists=True, postgresql_concurrently=True)
+    elif dialeto == "sqlite":
+        for trigger in ("produtos_busca_ai", "produtos_busca_ad", "produtos_busca_au"):
+            op.execute(f"DROP TRIGGER IF EXISTS {trigger}")
+        op.execute("DROP TABLE IF EXISTS produtos_busca")
@@ -0,0 +1,27 @@
+"""versões por tabela (ETags)
+
+Contador de alterações de produtos e pedidos, incrementado na mesma
+transação de cada escrita e usado nos ETags das rotas de leitura.
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-17
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0004"
+down_revision = "0003"
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    op.create_table(
+        "versoes_tabelas",
+        sa.Column("tabela", sa.String(length=50), primary_key=True),
+        sa.Column("versao", sa.Integer(), nullable=False),
+    )
+
+def downgrade():
+    op.drop_table("versoes_tabelas")
@@ -0,0 +1,31 @@
+"""índices da exportação de pedidos
+
+- ix_pedidos_dataPedido: filtro por período e ordem de leitura da exportação;
+- ix_itens_pedido_pedido_id: busca dos itens de um bloco de pedidos (também
+  usada pelo selectinload das listagens).
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2026-10-17
+"""
+
+from alembic import op
+
+revision = "0005"
+down_revision = "0004"
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    with op.get_context().autocommit_block():
+        op.create_index("ix_pedidos_dataPedido", "pedidos", ["dataPedido"],
+                        if_not_exists=True, postgresql_concurrently=True)
+        op.create_index("ix_itens_pedido_pedido_id", "itens_pedido", ["pedido_id"],
+                        if_not_exists=True, postgresql_concurrently=True)
+
+def downgrade():
+    with op.get_context().autocommit_block():
+        op.drop_index("ix_itens_pedido_pedido_id", table_name="itens_pedido",
+                      if_exists=True, postgresql_concurrently=True)
+        op.drop_index("ix_pedidos_dataPedido", table_name="pedidos",
+                      if_exists=True, postgresql_concurrently=True)
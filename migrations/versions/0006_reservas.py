@@ -0,0 +1,53 @@
+"""reservas de estoque
+
+- produtos.quantidade_reservada: total reservado de cada produto, mantido
+  junto com as reservas (disponível = quantidade_estoque - reservado);
+- reservas e itens_reserva, com índice em expira_em para a limpeza das
+  reservas vencidas.
+
+Revision ID: 0006
+Revises: 0005
+Create Date: 2026-10-17
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0006"
+down_revision = "0005"
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    # Com valor padrão constante, o PostgreSQL adiciona a coluna sem reescrever a tabela
+    op.add_column("produtos", sa.Column("quantidade_reservada", sa.Integer(), nullable=False, server_default="0"))
+
+    op.create_table(
+        "reservas",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("cliente", sa.String(length=100), nullable=False),
+        sa.Column("criada_em", sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=True),
+        sa.Column("expira_em", sa.DateTime(timezone=True), nullable=False),
+    )
+    op.create_index("ix_reservas_id", "reservas", ["id"])
+    op.create_index("ix_reservas_expira_em", "reservas", ["expira_em"])
+
+    op.create_table(
+        "itens_reserva",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("reserva_id", sa.Integer(), sa.ForeignKey("reservas.id"), nullable=False),
+        sa.Column("produto_id", sa.Integer(), sa.ForeignKey("produtos.id"), nullable=False),
+        sa.Column("quantidade", sa.Integer(), nullable=False),
+    )
+    op.create_index("ix_itens_reserva_id", "itens_reserva", ["id"])
+    op.create_index("ix_itens_reserva_reserva_id", "itens_reserva", ["reserva_id"])
+
+def downgrade():
+    op.drop_index("ix_itens_reserva_reserva_id", table_name="itens_reserva")
+    op.drop_index("ix_itens_reserva_id", table_name="itens_reserva")
+    op.drop_table("itens_reserva")
+    op.drop_index("ix_reservas_expira_em", table_name="reservas")
+    op.drop_index("ix_reservas_id", table_name="reservas")
+    op.drop_table("reservas")
+    with op.batch_alter_table("produtos") as batch_op:
+        batch_op.drop_column("quantidade_reservada")
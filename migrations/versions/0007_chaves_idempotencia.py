@@ -0,0 +1,32 @@
+"""chaves de idempotência de POST /pedidos/
+
+Resposta de cada pedido criado com o cabeçalho Idempotency-Key, gravada na
+mesma transação do pedido. O índice em criada_em atende à limpeza das
+chaves antigas.
+
+Revision ID: 0007
+Revises: 0006
+Create Date: 2026-10-17
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0007"
+down_revision = "0006"
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    op.create_table(
+        "chaves_idempotencia",
+        sa.Column("chave", sa.String(length=255), primary_key=True),
+        sa.Column("hash_requisicao", sa.String(length=64), nullable=False),
+        sa.Column("resposta", sa.Text(), nullable=True),
+        sa.Column("criada_em", sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=True),
+    )
+    op.create_index("ix_chaves_idempotencia_criada_em", "chaves_idempotencia", ["criada_em"])
+
+def downgrade():
+    op.drop_index("ix_chaves_idempotencia_criada_em", table_name="chaves_idempotencia")
+    op.drop_table("chaves_idempotencia")
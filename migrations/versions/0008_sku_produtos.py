@@ -0,0 +1,31 @@
+"""sku dos produtos
+
+Chave natural da importação de catálogos (POST /produtos/importar): coluna
+produtos.sku, opcional, com índice único. O índice único é o alvo do
+ON CONFLICT (sku) do upsert.
+
+Revision ID: 0008
+Revises: 0007
+Create Date: 2026-10-18
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0008"
+down_revision = "0007"
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    op.add_column("produtos", sa.Column("sku", sa.String(length=50), nullable=True))
+    with op.get_context().autocommit_block():
+        op.create_index("ix_produtos_sku", "produtos", ["sku"], unique=True,
+                        if_not_exists=True, postgresql_concurrently=True)
+
+def downgrade():
+    with op.get_context().autocommit_block():
+        op.drop_index("ix_produtos_sku", table_name="produtos",
+                      if_exists=True, postgresql_concurrently=True)
+    with op.batch_alter_table("produtos") as batch_op:
+        batch_op.drop_column("sku")
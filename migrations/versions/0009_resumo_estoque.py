@@ -0,0 +1,44 @@
+"""resumo do estoque
+
+Totais do estoque mantidos incrementalmente (GET /estatisticas), um registro
+por limite de baixo estoque. O registro de LIMITE_BAIXO_ESTOQUE é criado
+aqui a partir de produtos; escritas feitas por uma versão anterior da API
+durante o deploy não entram nele, e reconciliar_estoque.py corrige isso.
+
+Revision ID: 0009
+Revises: 0008
+Create Date: 2026-10-18
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+from config import settings
+
+revision = "0009"
+down_revision = "0008"
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    op.create_table(
+        "resumo_estoque",
+        sa.Column("limite_baixo_estoque", sa.Integer(), primary_key=True, autoincrement=False),
+        sa.Column("total_produtos", sa.Integer(), nullable=False),
+        sa.Column("total_unidades", sa.Integer(), nullable=False),
+        sa.Column("valor_total_estoque", sa.Float(), nullable=False),
+        sa.Column("produtos_baixo_estoque", sa.Integer(), nullable=False),
+        sa.Column("produtos_sem_estoque", sa.Integer(), nullable=False),
+    )
+    op.execute(sa.text(
+        "INSERT INTO resumo_estoque (limite_baixo_estoque, total_produtos, total_unidades,"
+        " valor_total_estoque, produtos_baixo_estoque, produtos_sem_estoque)"
+        " SELECT :limite, COUNT(id), COALESCE(SUM(quantidade_estoque), 0),"
+        " COALESCE(SUM(preco * quantidade_estoque), 0.0),"
+        " COALESCE(SUM(CASE WHEN quantidade_estoque < :limite THEN 1 ELSE 0 END), 0),"
+        " COALESCE(SUM(CASE WHEN quantidade_estoque = 0 THEN 1 ELSE 0 END), 0)"
+        " FROM produtos"
+    ).bindparams(limite=settings.LIMITE_BAIXO_ESTOQUE))
+
+def downgrade():
+    op.drop_table("resumo_estoque")
@@ -1,19 +1,67 @@
-from sqlalchemy import Column, Integer, String, Float, DateTime, ForeignKey, Text
+from sqlalchemy import DDL, Column, Integer, String, Float, DateTime, ForeignKey, Index, Text, event
 from sqlalchemy.orm import relationship
-from sqlalchemy.sql import func
+from sqlalchemy.sql import func, text
 from database import Base
 
 class Produto(Base):
     __tablename__ = "produtos"
 
     id = Column(Integer, primary_key=True, index=True)
+    sku = Column(String(50), nullable=True)  # Chave natural usada na importação de catálogos
     nome = Column(String(100), nullable=False, index=True)
     descricao = Column(Text, nullable=True)
     preco = Column(Float, nullable=False)
     quantidade_estoque = Column(Integer, nullable=False, default=0)
+    # Unidades presas em reservas ativas; o disponível é quantidade_estoque - quantidade_reservada
+    quantidade_reservada = Column(Integer, nullable=False, default=0, server_default="0")
     
     # Relacionamento com itens de pedido
     itens_pedido = relationship("ItemPedido", back_populates="produto")
+    
+    __table_args__ = (
+        # SKU único; alvo do ON CONFLICT (sku) da importação de catálogos
+        Index("ix_produtos_sku", "sku", unique=True),
+        # Consulta de baixo estoque com paginação por (quantidade_estoque, id)
+        Index("ix_produtos_quantidade_estoque_id", "quantidade_estoque", "id"),
+        # Índice parcial, bem menor, para o limite padrão (LIMITE_BAIXO_ESTOQUE=10)
+        Index(
+            "ix_produtos_baixo_estoque", "quantidade_estoque", "id",
+            postgresql_where=text("quantidade_estoque < 10"),
+            sqlite_where=text("quantidade_estoque < 10"),
+        ),
+        # Busca por similaridade (GET /produtos/busca) no PostgreSQL, com pg_trgm
+        Index(
+            "ix_produtos_nome_trgm", "nome",
+            postgresql_using="gin", postgresql_ops={"nome": "gin_trgm_ops"},
+        ).ddl_if(dialect="postgresql"),
+        Index(
+            "ix_produtos_descricao_trgm", "descricao",
+            postgresql_using="gin", postgresql_ops={"descricao": "gin_trgm_ops"},
+        ).ddl_if(dialect="postgresql"),
+    )
+
+# No SQLite a busca usa uma tabela FTS5 com tokenizador de trigramas, mantida
+# em sincronia com produtos por triggers (também criada na migração 0003)
+DDL_BUSCA_SQLITE = [
+    "CREATE VIRTUAL TABLE IF NOT EXISTS produtos_busca USING fts5("
+    "nome, descricao, content='produtos', content_rowid='id', tokenize='trigram')",
+    "CREATE TRIGGER IF NOT EXISTS produtos_busca_ai AFTER INSERT ON produtos BEGIN "
+    "INSERT INTO produtos_busca(rowid, nome, descricao) VALUES (new.id, new.nome, new.descricao); END",
+    "CREATE TRIGGER IF NOT EXISTS produtos_busca_ad AFTER DELETE ON produtos BEGIN "
+    "INSERT INTO produtos_busca(produtos_busca, rowid, nome, descricao) "
+    "VALUES ('delete', old.id, old.nome, old.descricao); END",
+    "CREATE TRIGGER IF NOT EXISTS produtos_busca_au AFTER UPDATE OF nome, descricao ON produtos BEGIN "
+    "INSERT INTO produtos_busca(produtos_busca, rowid, nome, descricao) "
+    "VALUES ('delete', old.id, old.nome, old.descricao); "
+    "INSERT INTO produtos_busca(rowid, nome, descricao) VALUES (new.id, new.nome, new.descricao); END",
+]
+
+event.listen(Produto.__table__, "before_create",
+             DDL("CREATE EXTENSION IF NOT EXISTS pg_trgm").execute_if(dialect="postgresql"))
+for _comando in DDL_BUSCA_SQLITE:
+    event.listen(Produto.__table__, "after_create", DDL(_comando).execute_if(dialect="sqlite"))
+event.listen(Produto.__table__, "before_drop",
+             DDL("DROP TABLE IF EXISTS produtos_busca").execute_if(dialect="sqlite"))
 
 class Pedido(Base):
     __tablename__ = "pedidos"
@@ -21,7 +69,7 @@ class Pedido(Base):
     id = Column(Integer, primary_key=True, index=True)
     cliente = Column(String(100), nullable=False)
     valorTotalPedido = Column(Float, nullable=False, default=0.0)
-    dataPedido = Column(DateTime(timezone=True), server_default=func.now())
+    dataPedido = Column(DateTime(timezone=True), server_default=func.now(), index=True)
     
     # Relacionamento com itens do pedido
     itens = relationship("ItemPedido", back_populates="pedido", cascade="all, delete-orphan")
@@ -30,7 +78,7 @@ class ItemPedido(Base):
     __tablename__ = "itens_pedido"
 
     id = Column(Integer, primary_key=True, index=True)
-    pedido_id = Column(Integer, ForeignKey("pedidos.id"), nullable=False)
+    pedido_id = Column(Integer, ForeignKey("pedidos.id"), nullable=False, index=True)
     produto_id = Column(Integer, ForeignKey("produtos.id"), nullable=False)
     nome_produto = Column(String(100), nullable=False)
     quantidade = Column(Integer, nullable=False)
@@ -39,4 +87,53 @@ class ItemPedido(Base):
     
     # Relacionamentos
     pedido = relationship("Pedido", back_populates="itens")
-    produto = relationship("Produto", back_populates="itens_pedido", lazy="joined") 
\ No newline at end of file
+    # Carregado sob demanda: as respostas usam apenas o nome_produto desnormalizado
+    produto = relationship("Produto", back_populates="itens_pedido") 
+
+class Reserva(Base):
+    """Estoque separado para um cliente até expira_em (ex.: aguardando pagamento)"""
+    __tablename__ = "reservas"
+
+    id = Column(Integer, primary_key=True, index=True)
+    cliente = Column(String(100), nullable=False)
+    criada_em = Column(DateTime(timezone=True), server_default=func.now())
+    expira_em = Column(DateTime(timezone=True), nullable=False, index=True)  # Varredura das expiradas
+    
+    itens = relationship("ItemReserva", back_populates="reserva", cascade="all, delete-orphan")
+
+class ItemReserva(Base):
+    __tablename__ = "itens_reserva"
+
+    id = Column(Integer, primary_key=True, index=True)
+    reserva_id = Column(Integer, ForeignKey("reservas.id"), nullable=False, index=True)
+    produto_id = Column(Integer, ForeignKey("produtos.id"), nullable=False)
+    quantidade = Column(Integer, nullable=False)
+    
+    reserva = relationship("Reserva", back_populates="itens")
+
+class ChaveIdempotencia(Base):
+    """Resposta de POST /pedidos/ guardada pelo cabeçalho Idempotency-Key, para repetições do cliente"""
+    __tablename__ = "chaves_idempotencia"
+
+    chave = Column(String(255), primary_key=True)
+    hash_requisicao = Column(String(64), nullable=False)
+    resposta = Column(Text, nullable=True)  # JSON enviado ao cliente
+    criada_em = Column(DateTime(timezone=True), server_default=func.now(), index=True)  # Limpeza das antigas
+
+class ResumoEstoque(Base):
+    """Totais do estoque mantidos incrementalmente, um registro por limite de baixo estoque"""
+    __tablename__ = "resumo_estoque"
+
+    limite_baixo_estoque = Column(Integer, primary_key=True, autoincrement=False)
+    total_produtos = Column(Integer, nullable=False, default=0)
+    total_unidades = Column(Integer, nullable=False, default=0)
+    valor_total_estoque = Column(Float, nullable=False, default=0.0)
+    produtos_baixo_estoque = Column(Integer, nullable=False, default=0)
+    produtos_sem_estoque = Column(Integer, nullable=False, default=0)
+
+class VersaoTabela(Base):
+    """Contador de alterações por tabela; muda a cada escrita e compõe os ETags da API"""
+    __tablename__ = "versoes_tabelas"
+
+    tabela = Column(String(50), primary_key=True)
+    versao = Column(Integer, nullable=False, default=0)
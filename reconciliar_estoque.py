@@ -0,0 +1,40 @@
+#!/usr/bin/env python3
+"""
+Reconciliação do resumo do estoque
+
+Recalcula a tabela resumo_estoque a partir dos produtos, corrige os totais
+gravados e informa as divergências encontradas. Também cria o registro de
+LIMITE_BAIXO_ESTOQUE quando ele não existe (ex.: depois de mudar o limite).
+
+Uso:
+    python reconciliar_estoque.py
+"""
+
+import sys
+
+import crud
+from cache import cache_produtos
+from database import SessionLocal
+
+def main():
+    """Executa a reconciliação e retorna código 1 se houve divergência"""
+    print("🔍 Reconciliando resumo do estoque...")
+    db = SessionLocal()
+    try:
+        divergencias = crud.ResumoEstoqueCRUD.reconciliar(db)
+    finally:
+        db.close()
+
+    if not divergencias:
+        print("✅ Resumo do estoque consistente com os produtos")
+        return 0
+
+    print(f"⚠️  {len(divergencias)} divergência(s) corrigida(s):")
+    for divergencia in divergencias:
+        print(f"   - limite {divergencia['limite_baixo_estoque']} / {divergencia['campo']}: "
+              f"gravado {divergencia['gravado']} → real {divergencia['real']}")
+    cache_produtos.limpar()
+    return 1
+
+if __name__ == "__main__":
+    sys.exit(main())
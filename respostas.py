@@ -0,0 +1,86 @@
+"""
+Utilitários compartilhados pelas rotas para montar as respostas HTTP
+"""
+
+import json
+from datetime import datetime
+from typing import Any, Callable, Optional
+
+from fastapi import Request, Response
+from fastapi.responses import JSONResponse
+
+try:
+    import orjson
+except ImportError:  # Dependência opcional: sem ela, usa o json da biblioteca padrão
+    orjson = None
+
+def definir_proximo_cursor(response: Response, registros: list, limit: int,
+                           valor_cursor: Optional[Callable[[object], str]] = None):
+    """
+    Informa no cabeçalho X-Next-Cursor o valor a partir do qual buscar a
+    próxima página (por padrão, o ID do último registro)
+    """
+    if registros and len(registros) >= limit:
+        ultimo = registros[-1]
+        response.headers["X-Next-Cursor"] = valor_cursor(ultimo) if valor_cursor else str(ultimo.id)
+
+# Documentação (OpenAPI) das rotas com GET condicional
+RESPOSTA_304 = {304: {"description": "Não modificado: o ETag enviado em If-None-Match ainda é o atual"}}
+
+def etag_fraco(tabela: str, versao: int) -> str:
+    """ETag derivado da versão da tabela (VersaoTabelaCRUD), sem serializar o conteúdo"""
+    return f'W/"{tabela}-{versao}"'
+
+def resposta_nao_modificada(request: Request, response: Response, etag: str) -> Optional[Response]:
+    """
+    Define o ETag da resposta e, se o cliente já tem essa versão
+    (If-None-Match), retorna a resposta 304 a ser devolvida no lugar do
+    conteúdo. Com Cache-Control: no-cache o navegador sempre revalida.
+    """
+    cabecalhos = {"ETag": etag, "Cache-Control": "no-cache"}
+    response.headers.update(cabecalhos)
+
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is None:
+        return None
+    # Comparação fraca: ignora o prefixo W/
+    recebidos = {valor.strip().removeprefix("W/") for valor in if_none_match.split(",")}
+    if "*" in recebidos or etag.removeprefix("W/") in recebidos:
+        return Response(status_code=304, headers=cabecalhos)
+    return None
+
+def _converter_json(valor: Any):
+    # Mesmo formato de data/hora do pydantic (UTC como "Z")
+    if isinstance(valor, datetime):
+        texto = valor.isoformat()
+        return texto[:-6] + "Z" if texto.endswith("+00:00") else texto
+    raise TypeError(f"Tipo não serializável em JSON: {type(valor).__name__}")
+
+class RespostaJSONRapida(JSONResponse):
+    """
+    Resposta JSON para dados já no formato dos schemas (SERIALIZACAO_RAPIDA):
+    o conteúdo é codificado direto, com orjson quando instalado, sem passar
+    pela validação do response_model nem pelo jsonable_encoder.
+    """
+
+    def render(self, content: Any) -> bytes:
+        if orjson is not None:
+            return orjson.dumps(content, option=orjson.OPT_UTC_Z)
+        return json.dumps(content, ensure_ascii=False, allow_nan=False, separators=(",", ":"),
+                          default=_converter_json).encode("utf-8")
+
+def resposta_rapida(response: Response, conteudo: Any) -> RespostaJSONRapida:
+    """Monta a RespostaJSONRapida mantendo os cabeçalhos já definidos na resposta da rota"""
+    resposta = RespostaJSONRapida(conteudo)
+    for nome, valor in response.headers.items():
+        resposta.headers[nome] = valor
+    return resposta
+
+def resposta_idempotente(conteudo: str, repetida: bool) -> Response:
+    """Resposta de criação guardada por Idempotency-Key, enviada sem serializar de novo"""
+    return Response(
+        content=conteudo,
+        status_code=201,
+        media_type="application/json",
+        headers={"Idempotent-Replayed": "true"} if repetida else None,
+    )
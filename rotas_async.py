@@ -0,0 +1,130 @@
+"""
+Rotas de CRUD de produtos e pedidos com acesso assíncrono ao banco
+
+Quando DATABASE_BACKEND=async, estas rotas substituem as versões síncronas
+de main.py com o mesmo caminho e método, mantendo o mesmo contrato da API.
+Cada requisição deixa de ocupar uma thread do threadpool durante a ida ao banco.
+"""
+
+from typing import List, Optional
+
+from fastapi import APIRouter, Depends, Header, HTTPException, Request, Response, status
+from sqlalchemy.ext.asyncio import AsyncSession
+
+import schemas
+from crud_async import PedidoCRUDAsync, ProdutoCRUDAsync, VersaoTabelaCRUDAsync
+from database_async import get_db
+from respostas import RESPOSTA_304, definir_proximo_cursor, etag_fraco, resposta_idempotente, resposta_nao_modificada
+
+router = APIRouter()
+
+# Endpoints para Produtos
+@router.post("/produtos/", response_model=schemas.Produto, status_code=status.HTTP_201_CREATED,
+             summary="Criar Produto", description="Cria um novo produto no sistema")
+async def criar_produto(produto: schemas.ProdutoCreate, db: AsyncSession = Depends(get_db)):
+    return await ProdutoCRUDAsync.criar_produto(db=db, produto=produto)
+
+@router.get("/produtos/", response_model=List[schemas.Produto], responses=RESPOSTA_304,
+            summary="Listar Produtos", description="Retorna lista de todos os produtos")
+async def listar_produtos(request: Request, response: Response, skip: int = 0, limit: int = 100,
+                          after_id: Optional[int] = None, db: AsyncSession = Depends(get_db)):
+    nao_modificado = resposta_nao_modificada(
+        request, response, etag_fraco("produtos", await VersaoTabelaCRUDAsync.obter(db, "produtos")))
+    if nao_modificado:
+        return nao_modificado
+    produtos = await ProdutoCRUDAsync.listar_produtos(db=db, skip=skip, limit=limit, after_id=after_id)
+    definir_proximo_cursor(response, produtos, limit)
+    return produtos
+
+@router.get("/produtos/{produto_id}", response_model=schemas.Produto, responses=RESPOSTA_304,
+            summary="Obter Produto", description="Retorna um produto específico por ID")
+async def obter_produto(produto_id: int, request: Request, response: Response, db: AsyncSession = Depends(get_db)):
+    versao = await VersaoTabelaCRUDAsync.obter(db, "produtos")
+    produto = await ProdutoCRUDAsync.obter_produto(db=db, produto_id=produto_id)
+    if produto is None:
+        raise HTTPException(status_code=404, detail="Produto não encontrado")
+    nao_modificado = resposta_nao_modificada(request, response, etag_fraco("produtos", versao))
+    if nao_modificado:
+        return nao_modificado
+    return produto
+
+@router.put("/produtos/{produto_id}", response_model=schemas.Produto,
+            summary="Atualizar Produto", description="Atualiza um produto existente")
+async def atualizar_produto(produto_id: int, produto: schemas.ProdutoUpdate, db: AsyncSession = Depends(get_db)):
+    produto_atualizado = await ProdutoCRUDAsync.atualizar_produto(db=db, produto_id=produto_id, produto_update=produto)
+    if produto_atualizado is None:
+        raise HTTPException(status_code=404, detail="Produto não encontrado")
+    return produto_atualizado
+
+@router.delete("/produtos/{produto_id}", status_code=status.HTTP_204_NO_CONTENT,
+               summary="Excluir Produto", description="Remove um produto do sistema")
+async def excluir_produto(produto_id: int, db: AsyncSession = Depends(get_db)):
+    sucesso = await ProdutoCRUDAsync.excluir_produto(db=db, produto_id=produto_id)
+    if not sucesso:
+        raise HTTPException(status_code=404, detail="Produto não encontrado")
+
+# Endpoints para Pedidos
+@router.post("/pedidos/", response_model=schemas.Pedido, status_code=status.HTTP_201_CREATED,
+             summary="Criar Pedido", description="Cria um novo pedido e atualiza o estoque")
+async def criar_pedido(pedido: schemas.PedidoCreate, idempotency_key: Optional[str] = Header(None, max_length=255),
+                       db: AsyncSession = Depends(get_db)):
+    try:
+        if idempotency_key is None:
+            return await PedidoCRUDAsync.criar_pedido(db=db, pedido=pedido)
+        resposta, repetida = await PedidoCRUDAsync.criar_pedido_idempotente(db=db, pedido=pedido, chave=idempotency_key)
+        return resposta_idempotente(resposta, repetida)
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Erro interno: {str(e)}")
+
+@router.get("/pedidos/", response_model=List[schemas.Pedido], responses=RESPOSTA_304,
+            summary="Listar Pedidos", description="Retorna lista de todos os pedidos")
+async def listar_pedidos(request: Request, response: Response, skip: int = 0, limit: int = 100,
+                         after_id: Optional[int] = None, db: AsyncSession = Depends(get_db)):
+    nao_modificado = resposta_nao_modificada(
+        request, response, etag_fraco("pedidos", await VersaoTabelaCRUDAsync.obter(db, "pedidos")))
+    if nao_modificado:
+        return nao_modificado
+    pedidos = await PedidoCRUDAsync.listar_pedidos(db=db, skip=skip, limit=limit, after_id=after_id)
+    definir_proximo_cursor(response, pedidos, limit)
+    return pedidos
+
+@router.get("/pedidos/{pedido_id}", response_model=schemas.Pedido, responses=RESPOSTA_304,
+            summary="Obter Pedido", description="Retorna um pedido específico por ID")
+async def obter_pedido(pedido_id: int, request: Request, response: Response, db: AsyncSession = Depends(get_db)):
+    versao = await VersaoTabelaCRUDAsync.obter(db, "pedidos")
+    pedido = await PedidoCRUDAsync.obter_pedido(db=db, pedido_id=pedido_id)
+    if pedido is None:
+        raise HTTPException(status_code=404, detail="Pedido não encontrado")
+    nao_modificado = resposta_nao_modificada(request, response, etag_fraco("pedidos", versao))
+    if nao_modificado:
+        return nao_modificado
+    return pedido
+
+@router.put("/pedidos/{pedido_id}", response_model=schemas.Pedido,
+            summary="Atualizar Pedido", description="Atualiza um pedido existente")
+async def atualizar_pedido(pedido_id: int, pedido: schemas.PedidoUpdate, db: AsyncSession = Depends(get_db)):
+    pedido_atualizado = await PedidoCRUDAsync.atualizar_pedido(db=db, pedido_id=pedido_id, pedido_update=pedido)
+    if pedido_atualizado is None:
+        raise HTTPException(status_code=404, detail="Pedido não encontrado")
+    return pedido_atualizado
+
+@router.delete("/pedidos/{pedido_id}", status_code=status.HTTP_204_NO_CONTENT,
+               summary="Excluir Pedido", description="Remove um pedido e restaura o estoque")
+async def excluir_pedido(pedido_id: int, db: AsyncSession = Depends(get_db)):
+    sucesso = await PedidoCRUDAsync.excluir_pedido(db=db, pedido_id=pedido_id)
+    if not sucesso:
+        raise HTTPException(status_code=404, detail="Pedido não encontrado")
+
+def substituir_rotas(app):
+    """
+    Troca, na mesma posição, as rotas síncronas do app pelas assíncronas de
+    mesmo caminho e método, preservando a ordem de resolução das rotas.
+    """
+    assincronas = {(rota.path, frozenset(rota.methods)): rota for rota in router.routes}
+    app.router.routes = [
+        assincronas.get((rota.path, frozenset(getattr(rota, "methods", None) or ())), rota)
+        for rota in app.router.routes
+    ]
+    app.openapi_schema = None
@@ -4,6 +4,7 @@ from datetime import datetime
 
 # Schemas para Produto
 class ProdutoBase(BaseModel):
+    sku: Optional[str] = Field(None, min_length=1, max_length=50, description="Código do produto no fornecedor")
     nome: str = Field(..., min_length=1, max_length=100, description="Nome do produto")
     descricao: Optional[str] = Field(None, description="Descrição do produto")
     preco: float = Field(..., gt=0, description="Preço unitário do produto")
@@ -13,6 +14,7 @@ class ProdutoCreate(ProdutoBase):
     pass
 
 class ProdutoUpdate(BaseModel):
+    sku: Optional[str] = Field(None, min_length=1, max_length=50)
     nome: Optional[str] = Field(None, min_length=1, max_length=100)
     descricao: Optional[str] = None
     preco: Optional[float] = Field(None, gt=0)
@@ -20,9 +22,32 @@ class ProdutoUpdate(BaseModel):
 
 class Produto(ProdutoBase):
     id: int
+    quantidade_reservada: int = Field(0, description="Unidades presas em reservas ativas")
     
     model_config = {"from_attributes": True}
 
+# Schemas para ajuste de estoque
+class AjusteEstoque(BaseModel):
+    delta: int = Field(..., description="Variação do estoque (positiva para entrada, negativa para saída)")
+
+class AjusteEstoqueLote(AjusteEstoque):
+    produto_id: int = Field(..., description="ID do produto")
+
+class EstoqueProduto(BaseModel):
+    produto_id: int
+    quantidade_estoque: int
+
+# Schemas para importação de catálogo
+class ErroImportacao(BaseModel):
+    linha: int
+    erro: str
+
+class ResultadoImportacao(BaseModel):
+    linhas_lidas: int
+    importadas: int
+    rejeitadas: int
+    erros: List[ErroImportacao] = Field(..., description="Detalhe das linhas rejeitadas (limitado às primeiras)")
+
 # Schemas para Item do Pedido
 class ItemPedidoBase(BaseModel):
     produto_id: int = Field(..., description="ID do produto")
@@ -61,6 +86,84 @@ class Pedido(BaseModel):
     
     model_config = {"from_attributes": True, "arbitrary_types_allowed": True}
 
+# Schemas para Reserva de estoque
+class ReservaCreate(BaseModel):
+    cliente: str = Field(..., min_length=1, max_length=100, description="Nome do cliente")
+    itens: List[ItemPedidoCreate] = Field(..., min_items=1, description="Produtos e quantidades a reservar")
+    ttl_segundos: Optional[int] = Field(None, gt=0, le=86400, description="Validade da reserva em segundos")
+
+class ItemReserva(BaseModel):
+    produto_id: int
+    quantidade: int
+    
+    model_config = {"from_attributes": True}
+
+class Reserva(BaseModel):
+    id: int
+    cliente: str
+    expira_em: datetime
+    itens: List[ItemReserva]
+    
+    model_config = {"from_attributes": True}
+
+# Schemas para criação de pedidos em lote
+class ResultadoPedidoLote(BaseModel):
+    indice: int = Field(..., description="Posição do pedido na lista enviada")
+    sucesso: bool
+    pedido_id: Optional[int] = None
+    erro: Optional[str] = None
+
+class ResultadoLotePedidos(BaseModel):
+    total: int
+    sucesso: int
+    falhas: int
+    resultados: List[ResultadoPedidoLote]
+
+# Schema para cancelamento de pedidos em lote
+class ResultadoExclusaoPedidos(BaseModel):
+    excluidos: List[int] = Field(..., description="IDs dos pedidos excluídos")
+    nao_encontrados: List[int] = Field(..., description="IDs informados que não existem")
+
+# Schemas para estatísticas do dashboard
+class PedidoResumo(BaseModel):
+    id: int
+    cliente: str
+    valorTotalPedido: float
+    dataPedido: datetime
+
+class ProdutoBaixoEstoque(BaseModel):
+    id: int
+    nome: str
+    quantidade_estoque: int
+
+class Estatisticas(BaseModel):
+    total_produtos: int
+    total_pedidos: int
+    total_unidades: int
+    produtos_baixo_estoque: int = Field(..., description="Produtos com estoque abaixo de limite_baixo_estoque")
+    produtos_sem_estoque: int
+    valor_total_estoque: float = Field(..., description="Soma de preço x quantidade em estoque")
+    limite_baixo_estoque: int
+    baixo_estoque: List[ProdutoBaixoEstoque] = Field(..., description="Produtos com menor estoque abaixo do limite")
+    ultimos_pedidos: List[PedidoResumo] = Field(..., description="Cinco pedidos mais recentes")
+
+# Schemas para verificações de saúde
+class EstadoPool(BaseModel):
+    tamanho: Optional[int] = Field(None, description="Conexões mantidas pelo pool")
+    em_uso: Optional[int] = Field(None, description="Conexões em uso")
+    livres: Optional[int] = Field(None, description="Conexões livres no pool")
+    overflow: Optional[int] = Field(None, description="Conexões além do tamanho do pool")
+    utilizacao: Optional[float] = Field(None, description="Conexões em uso / tamanho do pool")
+
+class Prontidao(BaseModel):
+    pronto: bool
+    database: str = Field(..., description="online, offline, desatualizado ou verificando")
+    erro: Optional[str] = None
+    latencia_ms: Optional[float] = Field(None, description="Duração da última verificação do banco")
+    verificado_em: Optional[datetime] = None
+    idade_segundos: Optional[float] = Field(None, description="Tempo desde a última verificação")
+    pool: EstadoPool
+
 # Schema para resposta de erro
 class ErrorResponse(BaseModel):
     detail: str 
\ No newline at end of file
@@ -0,0 +1,86 @@
+"""
+Testes do backend assíncrono (DATABASE_BACKEND=async)
+"""
+
+import inspect
+
+import pytest
+from fastapi import FastAPI
+from fastapi.routing import APIRoute
+from fastapi.testclient import TestClient
+
+import rotas_async
+from database_async import async_engine, converter_url_async
+
+@pytest.fixture
+def client_async():
+    app = FastAPI()
+    app.include_router(rotas_async.router)
+    with TestClient(app) as test_client:
+        yield test_client
+        # As conexões do pool pertencem ao event loop deste cliente
+        test_client.portal.call(async_engine.dispose)
+
+def test_converter_url_async():
+    assert converter_url_async("postgresql://u:s@db:5432/estoque") == "postgresql+asyncpg://u:s@db:5432/estoque"
+    assert converter_url_async("sqlite:///./estoque.db") == "sqlite+aiosqlite:///./estoque.db"
+
+def test_crud_assincrono_de_produtos_e_pedidos(client_async):
+    produto = client_async.post("/produtos/", json={"nome": "Caneta", "preco": 2.0, "quantidade_estoque": 5}).json()
+
+    pedido = client_async.post("/pedidos/", json={
+        "cliente": "João", "itens": [{"produto_id": produto["id"], "quantidade": 3}]
+    })
+    sem_estoque = client_async.post("/pedidos/", json={
+        "cliente": "Maria", "itens": [{"produto_id": produto["id"], "quantidade": 3}]
+    })
+
+    assert pedido.status_code == 201
+    assert pedido.json()["itens"][0]["nome_produto"] == "Caneta"
+    assert sem_estoque.status_code == 400
+    assert client_async.get(f"/produtos/{produto['id']}").json()["quantidade_estoque"] == 2
+    assert [p["id"] for p in client_async.get("/pedidos/").json()] == [pedido.json()["id"]]
+
+    atualizado = client_async.put(f"/pedidos/{pedido.json()['id']}", json={"cliente": "João Silva"})
+    assert atualizado.json()["cliente"] == "João Silva"
+    assert len(atualizado.json()["itens"]) == 1
+
+    assert client_async.delete(f"/pedidos/{pedido.json()['id']}").status_code == 204
+    assert client_async.get(f"/pedidos/{pedido.json()['id']}").status_code == 404
+    assert client_async.get(f"/produtos/{produto['id']}").json()["quantidade_estoque"] == 5
+
+def test_leituras_assincronas_respondem_304(client_async):
+    produto = client_async.post("/produtos/", json={"nome": "Caneta", "preco": 2.0, "quantidade_estoque": 5}).json()
+    etag = client_async.get(f"/produtos/{produto['id']}").headers["ETag"]
+
+    assert client_async.get(f"/produtos/{produto['id']}", headers={"If-None-Match": etag}).status_code == 304
+    client_async.put(f"/produtos/{produto['id']}", json={"preco": 3.0})
+    assert client_async.get(f"/produtos/{produto['id']}", headers={"If-None-Match": etag}).status_code == 200
+    assert client_async.get("/produtos/999", headers={"If-None-Match": "*"}).status_code == 404
+
+def test_pedido_assincrono_com_idempotency_key(client_async):
+    produto = client_async.post("/produtos/", json={"nome": "Caneta", "preco": 2.0, "quantidade_estoque": 5}).json()
+    corpo = {"cliente": "João", "itens": [{"produto_id": produto["id"], "quantidade": 3}]}
+
+    primeira = client_async.post("/pedidos/", json=corpo, headers={"Idempotency-Key": "abc"})
+    repetida = client_async.post("/pedidos/", json=corpo, headers={"Idempotency-Key": "abc"})
+
+    assert primeira.status_code == repetida.status_code == 201
+    assert repetida.headers["Idempotent-Replayed"] == "true"
+    assert repetida.json()["id"] == primeira.json()["id"]
+    assert client_async.get(f"/produtos/{produto['id']}").json()["quantidade_estoque"] == 2
+
+def test_substituir_rotas_mantem_ordem_e_demais_rotas():
+    import main
+
+    app = FastAPI()
+    app.router.routes = list(main.app.router.routes)
+    caminhos_antes = [(rota.path, getattr(rota, "methods", None)) for rota in app.router.routes]
+
+    rotas_async.substituir_rotas(app)
+
+    assert [(rota.path, getattr(rota, "methods", None)) for rota in app.router.routes] == caminhos_antes
+    rotas = {(rota.path, next(iter(rota.methods))): rota for rota in app.router.routes if isinstance(rota, APIRoute)}
+    assert inspect.iscoroutinefunction(rotas[("/pedidos/", "POST")].endpoint)
+    assert inspect.iscoroutinefunction(rotas[("/produtos/{produto_id}", "GET")].endpoint)
+    assert not inspect.iscoroutinefunction(rotas[("/pedidos/lote", "POST")].endpoint)
@@ -0,0 +1,38 @@
+import asyncio
+
+import benchmark_carga
+
+def test_plano_deterministico_e_sem_edicao_de_pedido_excluido(db):
+    dados = benchmark_carga.popular(db, produtos=30, pedidos=40, semente=7)
+    mix = benchmark_carga.ler_mix("leitura=40,checkout=30,edicao=20,exclusao=10")
+
+    plano = benchmark_carga.planejar(dados, 60, mix, skus_quentes=3, semente=7)
+
+    assert plano == benchmark_carga.planejar(dados, 60, mix, skus_quentes=3, semente=7)
+    excluidos = {caminho for operacao, _, caminho, _ in plano if operacao == "exclusao"}
+    editados = {caminho for operacao, _, caminho, _ in plano if operacao == "edicao"}
+    assert excluidos and editados and not excluidos & editados
+
+def test_carga_mede_latencia_e_comandos_sql(db):
+    import main
+    from database import engine
+
+    dados = benchmark_carga.popular(db, produtos=20, pedidos=20, semente=1)
+    plano = benchmark_carga.planejar(dados, 40, benchmark_carga.ler_mix(benchmark_carga.MIX_PADRAO), 3, 1)
+
+    resultado = benchmark_carga.resumir(asyncio.run(benchmark_carga.disparar(main.app, engine, plano, 4)))
+
+    assert resultado["total"]["requisicoes"] == 40
+    assert resultado["total"]["erros"] == 0
+    assert resultado["operacoes"]["checkout"]["sql_por_requisicao"] > 1
+
+def test_comparar_aponta_regressoes():
+    medida = {"requisicoes": 100, "erros": 0, "req_s": 100.0, "p50_ms": 5.0, "p95_ms": 10.0,
+              "p99_ms": 20.0, "sql_por_requisicao": 4.0}
+    baseline = {"total": medida, "operacoes": {"checkout": medida}}
+    pior = dict(medida, req_s=70.0, sql_por_requisicao=6.0)
+
+    assert benchmark_carga.comparar(baseline, baseline, 0.15) == []
+    regressoes = benchmark_carga.comparar({"total": medida, "operacoes": {"checkout": pior}}, baseline, 0.15)
+    assert len(regressoes) == 2
+    assert all(regressao.startswith("checkout") for regressao in regressoes)
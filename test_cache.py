@@ -0,0 +1,150 @@
+"""
+Testes do cache de leitura dos produtos
+"""
+
+import time
+
+import pytest
+from sqlalchemy import text
+
+from cache import BackendCache, CacheMemoria, CacheProdutos, CacheRedis, cache_produtos
+from database import engine
+
+CANETA = {"id": 1, "sku": None, "nome": "Caneta", "descricao": None, "preco": 2.5}
+
+def test_backend_incompleto_falha_ao_ser_criado():
+    class BackendSemLimpar(BackendCache):
+        def obter(self, chave): return None
+        def guardar(self, chave, valor, ttl): pass
+        def remover(self, *chaves): pass
+        def incrementar(self, chave): return 1
+        def obter_contador(self, chave): return 0
+
+    with pytest.raises(TypeError, match="limpar"):
+        BackendSemLimpar()
+
+def test_cache_memoria_despeja_o_menos_usado():
+    backend = CacheMemoria(tamanho_maximo=2)
+    backend.guardar("a", 1, ttl=60)
+    backend.guardar("b", 2, ttl=60)
+    backend.obter("a")
+    backend.guardar("c", 3, ttl=60)
+
+    assert backend.obter("b") is None
+    assert backend.obter("a") == 1
+    assert backend.obter("c") == 3
+    assert backend.despejos == 1
+
+def test_cache_memoria_expira_pelo_ttl(monkeypatch):
+    backend = CacheMemoria(tamanho_maximo=10)
+    backend.guardar("a", 1, ttl=5)
+    agora = time.monotonic()
+    monkeypatch.setattr(time, "monotonic", lambda: agora + 6)
+
+    assert backend.obter("a") is None
+    assert len(backend) == 0
+
+def test_cache_redis_compartilha_produtos_e_invalidacao():
+    fakeredis = pytest.importorskip("fakeredis")
+    servidor = fakeredis.FakeServer()
+    worker_a = CacheProdutos(CacheRedis(cliente=fakeredis.FakeRedis(server=servidor)), ttl=60)
+    worker_b = CacheProdutos(CacheRedis(cliente=fakeredis.FakeRedis(server=servidor)), ttl=60)
+
+    worker_a.guardar(worker_a.chave_produto(1), dict(CANETA, quantidade_estoque=10, quantidade_reservada=0))
+    worker_a.guardar_lista(worker_a.chave_lista(0, 100, None), [CANETA])
+
+    assert worker_b.obter(worker_b.chave_produto(1)) == CANETA
+    assert worker_b.obter_lista(worker_b.chave_lista(0, 100, None)) == [CANETA]
+
+    worker_a.invalidar()
+
+    assert worker_b.obter(worker_b.chave_produto(1)) is None
+    assert worker_b.obter_lista(worker_b.chave_lista(0, 100, None)) is None
+    assert (worker_b.acertos, worker_b.faltas) == (2, 2)
+
+def test_pagina_lida_antes_de_uma_escrita_nao_e_servida():
+    cache = CacheProdutos(CacheMemoria(tamanho_maximo=10), ttl=60)
+    chave_lista = cache.chave_lista(0, 100, None)  # Antes da consulta ao banco
+    chave_produto = cache.chave_produto(1)
+
+    cache.invalidar()  # Escrita concluída entre a consulta e o guardar
+    cache.guardar_lista(chave_lista, [CANETA])
+    cache.guardar(chave_produto, CANETA)
+
+    assert cache.obter_lista(cache.chave_lista(0, 100, None)) is None
+    assert cache.obter(cache.chave_produto(1)) is None
+
+def test_obter_produto_le_do_cache(client, criar_produto, contar_queries):
+    produto_id = criar_produto(nome="Caneta")
+    client.get(f"/produtos/{produto_id}")
+
+    with contar_queries() as comandos:
+        assert client.get(f"/produtos/{produto_id}").json()["nome"] == "Caneta"
+        assert client.get("/produtos/").status_code == 200
+        assert client.get("/produtos/").status_code == 200
+
+    # Cada leitura consulta a versão (ETag) e os acertos leem só o estoque, pela chave primária
+    assert len(comandos) == 6
+    assert "nome" not in comandos[1] and "nome" not in comandos[5]
+    assert cache_produtos.estatisticas()["acertos"] == 2
+
+def test_estoque_nao_e_servido_do_cache(client, criar_produto):
+    produto_id = criar_produto(nome="Caneta", quantidade_estoque=10)
+    assert client.get(f"/produtos/{produto_id}").json()["quantidade_estoque"] == 10
+    assert client.get("/produtos/").json()[0]["quantidade_estoque"] == 10
+
+    # Escrita feita por outro worker: a invalidação não chega a este processo
+    with engine.begin() as conexao:
+        conexao.execute(text("UPDATE produtos SET quantidade_estoque = 3, quantidade_reservada = 1"))
+
+    produto = client.get(f"/produtos/{produto_id}").json()
+    assert (produto["nome"], produto["quantidade_estoque"], produto["quantidade_reservada"]) == ("Caneta", 3, 1)
+    assert client.get("/produtos/").json()[0]["quantidade_estoque"] == 3
+    assert cache_produtos.estatisticas()["acertos"] == 2
+
+    # Produto excluído por outro worker some das respostas servidas do cache
+    with engine.begin() as conexao:
+        conexao.execute(text("DELETE FROM produtos"))
+    assert client.get(f"/produtos/{produto_id}").status_code == 404
+    assert client.get("/produtos/").json() == []
+
+def test_pagina_do_cache_com_produto_excluido_mantem_o_cursor(client, criar_produto):
+    produto_ids = [criar_produto(nome=f"Produto {i}") for i in range(3)]
+    assert len(client.get("/produtos/?limit=2").json()) == 2
+
+    # Excluído por outro worker: a página em cache fica com um produto a menos
+    with engine.begin() as conexao:
+        conexao.execute(text("DELETE FROM produtos WHERE id = :id"), {"id": produto_ids[0]})
+
+    resposta = client.get("/produtos/?limit=2")
+    assert [p["id"] for p in resposta.json()] == produto_ids[1:]
+    assert resposta.headers["X-Next-Cursor"] == str(produto_ids[2])
+
+def test_escritas_invalidam_o_cache(client, criar_produto):
+    produto_id = criar_produto(nome="Caneta", quantidade_estoque=10)
+    assert client.get(f"/produtos/{produto_id}").json()["quantidade_estoque"] == 10
+    assert client.get("/produtos/").json()[0]["nome"] == "Caneta"
+
+    client.put(f"/produtos/{produto_id}", json={"nome": "Caneta Azul"})
+    assert client.get(f"/produtos/{produto_id}").json()["nome"] == "Caneta Azul"
+    assert client.get("/produtos/").json()[0]["nome"] == "Caneta Azul"
+
+    pedido = client.post("/pedidos/", json={"cliente": "João", "itens": [{"produto_id": produto_id, "quantidade": 4}]})
+    assert client.get(f"/produtos/{produto_id}").json()["quantidade_estoque"] == 6
+    assert client.get("/produtos/").json()[0]["quantidade_estoque"] == 6
+
+    client.delete(f"/pedidos/{pedido.json()['id']}")
+    assert client.get(f"/produtos/{produto_id}").json()["quantidade_estoque"] == 10
+
+    client.delete(f"/produtos/{produto_id}")
+    assert client.get(f"/produtos/{produto_id}").status_code == 404
+    assert client.get("/produtos/").json() == []
+
+    client.post("/produtos/", json={"nome": "Lápis", "preco": 1.0, "quantidade_estoque": 1})
+    assert [p["nome"] for p in client.get("/produtos/").json()] == ["Lápis"]
+
+    estatisticas = client.get("/cache/estatisticas").json()
+    assert estatisticas["backend"] == "memoria"
+    # Só as escritas nos dados dos produtos invalidam: 2 cadastros, 1 edição e 1 exclusão;
+    # os pedidos mudam só o estoque, que não fica no cache
+    assert estatisticas["invalidacoes"] == 4
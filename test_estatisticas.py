@@ -0,0 +1,35 @@
+"""
+Testes do endpoint de estatísticas do dashboard
+"""
+
+def test_estatisticas_calculadas_no_banco(client, criar_produto):
+    caneta = criar_produto(nome="Caneta", preco=2.0, quantidade_estoque=12)
+    criar_produto(nome="Caderno", preco=10.0, quantidade_estoque=3)
+    criar_produto(nome="Lápis", preco=1.0, quantidade_estoque=0)
+    for i in range(7):
+        client.post("/pedidos/", json={"cliente": f"Cliente {i}", "itens": [{"produto_id": caneta, "quantidade": 1}]})
+
+    estatisticas = client.get("/estatisticas").json()
+
+    assert estatisticas["total_produtos"] == 3
+    assert estatisticas["total_pedidos"] == 7
+    assert estatisticas["produtos_baixo_estoque"] == 3
+    assert estatisticas["valor_total_estoque"] == 5 * 2.0 + 3 * 10.0
+    assert [p["nome"] for p in estatisticas["baixo_estoque"]] == ["Lápis", "Caderno", "Caneta"]
+    assert [p["cliente"] for p in estatisticas["ultimos_pedidos"]] == [f"Cliente {i}" for i in range(6, 1, -1)]
+
+def test_estatisticas_ficam_em_cache(client, criar_produto, contar_queries):
+    criar_produto()
+    client.get("/estatisticas")
+
+    with contar_queries() as comandos:
+        assert client.get("/estatisticas").json()["total_produtos"] == 1
+
+    assert comandos == []
+
+def test_estatisticas_sem_dados(client):
+    estatisticas = client.get("/estatisticas").json()
+
+    assert estatisticas["total_produtos"] == 0
+    assert estatisticas["valor_total_estoque"] == 0.0
+    assert estatisticas["ultimos_pedidos"] == []
@@ -0,0 +1,88 @@
+"""
+Testes dos ETags e do GET condicional (If-None-Match) em produtos e pedidos
+"""
+
+import crud
+from database import SessionLocal
+
+def test_listar_produtos_responde_304_sem_consultar_produtos(client, criar_produto, contar_queries):
+    criar_produto(nome="Caneta")
+    primeira = client.get("/produtos/")
+    etag = primeira.headers["ETag"]
+
+    with contar_queries() as comandos:
+        repetida = client.get("/produtos/", headers={"If-None-Match": etag})
+
+    assert etag.startswith('W/"produtos-')
+    assert repetida.status_code == 304
+    assert repetida.content == b""
+    assert repetida.headers["ETag"] == etag
+    assert not [c for c in comandos if "FROM produtos" in c]
+
+def test_escritas_mudam_o_etag(client, criar_produto):
+    produto_id = criar_produto(nome="Caneta", quantidade_estoque=10)
+    etag_lista = client.get("/produtos/").headers["ETag"]
+    etag_produto = client.get(f"/produtos/{produto_id}").headers["ETag"]
+
+    client.patch(f"/produtos/{produto_id}/estoque", json={"delta": -1})
+
+    lista = client.get("/produtos/", headers={"If-None-Match": etag_lista})
+    produto = client.get(f"/produtos/{produto_id}", headers={"If-None-Match": etag_produto})
+    assert lista.status_code == produto.status_code == 200
+    assert lista.headers["ETag"] != etag_lista
+    assert produto.json()["quantidade_estoque"] == 9
+
+def test_pedidos_tem_etag_proprio(client, criar_produto):
+    produto_id = criar_produto(nome="Caneta", quantidade_estoque=10)
+    pedido_id = client.post("/pedidos/", json={
+        "cliente": "João", "itens": [{"produto_id": produto_id, "quantidade": 1}]
+    }).json()["id"]
+    etag_lista = client.get("/pedidos/").headers["ETag"]
+    etag_pedido = client.get(f"/pedidos/{pedido_id}").headers["ETag"]
+
+    # Alterar um produto não invalida os pedidos
+    client.put(f"/produtos/{produto_id}", json={"preco": 3.0})
+    assert client.get("/pedidos/", headers={"If-None-Match": etag_lista}).status_code == 304
+    assert client.get(f"/pedidos/{pedido_id}", headers={"If-None-Match": etag_pedido.removeprefix("W/")}).status_code == 304
+
+    client.put(f"/pedidos/{pedido_id}", json={"cliente": "João Silva"})
+    assert client.get(f"/pedidos/{pedido_id}", headers={"If-None-Match": etag_pedido}).status_code == 200
+
+def test_id_inexistente_responde_404_mesmo_com_if_none_match(client, criar_produto):
+    produto_id = criar_produto(nome="Caneta")
+    etag = client.get(f"/produtos/{produto_id}").headers["ETag"]
+
+    # O ETag é da tabela: vale para qualquer id, mas não pode esconder um 404
+    assert client.get("/produtos/999", headers={"If-None-Match": etag}).status_code == 404
+    assert client.get("/produtos/999", headers={"If-None-Match": "*"}).status_code == 404
+    assert client.get("/pedidos/999", headers={"If-None-Match": "*"}).status_code == 404
+
+def test_etag_reflete_escritas_de_outros_workers(client, criar_produto):
+    produto_id = criar_produto(nome="Caneta")
+    etag = client.get(f"/produtos/{produto_id}").headers["ETag"]
+    assert client.get(f"/produtos/{produto_id}", headers={"If-None-Match": etag}).status_code == 304
+
+    # Escrita feita em outro worker: a invalidação do cache por processo não chega aqui
+    with SessionLocal() as db:
+        crud.VersaoTabelaCRUD.incrementar(db, "produtos")
+        db.commit()
+
+    resposta = client.get(f"/produtos/{produto_id}", headers={"If-None-Match": etag})
+    assert resposta.status_code == 200
+    assert resposta.headers["ETag"] != etag
+
+def test_versoes_avancam_uma_vez_por_tabela_no_commit(db, contar_queries):
+    crud.VersaoTabelaCRUD.incrementar(db, "pedidos")
+    crud.VersaoTabelaCRUD.incrementar(db, "produtos", "pedidos")
+    with contar_queries() as comandos:
+        db.commit()
+
+    versoes = [comando for comando in comandos if "versoes_tabelas" in comando]
+    assert len(versoes) == 2
+    assert crud.VersaoTabelaCRUD.obter(db, "pedidos") == crud.VersaoTabelaCRUD.obter(db, "produtos") == 1
+
+    # Alterações desfeitas não avançam a versão
+    crud.VersaoTabelaCRUD.incrementar(db, "produtos")
+    db.rollback()
+    db.commit()
+    assert crud.VersaoTabelaCRUD.obter(db, "produtos") == 1
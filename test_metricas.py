@@ -0,0 +1,50 @@
+"""
+Testes das métricas do Prometheus (GET /metrics)
+"""
+
+import metricas
+
+def _amostra(nome, **rotulos):
+    return metricas.registro.get_sample_value(nome, rotulos) or 0
+
+def test_metricas_por_rota_e_sql(client, criar_produto):
+    produto_id = criar_produto(nome="Caneta")
+    rotulos = {"metodo": "GET", "rota": "/produtos/{produto_id}"}
+    requisicoes_antes = _amostra("http_requisicao_duracao_segundos_count", status="200", **rotulos)
+    comandos_antes = _amostra("http_requisicao_sql_comandos_sum", **rotulos)
+
+    client.get(f"/produtos/{produto_id}")
+    client.get(f"/produtos/{produto_id}")
+
+    assert _amostra("http_requisicao_duracao_segundos_count", status="200", **rotulos) == requisicoes_antes + 2
+    assert _amostra("http_requisicao_sql_comandos_sum", **rotulos) > comandos_antes
+
+    texto = client.get("/metrics").text
+    assert 'rota="/produtos/{produto_id}"' in texto
+    assert f'rota="/produtos/{produto_id}"' not in texto
+    assert "db_pool_checkedout" in texto
+    assert "http_requisicoes_em_andamento" in texto
+
+def test_contadores_de_pedidos(client, criar_produto):
+    caneta = criar_produto(nome="Caneta", quantidade_estoque=3)
+    criados_antes = _amostra("pedidos_criados_total", origem="pedido")
+    recusados_antes = _amostra("pedidos_recusados_sem_estoque_total", origem="pedido")
+
+    client.post("/pedidos/", json={"cliente": "João", "itens": [{"produto_id": caneta, "quantidade": 2}]})
+    client.post("/pedidos/", json={"cliente": "João", "itens": [{"produto_id": caneta, "quantidade": 2}]})
+
+    assert _amostra("pedidos_criados_total", origem="pedido") == criados_antes + 1
+    assert _amostra("pedidos_recusados_sem_estoque_total", origem="pedido") == recusados_antes + 1
+
+def test_metricas_do_pool_continuam_apos_dispose(client, criar_produto):
+    from database import engine
+
+    produto_id = criar_produto(nome="Caneta")
+    engine.dispose()  # Troca o pool do engine
+    retiradas_antes = _amostra("db_pool_retiradas_total", engine="sync")
+    usos_antes = _amostra("db_pool_uso_segundos_count", engine="sync")
+
+    client.get(f"/produtos/{produto_id}")
+
+    assert _amostra("db_pool_retiradas_total", engine="sync") > retiradas_antes
+    assert _amostra("db_pool_uso_segundos_count", engine="sync") > usos_antes
@@ -0,0 +1,56 @@
+import sqlite3
+from contextlib import closing
+from datetime import datetime, timezone
+
+from sqlalchemy import create_engine
+
+from database import Base
+from migrate_sqlite_to_postgres import TABELAS, _checksum, _valor_copy, colunas_origem
+
+def test_valor_copy_escapa_texto_e_nulos():
+    assert _valor_copy(None) == "\\N"
+    assert _valor_copy("a\tb\nc\\d") == "a\\tb\\nc\\\\d"
+    assert _valor_copy(0.1) == "0.1"
+
+def test_checksum_igual_nos_dois_bancos():
+    # SQLite devolve datas como texto; o PostgreSQL, como datetime com fuso
+    sqlite = [(1, "Ana", 10.5, "2024-01-02 03:04:05.000000"), (2, "Bia", None, "2024-01-03 00:00:00")]
+    postgres = [
+        (2, "Bia", None, datetime(2024, 1, 3, tzinfo=timezone.utc)),
+        (1, "Ana", 10.5, datetime(2024, 1, 2, 3, 4, 5, tzinfo=timezone.utc)),
+    ]
+    assert _checksum(sqlite) == _checksum(postgres)
+    assert _checksum(sqlite) != _checksum([(1, "Ana", 10.5, "2024-01-02 03:04:05")])
+
+def test_checksum_das_reservas_e_chaves_de_idempotencia():
+    # Duas datas por linha e chave primária em texto
+    sqlite = [
+        (1, "Ana", "2024-01-02 03:04:05.000000", "2024-01-02 03:19:05.000000"),
+        ("abc", "f" * 64, '{"id": 1}', "2024-01-02 03:04:05.000000"),
+    ]
+    postgres = [
+        ("abc", "f" * 64, '{"id": 1}', datetime(2024, 1, 2, 3, 4, 5, tzinfo=timezone.utc)),
+        (1, "Ana", datetime(2024, 1, 2, 3, 4, 5, tzinfo=timezone.utc), datetime(2024, 1, 2, 3, 19, 5, tzinfo=timezone.utc)),
+    ]
+    assert _checksum(sqlite) == _checksum(postgres)
+    assert _checksum(sqlite) != _checksum(sqlite[:1] + [("abc", "f" * 64, '{"id": 2}', sqlite[1][3])])
+
+def test_migracao_cobre_todas_as_tabelas_e_colunas(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'atual.db'}")
+    Base.metadata.create_all(bind=engine)
+    engine.dispose()
+
+    # Só ficam de fora os dados derivados, refeitos ao final da migração
+    derivadas = {"resumo_estoque", "versoes_tabelas"}
+    assert set(TABELAS) == set(Base.metadata.tables) - derivadas
+    with closing(sqlite3.connect(tmp_path / "atual.db")) as conexao:
+        for tabela, colunas in TABELAS.items():
+            assert set(colunas_origem(conexao, tabela)) == {coluna.name for coluna in Base.metadata.tables[tabela].columns}
+
+def test_colunas_origem_de_banco_antigo(tmp_path):
+    with closing(sqlite3.connect(tmp_path / "antigo.db")) as conexao:
+        conexao.execute("CREATE TABLE produtos (id INTEGER PRIMARY KEY, nome TEXT, descricao TEXT,"
+                        " preco REAL, quantidade_estoque INTEGER)")
+        assert colunas_origem(conexao, "produtos") == ["id", "nome", "descricao", "preco", "quantidade_estoque"]
+        assert colunas_origem(conexao, "reservas") == []
+        assert colunas_origem(conexao, "chaves_idempotencia") == []
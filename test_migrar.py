@@ -0,0 +1,104 @@
+import os
+import subprocess
+import sys
+
+import pytest
+from alembic import command
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, inspect
+
+import migrar
+from config import settings
+
+@pytest.fixture
+def banco_vazio(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'migrar.db'}")
+    yield engine
+    engine.dispose()
+
+def test_aplicar_migracoes_leva_o_banco_a_ultima_versao(banco_vazio):
+    with pytest.raises(RuntimeError, match="sem migrações"):
+        migrar.verificar_versao(banco_vazio)
+
+    migrar.aplicar_migracoes(banco_vazio)
+
+    assert migrar.versao_banco(banco_vazio) == migrar.versao_migracoes()
+    migrar.verificar_versao(banco_vazio)
+    tabelas = set(inspect(banco_vazio).get_table_names())
+    assert {"produtos", "pedidos", "itens_pedido", "reservas", "chaves_idempotencia"} <= tabelas
+
+    # Rodar de novo não tem efeito
+    migrar.aplicar_migracoes(banco_vazio)
+    assert migrar.versao_banco(banco_vazio) == migrar.versao_migracoes()
+
+def _schema_original(engine):
+    """Banco com o schema criado pelo create_tables() de antes das migrações"""
+    with engine.connect() as connection:
+        command.upgrade(migrar._config(connection), "0001")
+    with engine.begin() as connection:
+        connection.exec_driver_sql(
+            "INSERT INTO produtos (nome, preco, quantidade_estoque) VALUES ('Caneta', 2.5, 10)"
+        )
+
+def test_migracoes_completam_banco_marcado_no_schema_inicial(banco_vazio):
+    _schema_original(banco_vazio)
+    colunas = {coluna["name"] for coluna in inspect(banco_vazio).get_columns("produtos")}
+    assert "sku" not in colunas
+    assert not inspect(banco_vazio).has_table("resumo_estoque")
+
+    migrar.aplicar_migracoes(banco_vazio)
+
+    migrar.verificar_versao(banco_vazio)
+    inspetor = inspect(banco_vazio)
+    assert {"sku", "quantidade_reservada"} <= {coluna["name"] for coluna in inspetor.get_columns("produtos")}
+    assert {"name": "ix_produtos_sku", "column_names": ["sku"], "unique": 1} in [
+        {chave: indice[chave] for chave in ("name", "column_names", "unique")}
+        for indice in inspetor.get_indexes("produtos")
+    ]
+    assert inspetor.has_table("resumo_estoque")
+    with banco_vazio.connect() as connection:
+        assert connection.exec_driver_sql("SELECT nome, sku FROM produtos").all() == [("Caneta", None)]
+        # O resumo do estoque já nasce com os produtos existentes
+        assert connection.exec_driver_sql("SELECT * FROM resumo_estoque").all() == [
+            (settings.LIMITE_BAIXO_ESTOQUE, 1, 10, 25.0, 0, 0)
+        ]
+
+def test_migracoes_adotam_banco_anterior_as_migracoes(banco_vazio):
+    # Como o create_tables() antigo deixava o banco: tabelas, sem alembic_version
+    _schema_original(banco_vazio)
+    with banco_vazio.begin() as connection:
+        connection.exec_driver_sql("DROP TABLE alembic_version")
+    assert migrar.versao_banco(banco_vazio) is None
+
+    migrar.aplicar_migracoes(banco_vazio)
+
+    migrar.verificar_versao(banco_vazio)
+    assert "sku" in {coluna["name"] for coluna in inspect(banco_vazio).get_columns("produtos")}
+    with banco_vazio.connect() as connection:
+        assert connection.exec_driver_sql("SELECT nome FROM produtos").scalars().all() == ["Caneta"]
+
+def test_importar_main_nao_cria_tabelas(tmp_path):
+    banco = tmp_path / "vazio.db"
+    ambiente = dict(os.environ, DATABASE_URL=f"sqlite:///{banco}")
+    subprocess.run([sys.executable, "-c", "import main"], cwd=migrar.DIRETORIO, env=ambiente, check=True)
+
+    engine = create_engine(f"sqlite:///{banco}")
+    assert inspect(engine).get_table_names() == []
+    engine.dispose()
+
+def test_api_nao_sobe_com_schema_desatualizado(monkeypatch):
+    import main
+
+    # O banco dos testes é criado por create_all, sem registro de migrações
+    monkeypatch.setattr(settings, "VERIFICAR_SCHEMA_AO_SUBIR", True)
+    with pytest.raises(RuntimeError, match="python migrar.py"):
+        with TestClient(main.app):
+            pass
+
+def test_api_sobe_com_schema_na_ultima_versao(monkeypatch):
+    import main
+
+    monkeypatch.setattr(settings, "VERIFICAR_SCHEMA_AO_SUBIR", True)
+    monkeypatch.setattr(migrar, "versao_banco", lambda engine: migrar.versao_migracoes())
+    with TestClient(main.app) as client:
+        assert client.get("/saude/vivo").status_code == 200
@@ -0,0 +1,208 @@
+"""
+Orçamento de comandos SQL por rota
+
+Cada rota de main.py tem um número máximo de comandos SQL por requisição,
+medido com o cache de produtos vazio (o caminho mais caro). A requisição é
+preparada com dois tamanhos (itens do pedido, registros da página, IDs do
+lote...) e o número de comandos precisa ser o mesmo nos dois: nenhuma rota
+pode fazer uma consulta por item (N+1). Em caso de falha, os comandos
+executados são listados na mensagem.
+
+Rotas novas precisam de uma entrada em CASOS (ver test_todas_as_rotas_tem_orcamento).
+"""
+
+import io
+
+import pytest
+from fastapi.routing import APIRoute
+
+import crud
+from cache import cache_produtos
+from database import Base, SessionLocal, engine
+
+TAMANHOS = (2, 20)
+
+def _produtos(criar_produto, n, estoque=1000):
+    return [criar_produto(nome=f"Produto {i}", preco=1.0 + i, quantidade_estoque=estoque) for i in range(n)]
+
+def _itens(produto_ids, quantidade=1):
+    return [{"produto_id": produto_id, "quantidade": quantidade} for produto_id in produto_ids]
+
+def _pedido(client, produto_ids):
+    response = client.post("/pedidos/", json={"cliente": "Ana", "itens": _itens(produto_ids)})
+    assert response.status_code == 201, response.text
+    return response.json()["id"]
+
+def _pedidos(client, produto_ids, n):
+    response = client.post("/pedidos/lote", json=[
+        {"cliente": f"Cliente {i}", "itens": _itens(produto_ids)} for i in range(n)
+    ])
+    return [resultado["pedido_id"] for resultado in response.json()["resultados"]]
+
+def _reserva(client, produto_ids):
+    response = client.post("/reservas/", json={"cliente": "Ana", "itens": _itens(produto_ids)})
+    assert response.status_code == 201, response.text
+    return response.json()["id"]
+
+# Cada preparo recebe (client, criar_produto, n) e devolve a requisição (método, URL, kwargs)
+def _criar_produto(client, criar_produto, n):
+    return "POST", "/produtos/", {"json": {"nome": "Caneta", "preco": 2.5, "quantidade_estoque": n}}
+
+def _importar_produtos(client, criar_produto, n):
+    linhas = "\n".join(f"SKU-{i},Produto {i},{1 + i},10" for i in range(n))
+    arquivo = io.BytesIO(f"sku,nome,preco,quantidade_estoque\n{linhas}\n".encode())
+    return "POST", "/produtos/importar", {"files": {"arquivo": ("catalogo.csv", arquivo, "text/csv")}}
+
+def _listar_produtos(client, criar_produto, n):
+    _produtos(criar_produto, n)
+    return "GET", f"/produtos/?limit={n}", {}
+
+def _buscar_produtos(client, criar_produto, n):
+    _produtos(criar_produto, n)
+    return "GET", f"/produtos/busca?q=Produto&limit={n}", {}
+
+def _listar_baixo_estoque(client, criar_produto, n):
+    _produtos(criar_produto, n, estoque=1)
+    return "GET", f"/produtos/baixo-estoque?limit={n}", {}
+
+def _obter_produto(client, criar_produto, n):
+    return "GET", f"/produtos/{_produtos(criar_produto, n)[0]}", {}
+
+def _atualizar_produto(client, criar_produto, n):
+    produto_id = _produtos(criar_produto, n)[0]
+    return "PUT", f"/produtos/{produto_id}", {"json": {"preco": 9.9, "quantidade_estoque": 50}}
+
+def _ajustar_estoque_em_lote(client, criar_produto, n):
+    ajustes = [{"produto_id": produto_id, "delta": 5} for produto_id in _produtos(criar_produto, n)]
+    return "PATCH", "/produtos/estoque", {"json": ajustes}
+
+def _ajustar_estoque(client, criar_produto, n):
+    return "PATCH", f"/produtos/{_produtos(criar_produto, n)[0]}/estoque", {"json": {"delta": -3}}
+
+def _excluir_produto(client, criar_produto, n):
+    return "DELETE", f"/produtos/{_produtos(criar_produto, n)[0]}", {}
+
+def _criar_pedido(client, criar_produto, n):
+    itens = _itens(_produtos(criar_produto, n))
+    return "POST", "/pedidos/", {"json": {"cliente": "Ana", "itens": itens}}
+
+def _criar_pedido_idempotente(client, criar_produto, n):
+    metodo, url, kwargs = _criar_pedido(client, criar_produto, n)
+    return metodo, url, dict(kwargs, headers={"Idempotency-Key": "orcamento"})
+
+def _criar_pedidos_em_lote(client, criar_produto, n):
+    produto_ids = _produtos(criar_produto, 3)
+    pedidos = [{"cliente": f"Cliente {i}", "itens": _itens(produto_ids)} for i in range(n)]
+    return "POST", "/pedidos/lote", {"json": pedidos}
+
+def _listar_pedidos(client, criar_produto, n):
+    _pedidos(client, _produtos(criar_produto, 3), n)
+    return "GET", f"/pedidos/?limit={n}", {}
+
+def _excluir_pedidos(client, criar_produto, n):
+    pedido_ids = _pedidos(client, _produtos(criar_produto, 3), n)
+    return "DELETE", "/pedidos/?" + "&".join(f"ids={pedido_id}" for pedido_id in pedido_ids), {}
+
+def _exportar_pedidos(client, criar_produto, n):
+    _pedidos(client, _produtos(criar_produto, 3), n)
+    return "GET", "/pedidos/export?formato=ndjson", {}
+
+def _obter_pedido(client, criar_produto, n):
+    return "GET", f"/pedidos/{_pedido(client, _produtos(criar_produto, n))}", {}
+
+def _atualizar_pedido(client, criar_produto, n):
+    produto_ids = _produtos(criar_produto, n)
+    pedido_id = _pedido(client, produto_ids)
+    return "PUT", f"/pedidos/{pedido_id}", {"json": {"cliente": "Bia", "itens": _itens(produto_ids, 2)}}
+
+def _excluir_pedido(client, criar_produto, n):
+    return "DELETE", f"/pedidos/{_pedido(client, _produtos(criar_produto, n))}", {}
+
+def _criar_reserva(client, criar_produto, n):
+    itens = _itens(_produtos(criar_produto, n))
+    return "POST", "/reservas/", {"json": {"cliente": "Ana", "itens": itens}}
+
+def _confirmar_reserva(client, criar_produto, n):
+    return "POST", f"/reservas/{_reserva(client, _produtos(criar_produto, n))}/confirmar", {}
+
+def _liberar_reserva(client, criar_produto, n):
+    return "DELETE", f"/reservas/{_reserva(client, _produtos(criar_produto, n))}", {}
+
+def _obter_estatisticas(client, criar_produto, n):
+    _pedidos(client, _produtos(criar_produto, n), n)
+    # Registro do resumo do estoque, criado em produção pela migração 0009
+    with SessionLocal() as db:
+        crud.ResumoEstoqueCRUD.reconciliar(db)
+    return "GET", "/estatisticas", {}
+
+def _sem_preparo(metodo, url):
+    return lambda client, criar_produto, n: (metodo, url, {})
+
+# (rota, preparo, orçamento de comandos SQL)
+CASOS = [
+    ("POST /produtos/", _criar_produto, 4),
+    ("POST /produtos/importar", _importar_produtos, 4),
+    ("GET /produtos/", _listar_produtos, 2),
+    ("GET /produtos/busca", _buscar_produtos, 1),
+    ("GET /produtos/baixo-estoque", _listar_baixo_estoque, 1),
+    ("GET /produtos/{produto_id}", _obter_produto, 2),
+    ("PUT /produtos/{produto_id}", _atualizar_produto, 5),
+    ("PATCH /produtos/estoque", _ajustar_estoque_em_lote, 3),
+    ("PATCH /produtos/{produto_id}/estoque", _ajustar_estoque, 4),
+    ("DELETE /produtos/{produto_id}", _excluir_produto, 5),
+    ("POST /pedidos/", _criar_pedido, 9),
+    ("POST /pedidos/ (Idempotency-Key)", _criar_pedido_idempotente, 12),
+    ("POST /pedidos/lote", _criar_pedidos_em_lote, 7),
+    ("GET /pedidos/", _listar_pedidos, 3),
+    ("DELETE /pedidos/", _excluir_pedidos, 8),
+    ("GET /pedidos/export", _exportar_pedidos, 2),
+    ("GET /pedidos/{pedido_id}", _obter_pedido, 3),
+    ("PUT /pedidos/{pedido_id}", _atualizar_pedido, 11),
+    ("DELETE /pedidos/{pedido_id}", _excluir_pedido, 8),
+    ("POST /reservas/", _criar_reserva, 7),
+    ("POST /reservas/{reserva_id}/confirmar", _confirmar_reserva, 12),
+    ("DELETE /reservas/{reserva_id}", _liberar_reserva, 5),
+    ("GET /estatisticas", _obter_estatisticas, 4),
+    ("GET /cache/estatisticas", _sem_preparo("GET", "/cache/estatisticas"), 0),
+    ("GET /metrics", _sem_preparo("GET", "/metrics"), 0),
+    ("GET /saude/vivo", _sem_preparo("GET", "/saude/vivo"), 0),
+    ("GET /saude/pronto", _sem_preparo("GET", "/saude/pronto"), 0),
+    ("GET /", _sem_preparo("GET", "/"), 0),
+]
+
+def _listar(comandos):
+    return "\n".join(f"  {i}. {' '.join(comando.split())}" for i, comando in enumerate(comandos, 1))
+
+@pytest.mark.parametrize("rota, preparar, orcamento", CASOS, ids=[caso[0] for caso in CASOS])
+def test_orcamento_de_queries(rota, preparar, orcamento, client, criar_produto, contar_queries):
+    medicoes = {}
+    for n in TAMANHOS:
+        # Banco vazio para cada tamanho, como na fixture banco_limpo
+        Base.metadata.drop_all(bind=engine)
+        Base.metadata.create_all(bind=engine)
+        cache_produtos.limpar()
+        metodo, url, kwargs = preparar(client, criar_produto, n)
+        cache_produtos.limpar()
+        with contar_queries() as comandos:
+            response = client.request(metodo, url, **kwargs)
+        assert response.status_code < 400, f"{rota} (n={n}) respondeu {response.status_code}: {response.text}"
+        medicoes[n] = comandos
+
+    pequeno, grande = (medicoes[n] for n in TAMANHOS)
+    if len(grande) > orcamento or len(pequeno) != len(grande):
+        pytest.fail(
+            f"{rota}: orçamento de {orcamento} comando(s) SQL, executou {len(pequeno)} com n={TAMANHOS[0]} "
+            f"e {len(grande)} com n={TAMANHOS[1]}\n"
+            f"Comandos com n={TAMANHOS[1]}:\n{_listar(grande)}"
+        )
+
+def test_todas_as_rotas_tem_orcamento():
+    import main
+
+    rotas = {
+        f"{metodo} {rota.path}"
+        for rota in main.app.routes if isinstance(rota, APIRoute)
+        for metodo in rota.methods
+    }
+    cobertas = {caso[0] for caso in CASOS}
+    assert rotas - cobertas == set(), "Rotas sem orçamento de comandos SQL em CASOS"
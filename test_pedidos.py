@@ -0,0 +1,375 @@
+"""
+Testes automatizados das operações de pedidos
+"""
+
+import csv
+import io
+import json
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+from fastapi import HTTPException
+
+import crud
+import models
+import schemas
+from database import SessionLocal
+
+def _pedido(cliente, *itens):
+    return schemas.PedidoCreate(
+        cliente=cliente,
+        itens=[schemas.ItemPedidoCreate(produto_id=produto_id, quantidade=quantidade)
+               for produto_id, quantidade in itens]
+    )
+
+def test_criar_pedido_baixa_estoque(client, criar_produto):
+    caneta = criar_produto(nome="Caneta", preco=2.5, quantidade_estoque=10)
+    caderno = criar_produto(nome="Caderno", preco=15.0, quantidade_estoque=5)
+
+    response = client.post("/pedidos/", json={
+        "cliente": "João",
+        "itens": [{"produto_id": caderno, "quantidade": 2}, {"produto_id": caneta, "quantidade": 4}]
+    })
+
+    assert response.status_code == 201
+    pedido = response.json()
+    assert pedido["valorTotalPedido"] == 40.0
+    assert client.get(f"/produtos/{caneta}").json()["quantidade_estoque"] == 6
+    assert client.get(f"/produtos/{caderno}").json()["quantidade_estoque"] == 3
+
+def test_criar_pedido_agrupa_produtos_repetidos(db, criar_produto):
+    caneta = criar_produto(nome="Caneta", preco=2.0, quantidade_estoque=10)
+
+    pedido = crud.PedidoCRUD.criar_pedido(db, _pedido("Maria", (caneta, 3), (caneta, 4)))
+
+    assert len(pedido.itens) == 1
+    assert pedido.itens[0].quantidade == 7
+    assert pedido.valorTotalPedido == 14.0
+    assert db.get(models.Produto, caneta).quantidade_estoque == 3
+
+def test_criar_pedido_estoque_insuficiente(client, criar_produto):
+    caneta = criar_produto(quantidade_estoque=3)
+
+    response = client.post("/pedidos/", json={
+        "cliente": "João",
+        "itens": [{"produto_id": caneta, "quantidade": 2}, {"produto_id": caneta, "quantidade": 2}]
+    })
+
+    assert response.status_code == 400
+    assert client.get(f"/produtos/{caneta}").json()["quantidade_estoque"] == 3
+    assert client.get("/pedidos/").json() == []
+
+def test_criar_pedido_produto_inexistente(client):
+    response = client.post("/pedidos/", json={
+        "cliente": "João", "itens": [{"produto_id": 999, "quantidade": 1}]
+    })
+
+    assert response.status_code == 404
+
+def test_criar_pedido_concorrente_nao_vende_alem_do_estoque(db, criar_produto):
+    estoque_inicial = 25
+    produto_quente = criar_produto(nome="Produto Quente", quantidade_estoque=estoque_inicial)
+    outro = criar_produto(nome="Outro", quantidade_estoque=1000)
+
+    def comprar(indice):
+        session = SessionLocal()
+        try:
+            itens = [(produto_quente, 1), (outro, 1)] if indice % 2 else [(outro, 1), (produto_quente, 1)]
+            crud.PedidoCRUD.criar_pedido(session, _pedido(f"Cliente {indice}", *itens))
+            return True
+        except HTTPException as e:
+            assert e.status_code == 400
+            return False
+        finally:
+            session.close()
+
+    with ThreadPoolExecutor(max_workers=32) as pool:
+        resultados = list(pool.map(comprar, range(200)))
+
+    db.expire_all()
+    assert sum(resultados) == estoque_inicial
+    assert db.get(models.Produto, produto_quente).quantidade_estoque == 0
+    assert db.get(models.Produto, outro).quantidade_estoque == 1000 - estoque_inicial
+    assert db.query(models.Pedido).count() == estoque_inicial
+
+def test_criar_pedidos_em_lote_resultado_por_pedido(client, criar_produto):
+    caneta = criar_produto(nome="Caneta", preco=2.0, quantidade_estoque=5)
+    caderno = criar_produto(nome="Caderno", preco=10.0, quantidade_estoque=100)
+
+    response = client.post("/pedidos/lote", json=[
+        {"cliente": "A", "itens": [{"produto_id": caneta, "quantidade": 3}]},
+        {"cliente": "B", "itens": [{"produto_id": caneta, "quantidade": 3}]},
+        {"cliente": "C", "itens": [{"produto_id": 999, "quantidade": 1}]},
+        {"cliente": "D", "itens": [{"produto_id": caderno, "quantidade": 1}, {"produto_id": caneta, "quantidade": 2}]},
+    ])
+
+    assert response.status_code == 200
+    corpo = response.json()
+    assert (corpo["total"], corpo["sucesso"], corpo["falhas"]) == (4, 2, 2)
+    assert [r["sucesso"] for r in corpo["resultados"]] == [True, False, False, True]
+    assert "Estoque insuficiente" in corpo["resultados"][1]["erro"]
+    assert "não encontrado" in corpo["resultados"][2]["erro"]
+
+    pedido_d = client.get(f"/pedidos/{corpo['resultados'][3]['pedido_id']}").json()
+    assert pedido_d["cliente"] == "D"
+    assert pedido_d["valorTotalPedido"] == 14.0
+    assert len(pedido_d["itens"]) == 2
+    assert client.get(f"/produtos/{caneta}").json()["quantidade_estoque"] == 0
+    assert client.get(f"/produtos/{caderno}").json()["quantidade_estoque"] == 99
+
+def test_criar_pedidos_em_lote_em_chunks(client, criar_produto):
+    caneta = criar_produto(preco=1.0, quantidade_estoque=10)
+
+    response = client.post("/pedidos/lote?tamanho_chunk=3", json=[
+        {"cliente": f"Cliente {i}", "itens": [{"produto_id": caneta, "quantidade": 1}]} for i in range(12)
+    ])
+
+    corpo = response.json()
+    assert corpo["sucesso"] == 10
+    assert [r["indice"] for r in corpo["resultados"]] == list(range(12))
+    assert [r["sucesso"] for r in corpo["resultados"][-2:]] == [False, False]
+    assert len({r["pedido_id"] for r in corpo["resultados"][:10]}) == 10
+    assert client.get(f"/produtos/{caneta}").json()["quantidade_estoque"] == 0
+
+def test_listar_pedidos_por_cursor(client, criar_produto):
+    caneta = criar_produto(quantidade_estoque=100)
+    ids = [client.post("/pedidos/", json={"cliente": f"Cliente {i}", "itens": [{"produto_id": caneta, "quantidade": 1}]}).json()["id"]
+           for i in range(3)]
+
+    primeira = client.get("/pedidos/?limit=2")
+    segunda = client.get(f"/pedidos/?limit=2&after_id={primeira.headers['X-Next-Cursor']}")
+
+    assert [p["id"] for p in primeira.json()] == ids[:2]
+    assert [p["id"] for p in segunda.json()] == ids[2:]
+    assert "X-Next-Cursor" not in segunda.headers
+
+def test_listar_pedidos_usa_numero_fixo_de_queries(client, criar_produto, contar_queries):
+    produtos = [criar_produto(nome=f"Produto {i}", quantidade_estoque=1000) for i in range(4)]
+
+    def criar_pedidos(quantidade):
+        client.post("/pedidos/lote", json=[
+            {"cliente": f"Cliente {i}", "itens": [{"produto_id": p, "quantidade": 1} for p in produtos]}
+            for i in range(quantidade)
+        ])
+
+    criar_pedidos(2)
+    with contar_queries() as poucos:
+        assert len(client.get("/pedidos/").json()) == 2
+
+    criar_pedidos(48)
+    with contar_queries() as muitos:
+        assert len(client.get("/pedidos/").json()) == 50
+
+    # Versão da tabela (ETag), pedidos e itens
+    assert len(poucos) == len(muitos) == 3
+    assert not any("produtos" in comando for comando in muitos)
+
+def test_obter_pedido_usa_numero_fixo_de_queries(client, criar_produto, contar_queries):
+    produtos = [criar_produto(nome=f"Produto {i}") for i in range(5)]
+    pedido_id = client.post("/pedidos/", json={
+        "cliente": "João", "itens": [{"produto_id": p, "quantidade": 1} for p in produtos]
+    }).json()["id"]
+
+    with contar_queries() as comandos:
+        assert len(client.get(f"/pedidos/{pedido_id}").json()["itens"]) == 5
+
+    # Versão da tabela (ETag), pedido e itens
+    assert len(comandos) == 3
+    assert not any("produtos" in comando for comando in comandos)
+
+def test_exportar_pedidos_csv_e_ndjson(client, criar_produto):
+    caneta = criar_produto(nome="Caneta", preco=2.0)
+    caderno = criar_produto(nome="Caderno", preco=10.0)
+    primeiro = client.post("/pedidos/", json={"cliente": "João", "itens": [
+        {"produto_id": caneta, "quantidade": 2}, {"produto_id": caderno, "quantidade": 1}
+    ]}).json()
+    segundo = client.post("/pedidos/", json={"cliente": "Maria", "itens": [{"produto_id": caneta, "quantidade": 1}]}).json()
+
+    csv_resposta = client.get("/pedidos/export?formato=csv")
+    ndjson_resposta = client.get("/pedidos/export?formato=ndjson")
+
+    linhas = list(csv.DictReader(io.StringIO(csv_resposta.text)))
+    assert csv_resposta.headers["content-type"].startswith("text/csv")
+    assert [(int(l["pedido_id"]), l["nome_produto"]) for l in linhas] == [
+        (primeiro["id"], "Caneta"), (primeiro["id"], "Caderno"), (segundo["id"], "Caneta")
+    ]
+    pedidos = [json.loads(linha) for linha in ndjson_resposta.text.splitlines()]
+    assert pedidos == [client.get(f"/pedidos/{primeiro['id']}").json(), client.get(f"/pedidos/{segundo['id']}").json()]
+
+def test_exportar_pedidos_por_periodo_em_blocos(client, db, criar_produto, contar_queries):
+    caneta = criar_produto(quantidade_estoque=100)
+    for i in range(5):
+        client.post("/pedidos/", json={"cliente": f"Cliente {i}", "itens": [{"produto_id": caneta, "quantidade": 1}]})
+    pedidos = db.query(models.Pedido).order_by(models.Pedido.id).all()
+    for dia, pedido in enumerate(pedidos, start=1):
+        pedido.dataPedido = datetime(2024, 1, dia)
+    db.commit()
+
+    with contar_queries() as comandos:
+        resposta = client.get("/pedidos/export?formato=ndjson&de=2024-01-02&ate=2024-01-05&tamanho_chunk=2")
+
+    assert [json.loads(linha)["cliente"] for linha in resposta.text.splitlines()] == [
+        "Cliente 1", "Cliente 2", "Cliente 3"
+    ]
+    # Uma consulta de pedidos e uma de itens por bloco de 2 pedidos
+    assert len([c for c in comandos if "FROM itens_pedido" in c]) == 2
+
+def test_idempotency_key_repete_resposta(client, criar_produto):
+    caneta = criar_produto(nome="Caneta", preco=2.0, quantidade_estoque=10)
+    corpo = {"cliente": "João", "itens": [{"produto_id": caneta, "quantidade": 3}]}
+    cabecalhos = {"Idempotency-Key": "pedido-123"}
+
+    primeira = client.post("/pedidos/", json=corpo, headers=cabecalhos)
+    repetida = client.post("/pedidos/", json=corpo, headers=cabecalhos)
+
+    assert primeira.status_code == repetida.status_code == 201
+    assert "Idempotent-Replayed" not in primeira.headers
+    assert repetida.headers["Idempotent-Replayed"] == "true"
+    assert repetida.json() == primeira.json()
+    assert len(client.get("/pedidos/").json()) == 1
+    assert client.get(f"/produtos/{caneta}").json()["quantidade_estoque"] == 7
+
+    # A mesma chave com outro corpo é recusada
+    corpo["itens"][0]["quantidade"] = 1
+    assert client.post("/pedidos/", json=corpo, headers=cabecalhos).status_code == 422
+
+def test_idempotency_key_nao_guarda_falhas(client, criar_produto):
+    caneta = criar_produto(nome="Caneta", quantidade_estoque=2)
+    corpo = {"cliente": "João", "itens": [{"produto_id": caneta, "quantidade": 3}]}
+    cabecalhos = {"Idempotency-Key": "pedido-456"}
+
+    assert client.post("/pedidos/", json=corpo, headers=cabecalhos).status_code == 400
+    client.patch(f"/produtos/{caneta}/estoque", json={"delta": 5})
+    assert client.post("/pedidos/", json=corpo, headers=cabecalhos).status_code == 201
+
+def test_idempotency_key_concorrente_cria_um_pedido(db, criar_produto):
+    caneta = criar_produto(nome="Caneta", quantidade_estoque=100)
+    pedido = _pedido("João", (caneta, 1))
+
+    def criar(_):
+        sessao = SessionLocal()
+        try:
+            return crud.PedidoCRUD.criar_pedido_idempotente(sessao, pedido, "pedido-789")
+        finally:
+            sessao.close()
+
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        resultados = list(executor.map(criar, range(8)))
+
+    assert len({resposta for resposta, _ in resultados}) == 1
+    assert sum(1 for _, repetida in resultados if not repetida) == 1
+    assert db.query(models.Pedido).count() == 1
+    assert db.get(models.Produto, caneta).quantidade_estoque == 99
+
+def test_limpar_chaves_idempotencia_em_lotes(db, criar_produto):
+    caneta = criar_produto(nome="Caneta", quantidade_estoque=100)
+    for indice in range(5):
+        crud.PedidoCRUD.criar_pedido_idempotente(db, _pedido("João", (caneta, 1)), f"chave-{indice}")
+    for registro in db.query(models.ChaveIdempotencia).filter(models.ChaveIdempotencia.chave != "chave-4"):
+        registro.criada_em = datetime(2020, 1, 1)
+    db.commit()
+
+    assert crud.IdempotenciaCRUD.limpar_expiradas(db, antes_de=datetime(2021, 1, 1), tamanho_lote=2) == 4
+    assert [chave for (chave,) in db.query(models.ChaveIdempotencia.chave)] == ["chave-4"]
+
+def test_atualizar_pedido_aplica_so_as_diferencas(client, db, criar_produto):
+    caneta = criar_produto(nome="Caneta", preco=2.0, quantidade_estoque=10)
+    lapis = criar_produto(nome="Lápis", preco=1.0, quantidade_estoque=10)
+    caderno = criar_produto(nome="Caderno", preco=15.0, quantidade_estoque=10)
+    borracha = criar_produto(nome="Borracha", preco=0.5, quantidade_estoque=10)
+    pedido = client.post("/pedidos/", json={"cliente": "João", "itens": [
+        {"produto_id": caneta, "quantidade": 2}, {"produto_id": lapis, "quantidade": 3},
+        {"produto_id": caderno, "quantidade": 1},
+    ]}).json()
+    ids_itens = {item["produto_id"]: item["id"] for item in pedido["itens"]}
+    # O preço atual não altera os itens mantidos no pedido
+    client.put(f"/produtos/{caneta}", json={"preco": 9.0})
+
+    response = client.put(f"/pedidos/{pedido['id']}", json={"itens": [
+        {"produto_id": caneta, "quantidade": 5}, {"produto_id": caderno, "quantidade": 1},
+        {"produto_id": borracha, "quantidade": 4},
+    ]})
+
+    assert response.status_code == 200
+    itens = {item["produto_id"]: item for item in response.json()["itens"]}
+    assert set(itens) == {caneta, caderno, borracha}
+    assert itens[caneta]["id"] == ids_itens[caneta]
+    assert (itens[caneta]["quantidade"], itens[caneta]["valor_total_item"]) == (5, 10.0)
+    assert itens[caderno]["id"] == ids_itens[caderno]
+    assert response.json()["valorTotalPedido"] == 10.0 + 15.0 + 2.0
+    estoques = {produto_id: db.get(models.Produto, produto_id).quantidade_estoque
+                for produto_id in (caneta, lapis, caderno, borracha)}
+    assert estoques == {caneta: 5, lapis: 10, caderno: 9, borracha: 6}
+    assert client.get("/estatisticas").json()["total_unidades"] == 30
+
+def test_atualizar_pedido_sem_estoque_nao_altera_nada(client, db, criar_produto):
+    caneta = criar_produto(nome="Caneta", quantidade_estoque=5)
+    lapis = criar_produto(nome="Lápis", quantidade_estoque=5)
+    pedido_id = client.post("/pedidos/", json={
+        "cliente": "João", "itens": [{"produto_id": caneta, "quantidade": 2}]
+    }).json()["id"]
+
+    response = client.put(f"/pedidos/{pedido_id}", json={"itens": [
+        {"produto_id": caneta, "quantidade": 1}, {"produto_id": lapis, "quantidade": 6},
+    ]})
+
+    assert response.status_code == 400
+    assert db.get(models.Produto, caneta).quantidade_estoque == 3
+    assert db.get(models.Produto, lapis).quantidade_estoque == 5
+    assert [item["quantidade"] for item in client.get(f"/pedidos/{pedido_id}").json()["itens"]] == [2]
+
+def test_atualizar_pedido_usa_numero_fixo_de_queries(client, criar_produto, contar_queries):
+    def alterar_um_item(quantidade_itens):
+        produtos = [criar_produto(nome=f"Produto {i}", quantidade_estoque=100) for i in range(quantidade_itens)]
+        itens = [{"produto_id": produto_id, "quantidade": 1} for produto_id in produtos]
+        pedido_id = client.post("/pedidos/", json={"cliente": "João", "itens": itens}).json()["id"]
+        itens[0]["quantidade"] = 2
+        with contar_queries() as comandos:
+            assert client.put(f"/pedidos/{pedido_id}", json={"itens": itens}).status_code == 200
+        return comandos
+
+    poucos = alterar_um_item(2)
+    muitos = alterar_um_item(20)
+
+    assert len(poucos) == len(muitos)
+    # Um único UPDATE de estoque, só do produto alterado
+    assert sum(1 for comando in muitos if comando.startswith("UPDATE produtos")) == 1
+
+def test_excluir_pedidos_em_lote_restaura_estoque(client, db, criar_produto, contar_queries):
+    caneta = criar_produto(nome="Caneta", preco=2.0, quantidade_estoque=100)
+    lapis = criar_produto(nome="Lápis", preco=1.0, quantidade_estoque=100)
+    pedido_ids = [
+        client.post("/pedidos/", json={"cliente": f"Cliente {i}", "itens": [
+            {"produto_id": caneta, "quantidade": 2}, {"produto_id": lapis, "quantidade": 1},
+        ]}).json()["id"]
+        for i in range(30)
+    ]
+    mantido = pedido_ids.pop()
+
+    with contar_queries() as comandos:
+        response = client.delete("/pedidos/", params={"ids": pedido_ids + [9999]})
+
+    assert response.status_code == 200
+    assert response.json() == {"excluidos": pedido_ids, "nao_encontrados": [9999]}
+    assert sum(1 for comando in comandos if comando.startswith("UPDATE produtos")) == 1
+    assert db.get(models.Produto, caneta).quantidade_estoque == 98
+    assert db.get(models.Produto, lapis).quantidade_estoque == 99
+    assert [pedido["id"] for pedido in client.get("/pedidos/").json()] == [mantido]
+    assert db.query(models.ItemPedido).count() == 2
+    assert client.get("/estatisticas").json()["total_unidades"] == 197
+
+def test_excluir_pedidos_em_lote_sem_ids(client):
+    response = client.delete("/pedidos/")
+
+    assert response.status_code == 400
+    assert "ids" in response.json()["detail"]
+
+def test_excluir_pedido_restaura_estoque(client, db, criar_produto):
+    caneta = criar_produto(nome="Caneta", quantidade_estoque=10)
+    pedido_id = client.post("/pedidos/", json={
+        "cliente": "João", "itens": [{"produto_id": caneta, "quantidade": 4}]
+    }).json()["id"]
+
+    assert client.delete(f"/pedidos/{pedido_id}").status_code == 204
+    assert client.delete(f"/pedidos/{pedido_id}").status_code == 404
+    assert db.get(models.Produto, caneta).quantidade_estoque == 10
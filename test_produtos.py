@@ -0,0 +1,228 @@
+"""
+Testes automatizados das operações de produtos
+"""
+
+import io
+import json
+
+def test_importar_produtos_csv_com_upsert_por_sku(client):
+    client.post("/produtos/", json={"sku": "CAN-01", "nome": "Caneta", "preco": 2.0, "quantidade_estoque": 5})
+    csv = (
+        "sku,nome,descricao,preco,quantidade_estoque\n"
+        "CAN-01,Caneta Azul,,2.5,50\n"
+        "CAD-01,Caderno,Caderno 96 folhas,15.9,10\n"
+        "LAP-01,Lápis,,-1,10\n"
+        ",Borracha,,1.0,\n"
+        ",Régua,,3.0,7\n"
+    )
+
+    response = client.post("/produtos/importar", files={"arquivo": ("catalogo.csv", csv.encode(), "text/csv")})
+
+    assert response.status_code == 200
+    resultado = response.json()
+    assert (resultado["linhas_lidas"], resultado["importadas"], resultado["rejeitadas"]) == (5, 3, 2)
+    assert [erro["linha"] for erro in resultado["erros"]] == [4, 5]
+    assert "preco" in resultado["erros"][0]["erro"]
+
+    produtos = {produto["nome"]: produto for produto in client.get("/produtos/").json()}
+    assert len(produtos) == 3
+    assert produtos["Caneta Azul"]["sku"] == "CAN-01"
+    assert produtos["Caneta Azul"]["quantidade_estoque"] == 50
+    assert produtos["Caderno"]["descricao"] == "Caderno 96 folhas"
+    assert produtos["Régua"]["sku"] is None
+
+def test_importar_produtos_ndjson_em_chunks(client):
+    linhas = [json.dumps({"sku": f"SKU-{i % 7}", "nome": f"Produto {i}", "preco": 1.0 + i, "quantidade_estoque": i})
+              for i in range(20)]
+    linhas.insert(3, "{quebrado")
+    arquivo = io.BytesIO("\n".join(linhas).encode())
+
+    response = client.post("/produtos/importar?tamanho_chunk=4",
+                           files={"arquivo": ("catalogo.ndjson", arquivo, "application/x-ndjson")})
+
+    resultado = response.json()
+    assert resultado["rejeitadas"] == 1
+    assert resultado["erros"][0]["linha"] == 4
+    produtos = client.get("/produtos/").json()
+    assert len(produtos) == 7
+    assert {produto["nome"] for produto in produtos} == {f"Produto {i}" for i in range(13, 20)}
+
+def test_importacao_recusa_sku_criado_por_outra_transacao(db):
+    from sqlalchemy import event
+
+    import crud
+    import models
+    import schemas
+    from database import engine
+
+    crud.ResumoEstoqueCRUD.reconciliar(db)
+
+    # Outro worker cria o SKU entre a leitura dos existentes e o INSERT
+    criado = []
+    def concorrente(conn, cursor, statement, parameters, context, executemany):
+        if statement.startswith("INSERT INTO produtos") and "ON CONFLICT" in statement and not criado:
+            criado.append(True)
+            with engine.begin() as outra:
+                outra.exec_driver_sql("INSERT INTO produtos (sku, nome, preco, quantidade_estoque, quantidade_reservada)"
+                                      " VALUES ('CAN-01', 'Caneta', 2.0, 5, 5)")
+
+    event.listen(engine, "before_cursor_execute", concorrente)
+    try:
+        gravadas, recusadas = crud.ProdutoCRUD.upsert_produtos(db, [
+            schemas.ProdutoCreate(sku="CAN-01", nome="Caneta", preco=2.0, quantidade_estoque=1),
+            schemas.ProdutoCreate(sku="LAP-01", nome="Lápis", preco=1.0, quantidade_estoque=3),
+        ])
+        db.commit()
+    finally:
+        event.remove(engine, "before_cursor_execute", concorrente)
+
+    assert gravadas == 1
+    assert recusadas == [(0, "sku: CAN-01 gravado por outra transação durante a importação")]
+    assert db.query(models.Produto.quantidade_estoque).filter(models.Produto.sku == "CAN-01").scalar() == 5
+    # Só o Lápis entra no resumo; a Caneta do outro worker não passou por registrar
+    assert crud.ResumoEstoqueCRUD.obter(db, 10)["total_unidades"] == 3
+
+def test_sku_duplicado_responde_409(client):
+    caneta = client.post("/produtos/", json={"sku": "CAN-01", "nome": "Caneta", "preco": 2.0, "quantidade_estoque": 5})
+    lapis = client.post("/produtos/", json={"sku": "LAP-01", "nome": "Lápis", "preco": 1.0, "quantidade_estoque": 5})
+
+    repetido = client.post("/produtos/", json={"sku": "CAN-01", "nome": "Outra", "preco": 1.0, "quantidade_estoque": 1})
+    assert repetido.status_code == 409
+    assert "CAN-01" in repetido.json()["detail"]
+
+    alterado = client.put(f"/produtos/{lapis.json()['id']}", json={"sku": "CAN-01", "preco": 9.0})
+    assert alterado.status_code == 409
+
+    # Nada foi gravado e a sessão segue utilizável
+    produtos = {produto["nome"]: produto for produto in client.get("/produtos/").json()}
+    assert set(produtos) == {"Caneta", "Lápis"}
+    assert (produtos["Lápis"]["sku"], produtos["Lápis"]["preco"]) == ("LAP-01", 1.0)
+    assert client.put(f"/produtos/{caneta.json()['id']}", json={"sku": "CAN-02"}).json()["sku"] == "CAN-02"
+
+def test_listar_produtos_por_cursor(client, criar_produto):
+    ids = [criar_produto(nome=f"Produto {i}") for i in range(5)]
+
+    primeira = client.get("/produtos/?limit=2")
+    segunda = client.get(f"/produtos/?limit=2&after_id={primeira.headers['X-Next-Cursor']}")
+    terceira = client.get(f"/produtos/?limit=2&after_id={segunda.headers['X-Next-Cursor']}")
+
+    assert [p["id"] for p in primeira.json()] == ids[:2]
+    assert [p["id"] for p in segunda.json()] == ids[2:4]
+    assert [p["id"] for p in terceira.json()] == ids[4:]
+    assert "X-Next-Cursor" not in terceira.headers
+
+def test_listar_produtos_skip_limit_continua_funcionando(client, criar_produto):
+    ids = [criar_produto(nome=f"Produto {i}") for i in range(5)]
+
+    response = client.get("/produtos/?skip=1&limit=3")
+
+    assert [p["id"] for p in response.json()] == ids[1:4]
+    assert response.headers["X-Next-Cursor"] == str(ids[3])
+
+def test_ajustar_estoque_por_delta(client, criar_produto):
+    produto_id = criar_produto(quantidade_estoque=10)
+
+    entrada = client.patch(f"/produtos/{produto_id}/estoque", json={"delta": 5})
+    saida = client.patch(f"/produtos/{produto_id}/estoque", json={"delta": -15})
+    negativo = client.patch(f"/produtos/{produto_id}/estoque", json={"delta": -1})
+    inexistente = client.patch("/produtos/999/estoque", json={"delta": 1})
+
+    assert entrada.json()["quantidade_estoque"] == 15
+    assert saida.json()["quantidade_estoque"] == 0
+    assert negativo.status_code == 400
+    assert inexistente.status_code == 404
+    assert client.get(f"/produtos/{produto_id}").json()["quantidade_estoque"] == 0
+
+def test_ajustar_estoque_usa_um_unico_update(client, criar_produto, contar_queries):
+    produto_id = criar_produto(quantidade_estoque=10)
+
+    with contar_queries() as comandos:
+        client.patch(f"/produtos/{produto_id}/estoque", json={"delta": -3})
+
+    atualizacoes = [c for c in comandos if c.lstrip().upper().startswith("UPDATE PRODUTOS")]
+    assert len(atualizacoes) == 1
+    assert "RETURNING" in atualizacoes[0].upper()
+
+def test_ajustar_estoque_em_lote(client, criar_produto):
+    caneta = criar_produto(nome="Caneta", quantidade_estoque=1)
+    caderno = criar_produto(nome="Caderno", quantidade_estoque=2)
+
+    response = client.patch("/produtos/estoque", json=[
+        {"produto_id": caneta, "delta": 10},
+        {"produto_id": caderno, "delta": 5},
+        {"produto_id": caneta, "delta": -4},
+    ])
+
+    assert response.status_code == 200
+    assert response.json() == [
+        {"produto_id": caneta, "quantidade_estoque": 7},
+        {"produto_id": caderno, "quantidade_estoque": 7},
+    ]
+
+def test_ajustar_estoque_em_lote_e_atomico(client, criar_produto):
+    caneta = criar_produto(nome="Caneta", quantidade_estoque=1)
+    caderno = criar_produto(nome="Caderno", quantidade_estoque=2)
+
+    response = client.patch("/produtos/estoque", json=[
+        {"produto_id": caneta, "delta": 10},
+        {"produto_id": caderno, "delta": -5},
+        {"produto_id": 999, "delta": 1},
+    ])
+
+    assert response.status_code == 400
+    assert client.get(f"/produtos/{caneta}").json()["quantidade_estoque"] == 1
+    assert client.get(f"/produtos/{caderno}").json()["quantidade_estoque"] == 2
+
+def test_listar_baixo_estoque_por_cursor(client, criar_produto):
+    criar_produto(nome="Cheio", quantidade_estoque=50)
+    sem_estoque = criar_produto(nome="Sem estoque", quantidade_estoque=0)
+    tres_a = criar_produto(nome="Três A", quantidade_estoque=3)
+    tres_b = criar_produto(nome="Três B", quantidade_estoque=3)
+    nove = criar_produto(nome="Nove", quantidade_estoque=9)
+
+    primeira = client.get("/produtos/baixo-estoque?limit=2")
+    segunda = client.get(f"/produtos/baixo-estoque?limit=2&cursor={primeira.headers['X-Next-Cursor']}")
+    limite_menor = client.get("/produtos/baixo-estoque?limite=3")
+
+    assert primeira.headers["X-Next-Cursor"] == f"3:{tres_a}"
+    assert [p["id"] for p in primeira.json()] == [sem_estoque, tres_a]
+    assert [p["id"] for p in segunda.json()] == [tres_b, nove]
+    assert [p["id"] for p in limite_menor.json()] == [sem_estoque]
+    assert client.get("/produtos/baixo-estoque?cursor=abc").status_code == 400
+
+def test_listar_baixo_estoque_usa_indice(db):
+    from sqlalchemy import text
+
+    plano = db.execute(text(
+        "EXPLAIN QUERY PLAN SELECT * FROM produtos WHERE quantidade_estoque < 10 "
+        "ORDER BY quantidade_estoque, id LIMIT 100"
+    )).all()
+
+    detalhes = " ".join(linha[-1] for linha in plano)
+    assert "ix_produtos_baixo_estoque" in detalhes or "ix_produtos_quantidade_estoque_id" in detalhes
+    assert "TEMP B-TREE" not in detalhes
+
+def test_buscar_produtos_por_prefixo_trecho_e_aproximacao(client, criar_produto):
+    caneta = criar_produto(nome="Caneta Azul", descricao="Esferográfica")
+    borracha = criar_produto(nome="Borracha", descricao="Branca, para caneta e lápis")
+    caderno = criar_produto(nome="Caderno 100 folhas")
+    criar_produto(nome="Grampeador")
+
+    def buscar(termo):
+        return [p["id"] for p in client.get("/produtos/busca", params={"q": termo}).json()]
+
+    assert buscar("can") == [caneta, borracha]
+    assert buscar("folhas") == [caderno]
+    assert buscar("canta")[0] == caneta
+    assert buscar("ca") == [caneta, caderno, borracha]
+    assert buscar("xyz") == []
+
+def test_buscar_produtos_acompanha_alteracoes(client, criar_produto):
+    produto_id = criar_produto(nome="Caneta Azul")
+
+    client.put(f"/produtos/{produto_id}", json={"nome": "Marcador Permanente"})
+    assert client.get("/produtos/busca?q=caneta").json() == []
+    assert [p["id"] for p in client.get("/produtos/busca?q=marcador").json()] == [produto_id]
+
+    client.delete(f"/produtos/{produto_id}")
+    assert client.get("/produtos/busca?q=marcador").json() == []
@@ -0,0 +1,122 @@
+"""
+Testes automatizados das reservas de estoque
+"""
+
+from datetime import datetime, timedelta
+
+import crud
+import models
+
+def _reservar(client, *itens, ttl_segundos=None):
+    corpo = {"cliente": "Ana", "itens": [{"produto_id": produto_id, "quantidade": quantidade}
+                                         for produto_id, quantidade in itens]}
+    if ttl_segundos is not None:
+        corpo["ttl_segundos"] = ttl_segundos
+    return client.post("/reservas/", json=corpo)
+
+def test_reserva_reduz_disponivel(client, criar_produto):
+    caneta = criar_produto(nome="Caneta", quantidade_estoque=10)
+
+    response = _reservar(client, (caneta, 4), (caneta, 2))
+
+    assert response.status_code == 201
+    assert response.json()["itens"] == [{"produto_id": caneta, "quantidade": 6}]
+    produto = client.get(f"/produtos/{caneta}").json()
+    assert (produto["quantidade_estoque"], produto["quantidade_reservada"]) == (10, 6)
+
+    # Pedidos e outras reservas só enxergam as 4 unidades disponíveis
+    assert _reservar(client, (caneta, 5)).status_code == 400
+    pedido = client.post("/pedidos/", json={"cliente": "Bia", "itens": [{"produto_id": caneta, "quantidade": 5}]})
+    assert pedido.status_code == 400
+    assert client.patch(f"/produtos/{caneta}/estoque", json={"delta": -5}).status_code == 400
+    assert client.post("/pedidos/", json={
+        "cliente": "Bia", "itens": [{"produto_id": caneta, "quantidade": 4}]
+    }).status_code == 201
+
+def test_reserva_sem_estoque_nao_altera_nada(client, criar_produto):
+    caneta = criar_produto(nome="Caneta", quantidade_estoque=10)
+    lapis = criar_produto(nome="Lápis", quantidade_estoque=1)
+
+    assert _reservar(client, (caneta, 3), (lapis, 2)).status_code == 400
+    assert _reservar(client, (caneta, 3), (9999, 1)).status_code == 404
+    assert client.get(f"/produtos/{caneta}").json()["quantidade_reservada"] == 0
+
+def test_confirmar_reserva_cria_pedido(client, db, criar_produto):
+    caneta = criar_produto(nome="Caneta", preco=2.5, quantidade_estoque=10)
+    reserva_id = _reservar(client, (caneta, 4)).json()["id"]
+
+    response = client.post(f"/reservas/{reserva_id}/confirmar")
+
+    assert response.status_code == 201
+    pedido = response.json()
+    assert pedido["cliente"] == "Ana"
+    assert pedido["valorTotalPedido"] == 10.0
+    produto = client.get(f"/produtos/{caneta}").json()
+    assert (produto["quantidade_estoque"], produto["quantidade_reservada"]) == (6, 0)
+    assert db.query(models.Reserva).count() == 0
+    # O resumo do estoque acompanha a baixa
+    assert client.get("/estatisticas").json()["total_unidades"] == 6
+    assert client.post(f"/reservas/{reserva_id}/confirmar").status_code == 404
+
+def test_liberar_reserva(client, criar_produto):
+    caneta = criar_produto(nome="Caneta", quantidade_estoque=10)
+    reserva_id = _reservar(client, (caneta, 4)).json()["id"]
+
+    assert client.delete(f"/reservas/{reserva_id}").status_code == 204
+    assert client.delete(f"/reservas/{reserva_id}").status_code == 404
+    produto = client.get(f"/produtos/{caneta}").json()
+    assert (produto["quantidade_estoque"], produto["quantidade_reservada"]) == (10, 0)
+
+def test_reserva_expirada_nao_confirma(client, db, criar_produto):
+    caneta = criar_produto(nome="Caneta", quantidade_estoque=10)
+    reserva_id = _reservar(client, (caneta, 4)).json()["id"]
+    db.get(models.Reserva, reserva_id).expira_em = datetime.utcnow() - timedelta(seconds=1)
+    db.commit()
+
+    assert client.post(f"/reservas/{reserva_id}/confirmar").status_code == 410
+    assert client.get(f"/produtos/{caneta}").json()["quantidade_reservada"] == 0
+
+def test_liberar_expiradas_em_lotes(client, db, criar_produto):
+    caneta = criar_produto(nome="Caneta", quantidade_estoque=100)
+    reserva_ids = [_reservar(client, (caneta, 2)).json()["id"] for _ in range(5)]
+    for reserva_id in reserva_ids[:3]:
+        db.get(models.Reserva, reserva_id).expira_em = datetime.utcnow() - timedelta(seconds=1)
+    db.commit()
+
+    assert crud.ReservaCRUD.liberar_expiradas(db, tamanho_lote=2) == 3
+
+    assert {reserva.id for reserva in db.query(models.Reserva)} == set(reserva_ids[3:])
+    assert client.get(f"/produtos/{caneta}").json()["quantidade_reservada"] == 4
+
+def test_produto_com_reserva(client, criar_produto):
+    caneta = criar_produto(nome="Caneta", quantidade_estoque=10)
+    _reservar(client, (caneta, 4))
+
+    assert client.put(f"/produtos/{caneta}", json={"quantidade_estoque": 3}).status_code == 400
+    assert client.delete(f"/produtos/{caneta}").status_code == 400
+
+def test_importacao_nao_deixa_estoque_abaixo_do_reservado(client):
+    caneta = client.post("/produtos/", json={"sku": "CAN-01", "nome": "Caneta", "preco": 2.0,
+                                             "quantidade_estoque": 10}).json()["id"]
+    lapis = client.post("/produtos/", json={"sku": "LAP-01", "nome": "Lápis", "preco": 1.0,
+                                            "quantidade_estoque": 10}).json()["id"]
+    reserva_id = _reservar(client, (caneta, 6), (lapis, 2)).json()["id"]
+
+    csv = (
+        "sku,nome,preco,quantidade_estoque\n"
+        "CAN-01,Caneta Azul,2.5,4\n"
+        "LAP-01,Lápis HB,1.5,2\n"
+        "BOR-01,Borracha,1.0,0\n"
+    )
+    resultado = client.post("/produtos/importar", files={"arquivo": ("catalogo.csv", csv.encode(), "text/csv")}).json()
+
+    assert (resultado["importadas"], resultado["rejeitadas"]) == (2, 1)
+    assert resultado["erros"] == [{"linha": 2, "erro": "quantidade_estoque: menor que a quantidade reservada (6)"}]
+    produto = client.get(f"/produtos/{caneta}").json()
+    assert (produto["nome"], produto["quantidade_estoque"], produto["quantidade_reservada"]) == ("Caneta", 10, 6)
+    assert client.get(f"/produtos/{lapis}").json()["quantidade_estoque"] == 2
+
+    # A reserva continua coberta pelo estoque
+    assert client.post(f"/reservas/{reserva_id}/confirmar").status_code == 201
+    assert client.get(f"/produtos/{caneta}").json()["quantidade_estoque"] == 4
+    assert client.get(f"/produtos/{lapis}").json()["quantidade_estoque"] == 0
@@ -0,0 +1,83 @@
+"""
+Testes do resumo do estoque mantido incrementalmente
+"""
+
+import crud
+import models
+import schemas
+from config import settings
+from database import SessionLocal
+
+def _resumo(db):
+    db.expire_all()
+    resumo = db.get(models.ResumoEstoque, 10)
+    return {campo: getattr(resumo, campo) for campo in crud.ResumoEstoqueCRUD.CAMPOS}
+
+def test_resumo_acompanha_todas_as_escritas(client, db):
+    # Cria o registro do resumo antes das escritas
+    assert crud.ResumoEstoqueCRUD.reconciliar(db) == []
+
+    caneta = client.post("/produtos/", json={"nome": "Caneta", "preco": 2.0, "quantidade_estoque": 12}).json()["id"]
+    caderno = client.post("/produtos/", json={"nome": "Caderno", "preco": 10.0, "quantidade_estoque": 3}).json()["id"]
+    lapis = client.post("/produtos/", json={"nome": "Lápis", "preco": 1.0, "quantidade_estoque": 1}).json()["id"]
+    client.put(f"/produtos/{caderno}", json={"preco": 12.0, "quantidade_estoque": 20})
+    pedido = client.post("/pedidos/", json={"cliente": "A", "itens": [{"produto_id": caneta, "quantidade": 5},
+                                                                     {"produto_id": lapis, "quantidade": 1}]}).json()
+    client.post("/pedidos/lote", json=[{"cliente": "B", "itens": [{"produto_id": caderno, "quantidade": 15}]}])
+    client.put(f"/pedidos/{pedido['id']}", json={"cliente": "A2"})
+    client.delete(f"/pedidos/{pedido['id']}")
+    client.delete(f"/produtos/{lapis}")
+    client.post("/produtos/importar", files={"arquivo": ("c.csv", b"sku,nome,preco,quantidade_estoque\nX,Borracha,3.0,0\n")})
+
+    assert _resumo(db) == crud.ResumoEstoqueCRUD.recalcular(db, 10)
+    assert _resumo(db) == {
+        "total_produtos": 3,
+        "total_unidades": 12 + 5,
+        "valor_total_estoque": 12 * 2.0 + 5 * 12.0,
+        "produtos_baixo_estoque": 2,
+        "produtos_sem_estoque": 1,
+    }
+
+def test_estatisticas_leem_o_resumo_sem_agregar_produtos(client, criar_produto, contar_queries):
+    from cache import backend_cache
+
+    criar_produto(preco=2.0, quantidade_estoque=4)
+    # Registro do resumo, criado em produção pela migração 0009
+    with SessionLocal() as db:
+        crud.ResumoEstoqueCRUD.reconciliar(db)
+    client.post("/produtos/", json={"nome": "Novo", "preco": 1.0, "quantidade_estoque": 0})
+    backend_cache.remover("estatisticas")
+
+    with contar_queries() as comandos:
+        estatisticas = client.get("/estatisticas").json()
+
+    assert estatisticas["total_produtos"] == 2
+    assert estatisticas["produtos_sem_estoque"] == 1
+    assert estatisticas["valor_total_estoque"] == 8.0
+    assert not any("sum(" in comando.lower() for comando in comandos)
+
+def test_reconciliar_informa_e_corrige_divergencias(db, criar_produto):
+    criar_produto(preco=2.0, quantidade_estoque=4)
+    crud.ResumoEstoqueCRUD.reconciliar(db)
+    db.query(models.Produto).update({"quantidade_estoque": 0})
+    db.commit()
+
+    divergencias = crud.ResumoEstoqueCRUD.reconciliar(db)
+
+    assert {d["campo"] for d in divergencias} == {
+        "total_unidades", "valor_total_estoque", "produtos_sem_estoque"
+    }
+    assert crud.ResumoEstoqueCRUD.reconciliar(db) == []
+
+def test_sem_registro_ou_com_outro_limite_o_resumo_e_recalculado(db, criar_produto):
+    criar_produto(preco=2.0, quantidade_estoque=4)
+    # Escrita antes de o registro existir: não pode se perder
+    crud.ProdutoCRUD.criar_produto(db, schemas.ProdutoCreate(nome="Novo", preco=1.0, quantidade_estoque=0))
+
+    assert db.get(models.ResumoEstoque, settings.LIMITE_BAIXO_ESTOQUE) is None
+    assert crud.ResumoEstoqueCRUD.obter(db, settings.LIMITE_BAIXO_ESTOQUE)["total_produtos"] == 2
+
+    crud.ResumoEstoqueCRUD.reconciliar(db)
+    assert crud.ResumoEstoqueCRUD.obter(db, 3) == crud.ResumoEstoqueCRUD.recalcular(db, 3)
+    assert crud.ResumoEstoqueCRUD.obter(db, 3)["produtos_baixo_estoque"] == 1
+    assert db.get(models.ResumoEstoque, 3) is None
@@ -0,0 +1,51 @@
+from sqlalchemy import create_engine
+
+import database
+from database import SondaBanco, sonda_banco
+
+def test_vivo_e_pronto_nao_acessam_o_banco(client, contar_queries):
+    with contar_queries() as comandos:
+        vivo = client.get("/saude/vivo")
+        pronto = client.get("/saude/pronto")
+        status = client.get("/")
+
+    assert comandos == []
+    assert vivo.status_code == 200
+    assert pronto.status_code == 200
+    assert status.json()["database"] == "online"
+
+def test_pronto_informa_ultima_sonda_e_pool(client):
+    sonda_banco.sondar()
+
+    dados = client.get("/saude/pronto").json()
+
+    assert dados["pronto"] is True
+    assert dados["database"] == "online"
+    assert dados["latencia_ms"] >= 0
+    assert dados["idade_segundos"] < 5
+    assert set(dados["pool"]) == {"tamanho", "em_uso", "livres", "overflow", "utilizacao"}
+
+def test_pronto_responde_503_com_banco_fora_do_ar(client, monkeypatch):
+    sonda = SondaBanco(create_engine("sqlite:////diretorio/inexistente/banco.db"), intervalo=5)
+    assert sonda.sondar() is False
+    monkeypatch.setattr(sonda_banco, "ultima", sonda.ultima)
+
+    response = client.get("/saude/pronto")
+
+    assert response.status_code == 503
+    assert response.json()["database"] == "offline"
+    assert response.json()["erro"]
+    assert client.get("/saude/vivo").status_code == 200
+
+def test_sonda_atrasada_deixa_de_contar_como_pronta():
+    sonda = SondaBanco(create_engine("sqlite://"), intervalo=5)
+    assert sonda.situacao()["database"] == "verificando"
+
+    sonda.sondar()
+    sonda.ultima["monotonico"] -= 16
+
+    assert sonda.situacao()["pronto"] is False
+    assert sonda.situacao()["database"] == "desatualizado"
+
+def test_database_connection_usa_text():
+    assert database.test_database_connection() is True
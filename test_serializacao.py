@@ -0,0 +1,44 @@
+"""
+Testes do caminho rápido de serialização (SERIALIZACAO_RAPIDA)
+"""
+
+import pytest
+
+import respostas
+from config import settings
+
+CAMINHOS = ["/produtos/?limit=2", "/produtos/{produto}", "/pedidos/?limit=1", "/pedidos/{pedido}"]
+
+@pytest.fixture
+def dados(client, criar_produto):
+    produto = criar_produto(nome="Caneta Azul", descricao="Ação & reação", preco=2.5)
+    criar_produto(nome="Caderno", preco=10.0)
+    pedidos = [
+        client.post("/pedidos/", json={"cliente": f"Cliente {i}", "itens": [{"produto_id": produto, "quantidade": 1}]}).json()
+        for i in range(2)
+    ]
+    return {"produto": produto, "pedido": pedidos[0]["id"]}
+
+@pytest.mark.parametrize("sem_orjson", [False, True])
+def test_caminho_rapido_responde_igual_ao_padrao(client, dados, monkeypatch, sem_orjson):
+    if sem_orjson:
+        monkeypatch.setattr(respostas, "orjson", None)
+
+    for caminho in CAMINHOS:
+        url = caminho.format(**dados)
+        padrao = client.get(url)
+        monkeypatch.setattr(settings, "SERIALIZACAO_RAPIDA", True)
+        rapida = client.get(url)
+        monkeypatch.setattr(settings, "SERIALIZACAO_RAPIDA", False)
+
+        assert rapida.status_code == padrao.status_code == 200
+        assert rapida.json() == padrao.json()
+        assert rapida.headers["content-type"] == padrao.headers["content-type"]
+        for cabecalho in ("ETag", "X-Next-Cursor"):
+            assert rapida.headers.get(cabecalho) == padrao.headers.get(cabecalho)
+
+def test_caminho_rapido_mantem_404(client, monkeypatch):
+    monkeypatch.setattr(settings, "SERIALIZACAO_RAPIDA", True)
+
+    assert client.get("/produtos/999").status_code == 404
+    assert client.get("/pedidos/999").status_code == 404